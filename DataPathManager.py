@@ -13,6 +13,19 @@ class DataPathManager:
         else:
             return os.path.join(self.internal_root, filename)
 
+    def get_kbar_store_root(self, prefer_external=False):
+        """K 線 Parquet 儲存根目錄"""
+        return self.get_path("kbars", prefer_external)
+
+    def get_kbar_partition(self, contract, resolution, trading_date, root=None, prefer_external=False):
+        """
+        K 線分割檔路徑：<root>/<contract>/<resolution>/<YYYY-MM-DD>.parquet
+        - trading_date 可為 date 或 'YYYY-MM-DD'
+        """
+        root = root if root is not None else self.get_kbar_store_root(prefer_external)
+        day = trading_date if isinstance(trading_date, str) else trading_date.isoformat()
+        return os.path.join(root, contract, resolution, f"{day}.parquet")
+
     def ensure_dirs(self):
         os.makedirs(self.internal_root, exist_ok=True)
         os.makedirs(self.external_root, exist_ok=True)
@@ -0,0 +1,268 @@
+# strategy_v4/EngineHost.py
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.EngineCheckpoint import EngineCheckpoint
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.io.SignalBus import SignalBus
+from strategy_v4.io.TickIngestor import TickIngestor
+from strategy_v4.io.TickRecorder import TickRecorder
+from strategy_v4.io.TradeLogger import TradeLogger
+from strategy_v4.pipeline.BarPyramid import BarPyramid
+
+STOP = "__stop__"
+BATCH = 1000  # worker 每次最多從佇列取出的訊息數
+
+
+def default_engine_factory(code: str, spec: dict, log_dir: str) -> TickEngine:
+    """
+    預設的合約引擎：
+    - 每個合約獨立的 StrategyState、TradeLogger / TickRecorder / 檢查點檔案
+    - 有檢查點則還原，否則由 KbarStore 的連續月（spec["warmup"]，預設代號前三碼 + R1）暖機，
+      指標與 5m / 15m 由主行程建好的 BarPyramid 接續
+    - spec["signal_bus"] 為真時，訊號寫入 signal_bus_<code>.bin（可為 {"dir", "capacity"}）
+    """
+    cfg = spec.get("config", {})
+    base = Path(log_dir)
+    bcfg = spec.get("signal_bus")
+    bcfg = bcfg if isinstance(bcfg, dict) else {}
+    bus_dir = Path(bcfg.get("dir", base))
+    engine = TickEngine(
+        state=StrategyState(config=cfg, mode="v4" if spec.get("mode") == "regression_based" else "v3"),
+        market_bias=spec.get("market_bias", "neutral"),
+        trade_logger=TradeLogger(base / f"trade_log_{code}.csv"),
+        tick_recorder=TickRecorder(base / f"tick_data_{code}.csv"),
+        mode=spec.get("mode", "rule_based"),
+        config=cfg,
+        checkpoint=EngineCheckpoint(base / f"engine_{code}.ckpt", interval=spec.get("checkpoint_interval", 30)),
+        signal_bus=SignalBus(bus_dir / f"signal_bus_{code}.bin", capacity=bcfg.get("capacity", 65536))
+        if spec.get("signal_bus") else None,
+        async_bars=True,
+    )
+    if engine.checkpoint.restore(engine, max_age=spec.get("checkpoint_max_age", 6 * 3600)) is None:
+        warmup = spec.get("warmup", code[:3] + "R1")
+        try:
+            store = KbarStore()
+            engine.warm_start(store.read(warmup, "1m").tail(engine.warmup_bars), pyramid=BarPyramid(store, warmup))
+        except Exception as e:
+            print(f"[EngineHost] ⚠️ {code} 暖機失敗：{e}")
+    return engine
+
+
+def _contract_status(engine, processed: int, last_price: float | None) -> dict:
+    status = engine.state.get_status()
+    status["processed"] = processed
+    status["last_price"] = last_price
+    status["unrealized"] = engine.state.get_unrealized_profit(last_price) if last_price is not None else 0.0
+    return status
+
+
+def _worker_main(shard: int, specs: Dict[str, dict], inbox, outbox, factory: Callable, log_dir: str,
+                 ingest: dict, report_interval: float):
+    """
+    worker 行程：
+    - 建立本分片的合約引擎，依 tick["code"] 分派
+    - 一次取出佇列中所有積壓訊息交給 TickIngestor（可用 coalesce / shed 過載策略）
+    - 定期回報各合約持倉與統計；收到 STOP 後處理完剩餘 tick、flush、寫檢查點再回報最終狀態
+    """
+    engines = {code: factory(code, spec, log_dir) for code, spec in specs.items()}
+    ingestor = TickIngestor(ingest.get("policy", "all"), ingest.get("maxsize", 100000), ingest.get("deadline", 0.5))
+    processed = {code: 0 for code in engines}
+    last_price: Dict[str, float | None] = {code: None for code in engines}
+    errors = 0
+    last_report = 0.0
+    stopping = False
+
+    def report(kind="status"):
+        outbox.put((kind, shard, {
+            "pid": os.getpid(),
+            "errors": errors,
+            "ingest": dict(ingestor.stats),
+            "contracts": {c: _contract_status(e, processed[c], last_price[c]) for c, e in engines.items()},
+        }))
+
+    outbox.put(("ready", shard, {"pid": os.getpid(), "contracts": list(engines)}))
+    while not stopping:
+        try:
+            msgs = [inbox.get(timeout=report_interval)]
+        except queue.Empty:
+            msgs = []
+        try:
+            while len(msgs) < BATCH:
+                msgs.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+
+        for msg in msgs:
+            if msg == STOP:
+                stopping = True
+            else:
+                ingestor.put(msg)
+
+        while (tick := ingestor.get()) is not None:
+            code = tick.get("code")
+            try:
+                engines[code].on_tick(tick)
+            except Exception as e:
+                errors += 1
+                print(f"[EngineHost] ❌ shard {shard} {code} on_tick 失敗：{e}")
+                continue
+            processed[code] += 1
+            last_price[code] = float(tick.get("price", 0))
+
+        now = time.monotonic()
+        if now - last_report >= report_interval:
+            report()
+            last_report = now
+
+    for engine in engines.values():
+        if engine.tick_recorder is not None:
+            engine.tick_recorder.flush()
+        if engine.checkpoint is not None:
+            engine.checkpoint.save(engine, sync=True)
+        if getattr(engine, "signal_bus", None) is not None:
+            engine.signal_bus.close()
+    report("final")
+
+
+class EngineHost:
+    """
+    多合約引擎主機：
+    - 每個合約一個獨立 TickEngine（StrategyState、參數、紀錄檔各自分開）
+    - 合約依 weight 平衡分配到 worker 行程（每個 worker 一個核心，不受 GIL 互相牽制）
+    - route() 依 tick["code"] 丟入對應 worker 的佇列（執行緒安全，可直接在券商 callback 呼叫）
+    - 收集執行緒彙整各 worker 回報：持倉、未實現損益、處理筆數、進件統計
+    - 新增合約只需在 contracts 加一筆設定
+    """
+
+    def __init__(self, contracts: Dict[str, dict], workers: int | None = None,
+                 factory: Callable[[str, dict, str], Any] = default_engine_factory,
+                 log_dir: str | Path = ".", ingest: dict | None = None, report_interval: float = 1.0):
+        if not contracts:
+            raise ValueError("[EngineHost] 至少需要一個合約")
+        self.contracts = {code: dict(spec or {}) for code, spec in contracts.items()}
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.contracts)))
+        self.factory = factory
+        self.log_dir = str(log_dir)
+        self.ingest = dict(ingest or {})
+        self.report_interval = report_interval
+
+        self.shards = self.assign(self.contracts, self.workers)
+        self.shard_of = {code: i for i, codes in enumerate(self.shards) for code in codes}
+        self.status: Dict[str, dict] = {}
+        self.shard_stats: Dict[int, dict] = {}
+        self.unrouted = 0
+        self._ctx = mp.get_context()
+        self._inboxes: List[Any] = []
+        self._procs: List[Any] = []
+        self._outbox = None
+        self._collector: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._ready = threading.Semaphore(0)
+        self._final = threading.Semaphore(0)
+
+    @staticmethod
+    def assign(contracts: Dict[str, dict], workers: int) -> List[List[str]]:
+        """依 weight（預設 1）由大到小分配給目前負載最小的 worker"""
+        shards: List[List[str]] = [[] for _ in range(workers)]
+        load = [0.0] * workers
+        for code in sorted(contracts, key=lambda c: (-float(contracts[c].get("weight", 1)), c)):
+            i = load.index(min(load))
+            shards[i].append(code)
+            load[i] += float(contracts[code].get("weight", 1))
+        return shards
+
+    # ===== 生命週期 =====
+    def start(self, timeout: float = 60.0) -> "EngineHost":
+        self._outbox = self._ctx.Queue()
+        for shard, codes in enumerate(self.shards):
+            inbox = self._ctx.Queue()
+            proc = self._ctx.Process(
+                target=_worker_main,
+                args=(shard, {c: self.contracts[c] for c in codes}, inbox, self._outbox,
+                      self.factory, self.log_dir, self.ingest, self.report_interval),
+                name=f"EngineHost-{shard}",
+                daemon=True,
+            )
+            proc.start()
+            self._inboxes.append(inbox)
+            self._procs.append(proc)
+        self._collector = threading.Thread(target=self._collect, name="EngineHost-collector", daemon=True)
+        self._collector.start()
+        for _ in self._procs:
+            if not self._ready.acquire(timeout=timeout):
+                raise RuntimeError("[EngineHost] worker 啟動逾時")
+        print(f"[EngineHost] 已啟動 {len(self._procs)} 個 worker｜分配：{self.shards}")
+        return self
+
+    def route(self, tick: dict) -> bool:
+        """依合約代號送到對應 worker；未知合約回傳 False"""
+        shard = self.shard_of.get(tick.get("code"))
+        if shard is None:
+            self.unrouted += 1
+            return False
+        self._inboxes[shard].put(tick)
+        return True
+
+    def stop(self, timeout: float = 30.0) -> dict:
+        """通知所有 worker 處理完剩餘 tick 後結束，回傳最終彙總"""
+        for inbox in self._inboxes:
+            inbox.put(STOP)
+        for _ in self._procs:
+            self._final.acquire(timeout=timeout)
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._outbox.put(None)
+        self._collector.join(timeout)
+        snapshot = self.snapshot()
+        t = snapshot["totals"]
+        print(f"[EngineHost] 已停止｜處理 {t['processed']}｜持倉 多 {t['long']} 空 {t['short']}｜未實現 {t['unrealized']:.1f}")
+        return snapshot
+
+    # ===== 彙整 =====
+    def _collect(self):
+        while True:
+            msg = self._outbox.get()
+            if msg is None:
+                return
+            kind, shard, payload = msg
+            if kind == "ready":
+                self._ready.release()
+                continue
+            with self._lock:
+                self.status.update(payload["contracts"])
+                self.shard_stats[shard] = {k: v for k, v in payload.items() if k != "contracts"}
+            if kind == "final":
+                self._final.release()
+
+    def snapshot(self) -> dict:
+        """
+        集中彙總：
+        - contracts：各合約最新狀態（持倉方向、口數、未實現損益、處理筆數…）
+        - totals：多/空口數、未實現損益、處理筆數、合併/丟棄數、錯誤數
+        """
+        with self._lock:
+            contracts = {c: dict(s) for c, s in self.status.items()}
+            shards = {i: dict(s) for i, s in self.shard_stats.items()}
+        totals = {"long": 0, "short": 0, "unrealized": 0.0, "processed": 0,
+                  "coalesced": 0, "dropped": 0, "errors": 0, "unrouted": self.unrouted}
+        for s in contracts.values():
+            if s.get("in_position"):
+                totals["long" if s.get("direction") == "long" else "short"] += int(s.get("current_position_size") or 0)
+            totals["unrealized"] += float(s.get("unrealized") or 0.0)
+            totals["processed"] += int(s.get("processed") or 0)
+        for s in shards.values():
+            totals["coalesced"] += s.get("ingest", {}).get("coalesced", 0)
+            totals["dropped"] += s.get("ingest", {}).get("dropped", 0)
+            totals["errors"] += s.get("errors", 0)
+        return {"contracts": contracts, "shards": shards, "totals": totals}
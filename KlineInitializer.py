@@ -1,9 +1,25 @@
 # strategy_v4/io/KlineInitializer.py
 
-import requests
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
 import pandas as pd
-from datetime import datetime
-from typing import List, Dict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from strategy_v4.DataPathManager import DataPathManager
+
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
 
 class KlineInitializer:
     """
@@ -11,13 +27,56 @@ class KlineInitializer:
     - 從外部網站抓取 K 線資料
     - 支援多來源 (yahoo, twse, fugle)
     - 統一輸出格式
+    - 共用連線池的 requests.Session（逾時、失敗重試與退避）
+    - fetch_many 以有限並行度一次抓取多個代號 / 區間
+    - 磁碟快取（Parquet + metadata）：依 TTL 與筆數/欄位驗證，跨行程保留；已結束的歷史區間不過期
     """
 
-    def __init__(self, source: str = "yahoo", cache: bool = True):
+    BASE_URLS = {
+        "yahoo": "https://query1.finance.yahoo.com",
+        "twse": "https://www.twse.com.tw",
+    }
+
+    def __init__(
+        self,
+        source: str = "yahoo",
+        cache: bool = True,
+        cache_dir: str | Path | None = None,
+        ttl: float = 3600,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_workers: int = 8,
+        base_url: str | None = None,
+    ):
         self.source = source
         self.cache = cache
+        self.cache_dir = Path(cache_dir or DataPathManager().get_path("kline_cache"))
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.base_url = (base_url or self.BASE_URLS.get(source, "")).rstrip("/")
         self._cache_data: Dict[str, List[dict]] = {}
+        self.session = self._make_session(retries, backoff, max_workers)
 
+    @staticmethod
+    def _make_session(retries: int, backoff: float, pool_size: int) -> requests.Session:
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        self.session.close()
+
+    # ===== 抓取 =====
     def fetch(self, symbol: str, start: str, end: str, interval: str = "1d") -> List[dict]:
         """
         抓取 K 線資料
@@ -31,37 +90,120 @@ class KlineInitializer:
         if self.cache and cache_key in self._cache_data:
             return self._cache_data[cache_key]
 
+        df = self._load_cache(symbol, start, end, interval) if self.cache else None
+        if df is None:
+            df = self._normalize(self._request(symbol, start, end, interval))
+            if self.cache:
+                self._save_cache(df, symbol, start, end, interval)
+
+        kline_data = df.to_dict("records")
+        if self.cache:
+            self._cache_data[cache_key] = kline_data
+        return kline_data
+
+    def fetch_many(self, requests_: Iterable[Tuple[str, str, str] | Tuple[str, str, str, str]]) -> Dict[Tuple, List[dict]]:
+        """
+        並行抓取多組 (symbol, start, end[, interval])：
+        - 並行度受 max_workers 限制，共用同一個連線池
+        - 單一代號失敗時回傳空列表，不影響其他代號
+        :return: {請求 tuple: K 線資料}
+        """
+        reqs = [tuple(r) for r in requests_]
+
+        def task(req):
+            try:
+                return self.fetch(*req)
+            except Exception as e:
+                print(f"[KlineInitializer] ❌ 抓取失敗 {req}: {e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(reqs, pool.map(task, reqs)))
+
+    def _request(self, symbol: str, start: str, end: str, interval: str) -> pd.DataFrame:
         if self.source == "yahoo":
-            url = f"https://query1.finance.yahoo.com/v7/finance/download/{symbol}?period1={int(datetime.strptime(start,'%Y-%m-%d').timestamp())}&period2={int(datetime.strptime(end,'%Y-%m-%d').timestamp())}&interval={interval}&events=history"
-            resp = requests.get(url)
-            df = pd.read_csv(pd.compat.StringIO(resp.text))
-        elif self.source == "twse":
+            period1 = int(datetime.strptime(start, "%Y-%m-%d").timestamp())
+            period2 = int(datetime.strptime(end, "%Y-%m-%d").timestamp())
+            resp = self.session.get(
+                f"{self.base_url}/v7/finance/download/{symbol}",
+                params={"period1": period1, "period2": period2, "interval": interval, "events": "history"},
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            return pd.read_csv(io.StringIO(resp.text))
+        if self.source == "twse":
             # 台灣證交所 API 範例
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY?response=json&date={start.replace('-','')}&stockNo={symbol}"
-            resp = requests.get(url).json()
-            df = pd.DataFrame(resp.get("data", []))
+            resp = self.session.get(
+                f"{self.base_url}/exchangeReport/STOCK_DAY",
+                params={"response": "json", "date": start.replace("-", ""), "stockNo": symbol},
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            payload = resp.json()
+            return pd.DataFrame(payload.get("data", []), columns=payload.get("fields"))
+        raise ValueError(f"Unsupported source: {self.source}")
+
+    # ===== 統一格式（向量化） =====
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNS)
+        if self.source == "twse":
+            # 日期為民國年（114/11/03），數字含千分位
+            roc = df["日期"].astype(str).str.split("/", expand=True)
+            ts = pd.to_datetime((roc[0].astype(int) + 1911).astype(str) + "-" + roc[1] + "-" + roc[2], errors="coerce")
+            cols = {"open": "開盤價", "high": "最高價", "low": "最低價", "close": "收盤價", "volume": "成交股數"}
         else:
-            raise ValueError(f"Unsupported source: {self.source}")
+            ts = pd.to_datetime(df["Date"] if "Date" in df.columns else df["date"], errors="coerce")
+            cols = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
 
-        # 統一格式
-        kline_data = []
-        for _, row in df.iterrows():
-            try:
-                kline_data.append({
-                    "timestamp": pd.to_datetime(row.get("Date") or row.get("date")),
-                    "open": float(row.get("Open") or row[1]),
-                    "high": float(row.get("High") or row[2]),
-                    "low": float(row.get("Low") or row[3]),
-                    "close": float(row.get("Close") or row[4]),
-                    "volume": float(row.get("Volume") or row[5]),
-                })
-            except Exception:
-                continue
+        out = pd.DataFrame({"timestamp": ts})
+        for name, col in cols.items():
+            out[name] = pd.to_numeric(df[col].astype(str).str.replace(",", "", regex=False), errors="coerce")
+        return out.dropna().reset_index(drop=True)
 
-        if self.cache:
-            self._cache_data[cache_key] = kline_data
+    # ===== 磁碟快取 =====
+    def _cache_paths(self, symbol: str, start: str, end: str, interval: str) -> Tuple[Path, Path]:
+        key = hashlib.sha1(f"{self.source}|{symbol}|{start}|{end}|{interval}".encode()).hexdigest()[:20]
+        return self.cache_dir / f"{key}.parquet", self.cache_dir / f"{key}.json"
 
-        return kline_data
+    def _load_cache(self, symbol: str, start: str, end: str, interval: str) -> pd.DataFrame | None:
+        """讀取磁碟快取；過期或驗證失敗時回傳 None"""
+        data_path, meta_path = self._cache_paths(symbol, start, end, interval)
+        if not (data_path.exists() and meta_path.exists()):
+            return None
+        try:
+            with meta_path.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["params"] != [self.source, symbol, start, end, interval]:
+                return None
+            historical = date.fromisoformat(end) < date.fromisoformat(meta["created_at"][:10])
+            if not historical and time.time() - meta["created"] > self.ttl:
+                return None
+            df = pd.read_parquet(data_path)
+            if len(df) != meta["rows"] or list(df.columns) != COLUMNS:
+                print(f"[KlineInitializer] ⚠️ 快取驗證失敗，重新抓取：{symbol} {start}~{end}")
+                return None
+            return df
+        except Exception as e:
+            print(f"[KlineInitializer] ⚠️ 快取讀取失敗，重新抓取：{symbol} {start}~{end}（{e}）")
+            return None
+
+    def _save_cache(self, df: pd.DataFrame, symbol: str, start: str, end: str, interval: str):
+        data_path, meta_path = self._cache_paths(symbol, start, end, interval)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = data_path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, data_path)
+        meta = {
+            "params": [self.source, symbol, start, end, interval],
+            "rows": len(df),
+            "created": time.time(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        tmp = meta_path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
 
     def to_dataframe(self, kline_data: List[dict]) -> pd.DataFrame:
         """轉換成 DataFrame"""
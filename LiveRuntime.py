@@ -0,0 +1,213 @@
+# strategy_v4/LiveRuntime.py
+
+import asyncio
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from strategy_v4.io.TickIngestor import TickIngestor
+
+
+class LiveRuntime:
+    """
+    asyncio 即時執行環境（取代 main.py 的忙等迴圈）：
+    - feed() 由券商 callback 執行緒呼叫，只做 loop.call_soon_threadsafe 交給事件迴圈，立即返回
+    - feed(block=True) 供回放來源使用：佇列滿時阻塞呼叫端直到有空位（背壓，最快速度回放不丟 tick）
+    - TickIngestor 有界佇列（all / coalesce / shed 過載策略）+ 單一策略消費者 task，engine.on_tick 依序在事件迴圈執行緒上執行
+    - 背景 task：flush（TickRecorder 寫檔於 executor）、health（佇列深度、最後 tick 時間）、bar refresh
+    - SIGINT / SIGTERM → 停止接收、消化佇列、最後一次 flush 與檢查點、執行 shutdown hooks
+    - 沒有 tick 時事件迴圈閒置（不佔 CPU）
+    """
+
+    def __init__(self, engine, config: dict | None = None,
+                 bar_source: Callable[[], Any] | None = None):
+        cfg = config or {}
+        self.engine = engine
+        icfg = cfg.get("ingest", {})
+        self.ingestor = TickIngestor(
+            policy=icfg.get("policy", "all"),
+            maxsize=int(icfg.get("maxsize", cfg.get("queue_size", 10000))),
+            deadline=float(icfg.get("deadline", 0.5)),
+        )
+        self.flush_interval = float(cfg.get("flush_interval", 1.0))
+        self.health_interval = float(cfg.get("health_interval", 30.0))
+        self.bar_interval = float(cfg.get("bar_interval", 60.0))
+        self.stale_after = float(cfg.get("stale_after", 120.0))
+        self.bar_source = bar_source  # executor 中執行，回傳新收盤 K 棒交給 engine.update_bars
+
+        self.errors = 0
+        self.last_tick: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._has_data: asyncio.Event | None = None
+        self._stop: asyncio.Event | None = None
+        self._accepting = False
+        self._ready = threading.Event()
+        self._space = threading.Condition()   # 阻塞式 feed 等待佇列空位
+        self._pending = 0                      # 阻塞式 feed 已排入、尚未進佇列的筆數
+        self._waiting = 0                      # 正在等待空位的生產者數
+        self._start_hooks: List[Callable[[], Any]] = []
+        self._shutdown_hooks: List[Callable[[], Any]] = []
+
+    # ===== 券商執行緒 =====
+    def feed(self, tick: dict, block: bool = False):
+        """
+        執行緒安全：把 tick 交給事件迴圈（不做任何計算或 I/O）
+        - block=True：佇列（含已排入尚未進佇列的 tick）滿時等待空位，停止接收時放棄
+        """
+        if not self._accepting:
+            return
+        if block:
+            with self._space:
+                while self._accepting and self._pending + len(self.ingestor) >= self.ingestor.maxsize:
+                    self._waiting += 1
+                    self._space.wait(0.1)
+                    self._waiting -= 1
+                if not self._accepting:
+                    return
+                self._pending += 1
+        self._loop.call_soon_threadsafe(self._enqueue, tick, block)
+
+    def _enqueue(self, tick: dict, counted: bool = False):
+        if counted:
+            with self._space:
+                self._pending -= 1
+        if self.ingestor.put(tick):
+            self._has_data.set()
+
+    def _release(self):
+        """消費者取出 tick 後喚醒等待空位的生產者"""
+        if self._waiting:
+            with self._space:
+                self._space.notify_all()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """進件統計（TickIngestor）+ on_tick 錯誤數與最後處理時間"""
+        return {**self.ingestor.stats, "errors": self.errors, "last_tick": self.last_tick}
+
+    # ===== 事件迴圈 =====
+    async def _consume(self):
+        while True:
+            tick = self.ingestor.get()
+            if tick is None:
+                if not self._accepting:
+                    return
+                self._has_data.clear()
+                await self._has_data.wait()
+                continue
+            self._release()
+            try:
+                self.engine.on_tick(tick)
+            except Exception as e:
+                self.errors += 1
+                print(f"[LiveRuntime] ❌ on_tick 失敗：{e}")
+            self.last_tick = time.monotonic()
+            await asyncio.sleep(0)  # 每筆之後讓出：進件（合併/丟棄判斷）與背景工作不被餓死
+
+    async def _every(self, interval: float, fn: Callable[[], Any]):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await fn()
+            except Exception as e:
+                print(f"[LiveRuntime] ⚠️ 背景工作 {getattr(fn, '__name__', fn)} 失敗：{e}")
+
+    async def flush(self):
+        """TickRecorder 寫檔移到 executor，不阻擋策略消費者"""
+        recorder = getattr(self.engine, "tick_recorder", None)
+        if recorder is not None:
+            await self._loop.run_in_executor(None, recorder.flush)
+
+    async def health(self):
+        st = self.stats
+        age = time.monotonic() - self.last_tick if self.last_tick is not None else None
+        print(f"[LiveRuntime] 佇列 {len(self.ingestor)}（最高 {st['max_depth']}）｜等待 平均 {st['avg_age'] * 1000:.1f} ms"
+              f"／最長 {st['max_age'] * 1000:.1f} ms｜已處理 {st['processed']}｜合併 {st['coalesced']}｜"
+              f"丟棄 {st['dropped']}｜錯誤 {st['errors']}｜最後 tick {'—' if age is None else f'{age:.1f}s 前'}")
+        if age is not None and age > self.stale_after:
+            print(f"[LiveRuntime] ⚠️ 超過 {self.stale_after:.0f}s 沒有 tick，請確認行情連線")
+
+    async def refresh_bars(self):
+        """bar_source 在 executor 取得新收盤 K 棒，指標更新回到事件迴圈執行緒（與 on_tick 同一執行緒）"""
+        bars = await self._loop.run_in_executor(None, self.bar_source)
+        if bars is not None and len(bars):
+            self.engine.update_bars(bars)
+
+    def on_start(self, fn: Callable[[], Any]):
+        """開始接收 tick 後執行（例如訂閱行情、啟動回放），避免最早的 tick 在啟動前被丟棄"""
+        self._start_hooks.append(fn)
+
+    def on_shutdown(self, fn: Callable[[], Any]):
+        """關閉時（佇列消化完後）依序執行"""
+        self._shutdown_hooks.append(fn)
+
+    def _install_signals(self):
+        for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None)):
+            if sig is None:
+                continue
+            try:
+                self._loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows / 非主執行緒：改用 signal.signal，再轉回事件迴圈
+                try:
+                    signal.signal(sig, lambda *_: self.stop())
+                except ValueError:
+                    pass
+
+    async def run(self) -> Dict[str, Any]:
+        self._loop = asyncio.get_running_loop()
+        self._has_data = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._install_signals()
+
+        consumer = asyncio.create_task(self._consume())
+        jobs = [self._every(self.flush_interval, self.flush), self._every(self.health_interval, self.health)]
+        if self.bar_source is not None:
+            jobs.append(self._every(self.bar_interval, self.refresh_bars))
+        background = [asyncio.create_task(job) for job in jobs]
+
+        self._accepting = True
+        self._ready.set()
+        for fn in self._start_hooks:
+            fn()
+        print("[LiveRuntime] 🚀 等待 Tick 資料中...")
+        await self._stop.wait()
+
+        # ===== 優雅關閉 =====
+        print("[LiveRuntime] 🛑 收到停止訊號，消化佇列中...")
+        self._accepting = False
+        await asyncio.sleep(0)  # 讓已排入的 call_soon_threadsafe 先執行
+        self._has_data.set()     # 消費者取完佇列後結束
+        await consumer
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        await self.flush()
+        checkpoint = getattr(self.engine, "checkpoint", None)
+        if checkpoint is not None:
+            await self._loop.run_in_executor(None, lambda: checkpoint.save(self.engine, sync=True))
+        for fn in self._shutdown_hooks:
+            try:
+                result = fn()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"[LiveRuntime] ⚠️ shutdown hook 失敗：{e}")
+        self._ready.clear()
+        st = self.stats
+        print(f"[LiveRuntime] 已停止｜已處理 {st['processed']}｜合併 {st['coalesced']}｜丟棄 {st['dropped']}")
+        return self.stats
+
+    def stop(self):
+        """執行緒安全：要求停止"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def start(self) -> Dict[str, Any]:
+        """在目前執行緒執行事件迴圈直到停止"""
+        return asyncio.run(self.run())
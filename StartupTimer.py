@@ -0,0 +1,54 @@
+# strategy_v4/StartupTimer.py
+
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# 第一次匯入本模組的時間（main.py 最先匯入，之後的匯入耗時都算在 imports 階段）
+T0 = time.perf_counter()
+
+# 即時路徑不應在啟動時載入的重量級模組
+HEAVY_MODULES = ("pandas", "polars", "polars_talib", "sklearn", "matplotlib")
+
+
+class StartupTimer:
+    """
+    啟動計時：
+    - mark(name) 記錄自上一個標記以來的耗時（imports / login / contracts / engine / restore / ready …）
+    - report() 印出各階段與「不含登入」的就緒時間，超過 budget 時警告
+    - 同時列出已載入的重量級模組，確認快速啟動路徑沒有提早匯入
+    """
+
+    def __init__(self, budget: Dict[str, float] | None = None, start: float | None = None):
+        self.start = T0 if start is None else start
+        self.budget = {"imports": 0.3, "ready": 1.0, **(budget or {})}
+        self.marks: List[Tuple[str, float]] = []
+        self._last = self.start
+
+    def mark(self, name: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.marks.append((name, elapsed))
+        self._last = now
+        return elapsed
+
+    def seconds(self, name: str) -> float:
+        return sum(s for n, s in self.marks if n == name)
+
+    @property
+    def total(self) -> float:
+        return self._last - self.start
+
+    def report(self) -> dict:
+        ready = self.total - self.seconds("login")
+        heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+        parts = "｜".join(f"{n} {s:.3f}s" for n, s in self.marks)
+        print(f"[Startup] {parts}｜總計 {self.total:.3f}s（不含登入 {ready:.3f}s）｜已載入：{', '.join(heavy) or '無重量級模組'}")
+        warnings = []
+        if self.seconds("imports") > self.budget["imports"]:
+            warnings.append(f"匯入 {self.seconds('imports'):.3f}s 超過預算 {self.budget['imports']:.3f}s")
+        if ready > self.budget["ready"]:
+            warnings.append(f"就緒 {ready:.3f}s（不含登入）超過預算 {self.budget['ready']:.3f}s")
+        for w in warnings:
+            print(f"[Startup] ⚠️ {w}")
+        return {"marks": dict(self.marks), "total": self.total, "ready": ready, "heavy": heavy, "warnings": warnings}
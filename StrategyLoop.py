@@ -1,60 +1,77 @@
-from datetime import datetime
-import time
-
-from KlineInitializer import KlineInitializer
+from strategy_v4.LiveRuntime import LiveRuntime
+from strategy_v4.engines.AllocationProfiler import AllocationProfiler
 from strategy_v4.engines.StrategyState import StrategyState
 from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.MarketData import MarketDataAdapter, ReplayAdapter
 from strategy_v4.io.TradeLogger import TradeLogger
 
+
 class StrategyLoop:
-    def __init__(self, api=None, contract=None, simulation=True):
-        self.api = api
-        self.contract = contract
-        self.simulation = simulation
+    """
+    線上策略迴圈：
+    - 行情來自 MarketDataAdapter（ShioajiAdapter 即時 / ReplayAdapter 回放），callback 相同
+    - tick 經 LiveRuntime 交給 TickEngine；回放結束時自動停止
+    - warmup_bars 有提供時先暖機
+    - config["profile"] 為真時以 AllocationProfiler 量測各階段配置與 GC，結束後印出報告（self.profile）
+    """
 
-        self.kline = KlineInitializer()
-        self.state = StrategyState()
+    def __init__(self, adapter: MarketDataAdapter | None = None, code: str | None = None,
+                 config: dict | None = None, warmup_bars=None, trade_logger: TradeLogger | None = None):
+        self.adapter = adapter
+        self.code = code
+        self.config = config or {}
+        self.warmup_bars = warmup_bars
+
+        self.state = StrategyState(config=self.config.get("strategy", {}))
         self.tick_engine = None
-        self.logger = TradeLogger()
+        self.logger = trade_logger or TradeLogger()
+        self.runtime = None
+        self.last_tick: dict | None = None
+        self.profile: dict | None = None
+        self._backpressure = False   # 回放來源：佇列滿時阻塞回放執行緒，不丟 tick
 
     def initialize(self):
-        print("[INIT] 抓取 K 線與指標中...")
-        self.kline.fetch_kline()
-        self.kline.compute_indicators()
-        bias = self.kline.get_market_bias()
-        print(f"[BIAS] 市場偏向：{bias}")
-
-        self.tick_engine = TickEngine(self.state, bias, self.kline.indicators, trade_logger=self.logger)
-
-    def simulate_ticks(self):
-        print("[SIM] 模擬 Tick 資料流中...")
-        ticks = [
-            {"price": 27300, "volume": 20, "bid": 27299, "ask": 27301, "timestamp": datetime.now(), "rsi": 60},
-            {"price": 27290, "volume": 18, "bid": 27289, "ask": 27291, "timestamp": datetime.now(), "rsi": 58},
-            {"price": 27270, "volume": 22, "bid": 27269, "ask": 27271, "timestamp": datetime.now(), "rsi": 55},
-            {"price": 27240, "volume": 25, "bid": 27239, "ask": 27241, "timestamp": datetime.now(), "rsi": 52},
-            {"price": 27210, "volume": 30, "bid": 27209, "ask": 27211, "timestamp": datetime.now(), "rsi": 50}
-        ]
-
-        for tick in ticks:
-            self.tick_engine.on_tick(tick)
-            time.sleep(1)
-
-        # 模擬結束後保險檢查：若還有持倉，強制平倉
-        if self.state.in_position:
-            print("[FORCE_EXIT] 模擬結束仍有持倉，強制平倉")
-            self.logger.log("EXIT", self.state.get_status(), ticks[-1]["price"], ticks[-1])
-            self.state.exit(ticks[-1]["price"])
-
-    def run(self):
-        self.initialize()
-
-        if self.simulation:
-            self.simulate_ticks()
-        else:
-            print("🚀 等待 Tick 觸發策略中...")
-            # 在實盤模式下，也可定期檢查是否需要強制平倉
-            if self.state.in_position and not self.state.should_hold():
-                print("[FORCE_EXIT] 實盤模式保險平倉")
-                self.logger.log("EXIT", self.state.get_status(), None, {})
-                self.state.exit()
+        self.tick_engine = TickEngine(
+            state=self.state,
+            market_bias=self.config.get("market_bias", "neutral"),
+            trade_logger=self.logger,
+            config=self.config.get("strategy", {}),
+        )
+        if self.warmup_bars is not None:
+            self.tick_engine.warm_start(self.warmup_bars)
+        self.runtime = LiveRuntime(self.tick_engine, self.config.get("runtime"))
+
+    def _feed(self, tick: dict):
+        self.last_tick = tick
+        self.runtime.feed(tick, block=self._backpressure)
+
+    def simulate_ticks(self, ticks, speed: float | None = None):
+        """以 ReplayAdapter 回放 tick（list[dict] / DataFrame / 檔案），預設最快速度"""
+        self.adapter = ReplayAdapter(ticks, speed=speed, code=self.code or "REPLAY")
+        return self.run()
+
+    def run(self) -> dict:
+        if self.tick_engine is None:
+            self.initialize()
+        if self.adapter is None:
+            raise ValueError("[StrategyLoop] 未指定行情來源（MarketDataAdapter）")
+
+        self._backpressure = isinstance(self.adapter, ReplayAdapter)
+        self.adapter.subscribe([self.code] if self.code else [], self._feed)
+        self.runtime.on_start(lambda: self.adapter.start(on_done=self.runtime.stop))
+        profiler = AllocationProfiler(self.tick_engine).start() if self.config.get("profile") else None
+        try:
+            stats = self.runtime.start()
+        finally:
+            self.adapter.stop()
+            if profiler is not None:
+                profiler.stop().print_report()
+                self.profile = profiler.report()
+
+        # 結束後保險檢查：若還有持倉，強制平倉
+        if self.state.in_position and self.last_tick is not None:
+            price = self.last_tick["price"]
+            print("[FORCE_EXIT] 結束時仍有持倉，強制平倉")
+            self.logger.log("EXIT", self.state.get_status(), price, self.last_tick)
+            self.state.exit(price, reason="force_exit")
+        return stats
@@ -1,26 +1,41 @@
 # strategy_v4/backtest/BacktestDataLoader.py
 
 import pandas as pd
-from typing import List, Dict
+from typing import Iterable, List, Dict
 from datetime import datetime
+from strategy_v4.pipeline.DataPipeline import DataPipeline
+
+# 時間欄位（與 to_ticks 讀取 timestamp 的優先順序相同）
+TIME_COLUMNS = ("timestamp", "datetime", "Date")
 
 class BacktestDataLoader:
     """
     回測資料載入器：
     - 從 CSV 或 DataFrame 載入 K 線資料
     - 轉換成 tick 格式供 BacktestRunner 使用
+    - 檔案來源經 DataPipeline 延遲掃描，日期區間與欄位選擇下推到讀取階段
     """
 
-    def __init__(self, file_path: str | None = None, df: pd.DataFrame | None = None):
+    def __init__(self, file_path: str | None = None, df: pd.DataFrame | None = None,
+                 start=None, end=None, columns: Iterable[str] | None = None):
         self.file_path = file_path
         self.df = df
+        self.start = start
+        self.end = end
+        self.columns = columns
 
     def load(self) -> pd.DataFrame:
-        """載入資料"""
+        """載入資料（只讀取 start~end 區間與指定欄位）"""
         if self.df is not None:
             return self.df
         if self.file_path:
-            return pd.read_csv(self.file_path)
+            pipeline = DataPipeline()
+            time_col = "datetime"
+            if self.start is not None or self.end is not None:
+                names = pipeline.scan(self.file_path).collect_schema().names()
+                time_col = next((c for c in TIME_COLUMNS if c in names), time_col)
+            lf = pipeline.scan(self.file_path, columns=self.columns, start=self.start, end=self.end, time_col=time_col)
+            return lf.collect().to_pandas()
         raise ValueError("必須提供 file_path 或 df")
 
     def to_ticks(self) -> List[Dict]:
@@ -30,7 +45,7 @@ class BacktestDataLoader:
         ticks = []
         for _, row in df.iterrows():
             tick = {
-                "timestamp": self._parse_time(row.get("timestamp") or row.get("Date")),
+                "timestamp": self._parse_time(row.get("timestamp") or row.get("datetime") or row.get("Date")),
                 "price": float(row.get("close") or row.get("Close")),
                 "volume": float(row.get("volume") or row.get("Volume", 0)),
                 "open": float(row.get("open") or row.get("Open", 0)),
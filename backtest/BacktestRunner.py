@@ -64,8 +64,10 @@ class BacktestRunner:
         for tick in ticks:
             self.engine.on_tick(tick)
 
-        # 強制 flush tick recorder
+        # 強制 flush tick recorder / shadow log
         self.recorder.force_flush()
+        if self.engine.shadow_logger:
+            self.engine.shadow_logger.force_flush()
 
         # 分析結果
         analyzer = TradeAnalyzer("trade_log.csv")
@@ -5,6 +5,7 @@ from strategy_v4.backtest.BacktestRunner import BacktestRunner
 from strategy_v4.models.RegressionCalibrator import RegressionCalibrator
 from strategy_v4.models.ParamsStore import ParamsStore
 from strategy_v4.io.TradeAnalyzer import TradeAnalyzer
+from strategy_v4.pipeline.forward_labels import attach_forward_labels
 
 
 class WalkforwardTester:
@@ -15,10 +16,13 @@ class WalkforwardTester:
     - 自動更新 ParamsStore
     """
 
-    def __init__(self, params_path: str = "calibrated_params.json", config_path: str = "strategy_config.json"):
+    def __init__(self, params_path: str = "calibrated_params.json", config_path: str = "strategy_config.json",
+                 label_horizons: tuple = (5, 10, 30), target_horizon: int = 10):
         self.params_store = ParamsStore(params_path)
         self.params_store.load()
         self.config_path = config_path
+        self.label_horizons = label_horizons
+        self.target_horizon = target_horizon
 
     def split_data(self, ticks: List[Dict], segment_size: int) -> List[List[Dict]]:
         """將 tick 資料分段"""
@@ -28,7 +32,8 @@ class WalkforwardTester:
         """執行單一分段：校正 + 回測"""
         print(f"[Walkforward] Segment {segment_id} | ticks={len(ticks)}")
 
-        # Step 1: 校正權重
+        # Step 1: 產生前瞻標籤（只看本段內資料，避免跨段洩漏）並校正權重
+        attach_forward_labels(ticks, horizons=self.label_horizons, target_horizon=self.target_horizon)
         calibrator = RegressionCalibrator(self.params_store, version_prefix=f"v4-seg{segment_id}")
         new_weights = calibrator.calibrate(ticks, target_key="future_return", version_suffix="")
 
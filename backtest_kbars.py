@@ -1,44 +1,14 @@
 import json
 import shioaji as sj
 import pandas as pd
+import polars as pl
 from datetime import datetime, timedelta
 import calendar
 
-# ====== 讀取設定與登入 ======
-with open("config.json", "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-simulation_mode = config.get("simulation", False)
-api_key = config["api_key"]
-secret_key = config["secret_key"]
-
-# 初始化 Shioaji API
-api = sj.Shioaji(simulation=simulation_mode)
-api.login(api_key=api_key, secret_key=secret_key, contracts_timeout=10000)
-print(f"✅ 登入成功｜模式：{'模擬' if simulation_mode else '真實'}")
-
-# ====== 確保商品檔完整載入 ======
-api.fetch_contracts(contract_download=True)
-
-# ====== 使用近月連續合約 R1（微型台指期貨） ======
-contract = api.Contracts.Futures.TMF.TMFR1
-
-# ====== 設定過去六個月的日期範圍 ======
-today = datetime.today()
-six_months_ago = today - timedelta(days=31 * 6)
-
-start_date = six_months_ago.strftime("%Y-%m-%d")
-end_date = today.strftime("%Y-%m-%d")
-
-print(f"🔎 抓取 {contract.code}｜期間：{start_date} ~ {end_date}")
-
-# ====== 抓取 K 線 ======
-try:
-    kbars = api.kbars(contract=contract, start=start_date, end=end_date)
-    df = pd.DataFrame({**kbars})
-except Exception as e:
-    print("❌ 抓取 K 線失敗:", e)
-    df = pd.DataFrame()
+from strategy_v4.io.ContractCache import ContractCache
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.io.KbarFetcher import KbarFetcher, ShioajiKbarSource
+from strategy_v4.pipeline.BarPyramid import BarPyramid
 
 # ====== 定義事件計算函式（跨年度） ======
 def get_settlement_days(years):
@@ -65,24 +35,32 @@ def get_central_bank_meetings(years):
                 meetings.append(datetime(year, month, thursdays[2]).date())
     return meetings
 
-# ====== 資料整理與存檔 ======
-if df.empty:
-    print("⚠️ 沒有抓到 K 線資料，請確認日期區間或合約是否正確")
-else:
-    # 欄位改名
-    df.rename(columns={
-        "ts": "datetime",
-        "Open": "open",
-        "High": "high",
-        "Low": "low",
-        "Close": "close",
-        "Volume": "volume",
-        "Amount": "amount"
-    }, inplace=True)
-
-    # 時間轉換與索引
-    df["datetime"] = pd.to_datetime(df["datetime"])
-    df.set_index("datetime", inplace=True)
+
+def main():
+    """登入 Shioaji → 產生 events.csv → 增量同步 KbarStore → 建立多週期 K 線"""
+    # ====== 讀取設定與登入 ======
+    with open("config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    simulation_mode = config.get("simulation", False)
+    api_key = config["api_key"]
+    secret_key = config["secret_key"]
+
+    # 初始化 Shioaji API
+    api = sj.Shioaji(simulation=simulation_mode)
+    api.login(api_key=api_key, secret_key=secret_key, contracts_timeout=10000, fetch_contract=False)
+    print(f"✅ 登入成功｜模式：{'模擬' if simulation_mode else '真實'}")
+
+    # ====== 商品檔：同一交易日讀本機快取，否則下載一次 ======
+    cache = ContractCache()
+    cache.ensure(api)
+
+    # ====== 使用近月連續合約 R1（微型台指期貨） ======
+    contract = cache.contract(api, "TMFR1")
+
+    # ====== 設定過去六個月的日期範圍 ======
+    today = datetime.today()
+    six_months_ago = today - timedelta(days=31 * 6)
 
     # ====== 自動產生跨年度事件表 ======
     years = list(range(six_months_ago.year, today.year + 1))
@@ -105,10 +83,10 @@ else:
     # 加入休市日（來自 taifex_calendar.csv）
     try:
         df_calendar = pd.read_csv("taifex_calendar.csv", parse_dates=["date"])
-        df_calendar["event"] = df_calendar["holiday_name"]
-        df_calendar = df_calendar[["date", "event"]]
-        df_events = pd.concat([df_events, df_calendar], ignore_index=True)
+        df_calendar_events = df_calendar[["date"]].assign(event=df_calendar["holiday_name"])
+        df_events = pd.concat([df_events, df_calendar_events], ignore_index=True)
     except Exception as e:
+        df_calendar = pd.DataFrame(columns=["date", "is_holiday"])
         print(f"⚠️ 無法載入 taifex_calendar.csv：{e}")
 
     # 去除重複日期（保留第一筆事件）
@@ -118,37 +96,52 @@ else:
     df_events.to_csv("events.csv", index=False, encoding="utf-8-sig")
     print("✅ 已整合並建立 events.csv（含交割日與休市日）")
 
-    # ====== 標記事件與休市日 ======
-    event_map = dict(zip(df_events["date"], df_events["event"]))
-    df["event"] = df.index.normalize().map(event_map)
-    df["event_flag"] = df["event"].notna()
+    # ====== 標記事件與休市日（套用在每段新抓到的 K 線） ======
+    events_pl = pl.DataFrame({
+        "date": df_events["date"].dt.date.tolist(),
+        "event": df_events["event"].tolist(),
+    })
+    holidays_pl = pl.DataFrame({
+        "date": pd.to_datetime(df_calendar["date"]).dt.date.tolist(),
+        "is_holiday": df_calendar["is_holiday"].fillna(0).astype(int).tolist(),
+    }, schema={"date": pl.Date, "is_holiday": pl.Int64}).unique("date", keep="first")
+    holidays = set(holidays_pl.filter(pl.col("is_holiday") == 1)["date"].to_list())
+
+    def tag_events(df: pl.DataFrame) -> pl.DataFrame:
+        """以日曆日標記 event / event_flag / is_holiday"""
+        return (
+            df.with_columns(pl.col("datetime").dt.date().alias("date"))
+            .join(events_pl, on="date", how="left")
+            .join(holidays_pl, on="date", how="left")
+            .with_columns(
+                pl.col("event").is_not_null().alias("event_flag"),
+                pl.col("is_holiday").fill_null(0),
+            )
+            .drop("date")
+        )
+
+    # ====== 增量抓取 1 分 K（只抓缺少或未收盤的交易日） ======
+    fetch_cfg = config.get("kbar_fetch", {})
+    store = KbarStore()
+    fetcher = KbarFetcher(
+        ShioajiKbarSource(api, {contract.code: contract}),
+        store,
+        max_workers=fetch_cfg.get("max_workers", 4),
+        rate=fetch_cfg.get("rate", 5),
+        per=fetch_cfg.get("per", 1.0),
+        chunk_days=fetch_cfg.get("chunk_days", 5),
+        holidays=holidays,
+        transform=tag_events,
+    )
+    print(f"🔎 同步 {contract.code}｜起始交易日：{six_months_ago.date()}")
+    result = fetcher.sync(contract.code, six_months_ago.date())
+    touched = result["touched"]
+
+    # ====== 多週期 K 線：5m / 15m / 60m / 1d（只重建有更新的交易日，含指標暖機狀態） ======
+    if not touched:
+        print("⚠️ 沒有新的 K 線資料")
+    BarPyramid(store, contract.code).build()
 
-    # 標記休市日（來自 taifex_calendar.csv）
-    try:
-        df_calendar = pd.read_csv("taifex_calendar.csv", parse_dates=["date"])
-        holiday_map = dict(zip(df_calendar["date"], df_calendar["is_holiday"]))
-        df["is_holiday"] = df.index.normalize().map(holiday_map).fillna(0).astype(int)
-    except Exception as e:
-        df["is_holiday"] = 0
-        print(f"⚠️ 無法標記休市日：{e}")
-
-    print("✅ 已標記事件日與休市日")
-
-    # ====== 存檔：1 分 K ======
-    df.to_csv("kbars_6m.csv", mode="w", encoding="utf-8-sig")
-    print(f"✅ 已存成 kbars_6m.csv｜筆數：{len(df)}")
-
-    # ====== 週期轉換：5 分 K ======
-    df_5m = df.resample("5min").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum",
-        "amount": "sum",
-        "event_flag": "max",
-        "is_holiday": "max"
-    }).dropna()
-
-    df_5m.to_csv("kbars_5m.csv", mode="w", encoding="utf-8-sig")
-    print(f"✅ 已存成 kbars_5m.csv｜筆數：{len(df_5m)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# strategy_v4/engines/AllocationProfiler.py
+
+import builtins
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List
+
+import strategy_v4.engines.TickEngine as tick_engine_module
+
+# (stage, 元件屬性路徑, 方法名稱)；屬性路徑為空字串表示 engine 本身
+STAGES = (
+    ("checkpoint", "checkpoint", ("maybe_save",)),
+    ("bars", "bar_refresher", ("on_tick",)),
+    ("multi_tf", "multi_tf_engine", ("update", "extract_features")),
+    ("tracker", "tick_tracker", ("update", "get_multi_status")),
+    ("shadow", "", ("_evaluate_shadows",)),
+    ("decision", "decision_engine", ("evaluate_tick", "detect_market_bias", "score_entry", "score_exit", "should_enter")),
+    ("state", "state", ("update_profit_loss", "get_status")),
+    ("recorder", "tick_recorder", ("record_tick",)),
+    ("trade_log", "logger", ("log",)),
+    ("act", "", ("_act",)),
+    ("signal_bus", "signal_bus", ("publish",)),
+)
+# TickEngine 模組層級函式（以模組全域變數替換）
+MODULE_STAGES = (
+    ("features", "extract_features"),
+    ("log", "print"),
+)
+_MISSING = object()  # 安裝前沒有該屬性（還原時刪除）
+
+
+class StageStats:
+    __slots__ = ("calls", "seconds", "peak_bytes", "net_bytes", "net_blocks", "gc_collections", "gc_pause")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0      # 暫存配置高水位（相對於進入時）累計
+        self.net_bytes = 0       # 離開時仍存活的位元組累計
+        self.net_blocks = 0      # 離開時仍存活的記憶體區塊累計（近似物件數）
+        self.gc_collections = [0, 0, 0]
+        self.gc_pause = 0.0
+
+
+class _Frame:
+    __slots__ = ("stats", "t0", "start", "blocks", "max_peak")
+
+    def __init__(self, stats: StageStats, start: int, blocks: int):
+        self.stats = stats
+        self.start = start
+        self.blocks = blocks
+        self.max_peak = start
+        self.t0 = time.perf_counter()
+
+
+class AllocationProfiler:
+    """
+    TickEngine 配置分析模式（回放時使用，不用於實盤）：
+    - 把 on_tick 的各階段（特徵、多時間框架、決策、紀錄、log 字串輸出…）包上量測，結束後還原
+    - 每階段：呼叫數、耗時、暫存配置高水位（tracemalloc reset_peak）、離開後仍存活的位元組 / 區塊數
+    - gc.callbacks：每次回收（各世代）與暫停時間歸屬到當下執行中的階段
+    - tracemalloc 快照比較：依呼叫位置（檔名:行號）排名每 tick 留存的位元組與物件數
+    - report() 依每 tick 暫存配置排序；per_tick 可直接做配置預算檢查
+    """
+
+    def __init__(self, engine, frames: int = 1, top: int = 15):
+        self.engine = engine
+        self.frames = frames
+        self.top = top
+        self.stages: Dict[str, StageStats] = {}
+        self.total = StageStats()
+        self.ticks = 0
+        self.sites: List[dict] = []
+        self._stack: List[_Frame] = []
+        self._patched: List[tuple] = []
+        self._gc_t0 = 0.0
+        self._baseline = None
+        self._was_tracing = False
+
+    # ===== 量測 =====
+    def _enter(self, stats: StageStats):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            parent = self._stack[-1]
+            parent.max_peak = max(parent.max_peak, peak)
+        tracemalloc.reset_peak()
+        self._stack.append(_Frame(stats, current, sys.getallocatedblocks()))
+
+    def _exit(self):
+        frame = self._stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(frame.max_peak, peak)
+        stats = frame.stats
+        stats.calls += 1
+        stats.seconds += time.perf_counter() - frame.t0
+        stats.peak_bytes += peak - frame.start
+        stats.net_bytes += current - frame.start
+        stats.net_blocks += sys.getallocatedblocks() - frame.blocks
+        if self._stack:
+            parent = self._stack[-1]
+            parent.max_peak = max(parent.max_peak, peak)
+
+    def _wrap(self, stats: StageStats, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            self._enter(stats)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._exit()
+
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    def _on_gc(self, phase: str, info: dict):
+        if phase == "start":
+            self._gc_t0 = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._gc_t0
+        if not self._stack:
+            return
+        for stats in {self._stack[-1].stats, self.total}:
+            stats.gc_collections[info.get("generation", 0)] += 1
+            stats.gc_pause += pause
+
+    # ===== 安裝 / 還原 =====
+    def _patch(self, obj, name: str, wrapper: Callable):
+        """以 wrapper 取代 obj 的屬性，並記錄原本的（實例 / 模組）屬性供 stop() 還原"""
+        self._patched.append((obj, name, vars(obj).get(name, _MISSING)))
+        setattr(obj, name, wrapper)
+
+    def start(self) -> "AllocationProfiler":
+        engine = self.engine
+        for stage, path, methods in STAGES:
+            obj = getattr(engine, path, None) if path else engine
+            if obj is None:
+                continue
+            stats = self.stages.setdefault(stage, StageStats())
+            for name in methods:
+                fn = getattr(obj, name, None)
+                if callable(fn):
+                    self._patch(obj, name, self._wrap(stats, fn))
+        for stage, name in MODULE_STAGES:
+            stats = self.stages.setdefault(stage, StageStats())
+            fn = getattr(tick_engine_module, name, None) or getattr(builtins, name)
+            self._patch(tick_engine_module, name, self._wrap(stats, fn))
+        self._patch(engine, "_on_tick", self._wrap(self.total, engine._on_tick))
+
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start(self.frames)
+        gc.callbacks.append(self._on_gc)
+        self._baseline = tracemalloc.take_snapshot()
+        return self
+
+    def stop(self) -> "AllocationProfiler":
+        if self._baseline is None:
+            return self
+        end = tracemalloc.take_snapshot()
+        gc.callbacks.remove(self._on_gc)
+        if not self._was_tracing:
+            tracemalloc.stop()
+
+        ticks = max(self.total.calls, 1)
+        skip = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        diffs = end.filter_traces(skip).compare_to(self._baseline.filter_traces(skip), "lineno")
+        self.sites = [
+            {"site": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+             "bytes_per_tick": d.size_diff / ticks, "objects_per_tick": d.count_diff / ticks}
+            for d in sorted(diffs, key=lambda d: -d.size_diff)[:self.top] if d.size_diff > 0
+        ]
+        for obj, name, previous in reversed(self._patched):
+            if previous is _MISSING:
+                delattr(obj, name)           # 實例屬性移除後回到類別方法 / 內建函式
+            else:
+                setattr(obj, name, previous)  # 安裝前已有的實例屬性（例如另一個 profiler 的 wrapper）
+        self._patched.clear()
+        self._baseline = None
+        self.ticks = self.total.calls
+        return self
+
+    def __enter__(self) -> "AllocationProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def run(self, ticks: Iterable[dict]) -> dict:
+        """以 tick 列表回放並回傳報告"""
+        with self:
+            for tick in ticks:
+                self.engine.on_tick(dict(tick))
+        return self.report()
+
+    # ===== 報告 =====
+    @staticmethod
+    def _row(stats: StageStats, ticks: int) -> dict:
+        return {
+            "calls": stats.calls,
+            "us_per_tick": stats.seconds / ticks * 1e6,
+            "peak_bytes_per_tick": stats.peak_bytes / ticks,
+            "net_bytes_per_tick": stats.net_bytes / ticks,
+            "net_blocks_per_tick": stats.net_blocks / ticks,
+            "gc_collections": list(stats.gc_collections),
+            "gc_pause_ms": stats.gc_pause * 1000,
+        }
+
+    def report(self) -> dict:
+        ticks = max(self.ticks or self.total.calls, 1)
+        stages = {name: self._row(s, ticks) for name, s in self.stages.items() if s.calls}
+        ranked = sorted(stages, key=lambda n: -stages[n]["peak_bytes_per_tick"])
+        return {
+            "ticks": self.ticks,
+            "per_tick": self._row(self.total, ticks),
+            "stages": {name: stages[name] for name in ranked},
+            "sites": self.sites,
+        }
+
+    def print_report(self):
+        rep = self.report()
+        total = rep["per_tick"]
+        print(f"[AllocationProfiler] {rep['ticks']} ticks｜{total['us_per_tick']:.1f} us/tick｜"
+              f"暫存高水位 {total['peak_bytes_per_tick']:,.0f} B/tick｜留存 {total['net_bytes_per_tick']:,.0f} B/tick｜"
+              f"GC {total['gc_collections']}（{total['gc_pause_ms']:.2f} ms）")
+        for name, row in rep["stages"].items():
+            print(f"  {name:<11} {row['us_per_tick']:>9.1f} us  峰值 {row['peak_bytes_per_tick']:>10,.0f} B  "
+                  f"留存 {row['net_bytes_per_tick']:>8,.0f} B / {row['net_blocks_per_tick']:>6.2f} 區塊  "
+                  f"GC {row['gc_collections']} {row['gc_pause_ms']:.2f} ms")
+        for site in rep["sites"]:
+            print(f"  {site['bytes_per_tick']:>9,.1f} B  {site['objects_per_tick']:>6.2f} obj  {site['site']}")
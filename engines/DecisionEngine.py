@@ -1,6 +1,7 @@
 # strategy_v4/engines/DecisionEngine.py
 
-from typing import Optional
+import numpy as np
+from typing import Dict, Optional
 
 class DecisionEngine:
     def __init__(self, market_bias: str = "neutral", indicators: dict | None = None, tick_tracker: Optional[object] = None):
@@ -266,3 +267,194 @@ class DecisionEngine:
             )
         else:
             return abs(score) >= self.cfg["neutral_score_abs"]
+
+    # ===== 欄位化（向量）評估：與逐筆路徑結果一致 =====
+    def _as_columns(self, data) -> Dict[str, np.ndarray]:
+        """
+        將輸入轉為 {欄位: ndarray}：
+        - 支援 dict[str, array-like]、pandas.DataFrame、polars.DataFrame
+        - polars 的 null 與 dict 中的 None 一律視為 0（對齊逐筆路徑的 `x or default` 語意）
+        - polars 只取數值 / 布林欄位（datetime、字串欄位不參與計算，也無法以 0 填補）
+        - NaN 保持 NaN（逐筆路徑中 NaN 為 truthy，不會被預設值取代）
+        """
+        if type(data).__module__.startswith("polars"):
+            import polars.selectors as cs
+
+            numeric = data.select(cs.numeric() | cs.boolean())
+            return {c: numeric[c].fill_null(0).to_numpy() for c in numeric.columns}
+        cols = {}
+        for c in data.keys():
+            arr = np.asarray(data[c])
+            if arr.dtype == object:
+                arr = np.where(np.equal(arr, None), 0, arr)
+            cols[c] = arr
+        return cols
+
+    @staticmethod
+    def _num(cols: Dict[str, np.ndarray], name: str, default: float, n: int) -> np.ndarray:
+        """數值欄位：缺欄或 0/None → default（對齊 `float(tick.get(name, d) or d)`）"""
+        if name not in cols:
+            return np.full(n, float(default))
+        arr = cols[name].astype(np.float64)
+        return np.where(arr == 0, float(default), arr)
+
+    @staticmethod
+    def _flag(cols: Dict[str, np.ndarray], name: str, n: int) -> np.ndarray:
+        """布林欄位：對齊 Python truthy 判斷（NaN 視為 True）"""
+        if name not in cols:
+            return np.zeros(n, dtype=bool)
+        return cols[name].astype(np.float64) != 0
+
+    @staticmethod
+    def _nrows(cols: Dict[str, np.ndarray]) -> int:
+        return len(next(iter(cols.values()))) if cols else 0
+
+    def _macd_columns(self, cols: Dict[str, np.ndarray], n: int):
+        macd = self._num(cols, "macd", 0, n)
+        signal = self._num(cols, "macd_signal", 0, n)
+        raw_hist = self._num(cols, "macd_hist", 0, n)
+        hist = np.where(raw_hist == 0, macd - signal, raw_hist)
+        return macd, signal, hist
+
+    def _tracker_columns(self, cols: Dict[str, np.ndarray], n: int):
+        """
+        momentum / direction_score 欄位（對應 _extract_tracker_signals）：
+        - 欄位化模式沒有逐筆 tracker 狀態，momentum 取自 momentum 欄位
+        - 方向分數一律由 momentum 幅度推估；輸入的 direction_score 欄位忽略（逐筆路徑會重算並覆寫）
+        """
+        momentum = self._num(cols, "momentum", 0, n)
+        derived = np.where(np.abs(momentum) >= self.cfg["momentum_abs_min"], np.sign(momentum), 0.0)
+        return momentum, np.nan_to_num(derived).astype(np.int64)
+
+    def detect_market_bias_columns(self, data) -> np.ndarray:
+        """detect_market_bias 的欄位版本，回傳 bullish/bearish/neutral 字串陣列"""
+        cols = self._as_columns(data)
+        n = self._nrows(cols)
+        adx = self._num(cols, "adx", 0, n)
+        ema5 = self._num(cols, "ema5", 0, n)
+        ema20 = self._num(cols, "ema20", 0, n)
+        macd, signal, hist = self._macd_columns(cols, n)
+        rsi = self._num(cols, "rsi", 50, n)
+
+        score = np.where(ema5 > ema20, 1, -1) + np.where(macd > signal, 1, -1)
+        score += np.where(hist > 0.3, 1, np.where(hist < -0.3, -1, 0))
+        score += np.where(rsi > 65, 1, np.where(rsi < 35, -1, 0))
+
+        bias = np.where(score > 0, "bullish", np.where(score < 0, "bearish", "neutral"))
+        return np.where(adx < self.cfg["adx_consolidation"], "neutral", bias)
+
+    def entry_strength_score_columns(self, data) -> np.ndarray:
+        """entry_strength_score 的欄位版本（含 -99 盤整過濾），回傳 int64 陣列"""
+        cols = self._as_columns(data)
+        n = self._nrows(cols)
+        macd, signal, hist = self._macd_columns(cols, n)
+        rsi = self._num(cols, "rsi", 50, n)
+        ema5 = self._num(cols, "ema5", 0, n)
+        ema20 = self._num(cols, "ema20", 0, n)
+        vwap = self._num(cols, "vwap", 0, n)
+        price = self._num(cols, "price", 0, n)
+        close = self._num(cols, "close", 0, n) if "close" in cols else price
+        close = np.where(close == 0, price, close)
+        adx = self._num(cols, "adx", 0, n)
+        atr = self._num(cols, "atr", 0, n)
+        volume = self._num(cols, "volume", 0, n)
+
+        score = ((macd > signal) & (hist > 0.8)).astype(np.int64)
+        score += (close > vwap) & (ema5 > ema20) & (rsi > self.cfg["rsi_bullish_min"])
+
+        # 多週期確認
+        score += (
+            self._flag(cols, "is_ready_5m", n) & self._flag(cols, "is_ready_15m", n)
+            & (self._num(cols, "rsi_5m", 50, n) > 55)
+            & (self._num(cols, "ema_15m", 0, n) > self._num(cols, "ema_5m", 0, n))
+        )
+
+        score += (close > vwap) & (volume >= 5)
+        score += np.where((adx > 20) & (atr >= self.cfg["atr_high"]), 1, np.where(atr <= self.cfg["atr_low"], -1, 0))
+
+        momentum, direction_score = self._tracker_columns(cols, n)
+        score += np.abs(momentum) >= self.cfg["momentum_abs_min"]
+        score += direction_score
+
+        consolidation = (adx < self.cfg["adx_consolidation"]) & (np.abs(macd - signal) < 0.3)
+        return np.where(consolidation, -99, score)
+
+    def score_exit_columns(self, data) -> np.ndarray:
+        """score_exit 的欄位版本，回傳 float64 陣列"""
+        cols = self._as_columns(data)
+        n = self._nrows(cols)
+        macd, signal, hist = self._macd_columns(cols, n)
+        rsi = self._num(cols, "rsi", 50, n)
+        ema5 = self._num(cols, "ema5", 0, n)
+        ema20 = self._num(cols, "ema20", 0, n)
+        vwap = self._num(cols, "vwap", 0, n)
+        close = self._num(cols, "close", 0, n)
+        price = self._num(cols, "price", 0, n) if "price" in cols else close
+        price = np.where(price == 0, close, price)
+        adx = self._num(cols, "adx", 0, n)
+        atr = self._num(cols, "atr", 0, n)
+        momentum, direction_score = self._tracker_columns(cols, n)
+
+        score = np.where(atr >= self.cfg["atr_high"], 1.0, 0.0)
+        score += np.where(adx < self.cfg["adx_consolidation"], 0.5, 0.0)
+        score += np.where(ema5 < ema20, 1.0, 0.0)
+        score += np.where(rsi >= self.cfg["rsi_overbought"], 1.0, 0.0)
+        score += np.where(rsi <= self.cfg["rsi_bearish_max"], 0.5, 0.0)
+        score += np.where((macd < signal) | (hist < 0), 1.0, 0.0)
+        score += np.where(price < vwap, 0.5, 0.0)
+        score += np.where(np.abs(momentum) < self.cfg["momentum_abs_min"], 0.5, 0.0)
+        score += np.where(direction_score < 0, 0.5, 0.0)
+        return score
+
+    def should_enter_columns(self, data, entry_score: np.ndarray | None = None,
+                             bias: np.ndarray | None = None) -> np.ndarray:
+        """
+        should_enter 的欄位版本，回傳 bool 陣列
+        - 可傳入已算好的 entry_score / bias 避免重算
+        """
+        cols = self._as_columns(data)
+        n = self._nrows(cols)
+        score = self.entry_strength_score_columns(cols) if entry_score is None else entry_score
+        if self.market_bias != "auto":
+            bias = np.full(n, self.market_bias)
+        elif bias is None:
+            bias = self.detect_market_bias_columns(cols)
+
+        momentum, direction_score = self._tracker_columns(cols, n)
+        ema5 = self._num(cols, "ema5", 0, n)
+        ema20 = self._num(cols, "ema20", 0, n)
+        vwap = self._num(cols, "vwap", 0, n)
+        rsi = self._num(cols, "rsi", 50, n)
+        close = self._num(cols, "close", 0, n) if "close" in cols else self._num(cols, "price", 0, n)
+
+        # 構面檢查（以否定形式對齊逐筆路徑的提前 return，保留 NaN 語意）
+        ok = (score != -99) & ~(np.abs(momentum) < self.cfg["momentum_abs_min"])
+        ok &= (direction_score != 0) & self._flag(cols, "is_ready", n)
+
+        bull = (score >= self.cfg["bull_score_min"]) & (close > vwap) & (ema5 > ema20) & (rsi < self.cfg["rsi_overbought"])
+        bear = (score <= self.cfg["bear_score_max"]) & (ema5 < ema20)
+        neutral = np.abs(score) >= self.cfg["neutral_score_abs"]
+
+        decided = np.where(bias == "bullish", bull, np.where(bias == "bearish", bear, neutral))
+        return ok & decided
+
+    def evaluate_columns(self, data) -> Dict[str, np.ndarray]:
+        """
+        欄位化整合評估（研究/規則篩選用）：
+        - 一次輸出 bias、entry_score、exit_score、should_enter 與 momentum/direction_score
+        - 結果與逐筆 detect_market_bias/score_entry/score_exit/should_enter 相同
+        - polars 使用者可直接 df.with_columns(pl.DataFrame(result))
+        """
+        cols = self._as_columns(data)
+        n = self._nrows(cols)
+        bias = self.detect_market_bias_columns(cols)
+        entry_score = self.entry_strength_score_columns(cols)
+        momentum, direction_score = self._tracker_columns(cols, n)
+        return {
+            "bias": bias,
+            "entry_score": entry_score,
+            "exit_score": self.score_exit_columns(cols),
+            "should_enter": self.should_enter_columns(cols, entry_score=entry_score, bias=bias),
+            "momentum": momentum,
+            "direction_score": direction_score,
+        }
@@ -1,6 +1,8 @@
 # strategy_v4/engines/ExitStrategySimulator.py
 
-from typing import Dict, List
+import itertools
+import numpy as np
+from typing import Any, Dict, List, Sequence
 from strategy_v4.engines.StrategyState import StrategyState
 
 class ExitStrategySimulator:
@@ -8,8 +10,12 @@ class ExitStrategySimulator:
     出場策略模擬器：
     - 模擬不同出場條件 (停損、停利、exit_score、時間退出)
     - 支援 v3/v4 模式比較
+    - simulate_grid：以 NumPy broadcasting 一次評估整組出場參數網格
     """
 
+    # 與 TickEngine 出場判斷順序一致（同一 tick 多條件觸發時取前者）
+    EXIT_REASONS = ("stoploss", "takeprofit", "exit_score", "tick_exit", "open")
+
     def __init__(self, config: dict | None = None):
         cfg = config or {}
         risk_cfg = cfg.get("risk", {})
@@ -43,7 +49,7 @@ class ExitStrategySimulator:
             results["takeprofit"] = True
 
         # exit_score (v4)
-        if exit_score is not None and state.should_exit_by_score(exit_score, self.exit_threshold):
+        if exit_score is not None and state.in_position and float(exit_score) >= self.exit_threshold:
             results["exit_score"] = True
 
         # tick-based exit
@@ -65,3 +71,113 @@ class ExitStrategySimulator:
             res = self.simulate_exit(state, tick)
             results.append(res)
         return results
+
+    # ===== 批次網格模擬 =====
+    @staticmethod
+    def extract_paths(series: Sequence[float], entry_idx: Sequence[int], horizon: int) -> np.ndarray:
+        """
+        從一條時間序列切出每筆進場後的路徑：
+        - 回傳 (E, horizon)，第 j 欄為 entry_idx + 1 + j（進場後第 j+1 筆）
+        - 超出序列的部分補 NaN
+        """
+        arr = np.asarray(series, dtype=np.float64)
+        padded = np.concatenate((arr, np.full(horizon + 1, np.nan)))
+        idx = np.asarray(entry_idx, dtype=np.int64)[:, None] + 1 + np.arange(horizon)[None, :]
+        return padded[idx]
+
+    @staticmethod
+    def _first_hit(hits: np.ndarray, sentinel: int) -> np.ndarray:
+        """沿最後一軸找第一個 True 的位置，沒有則回傳 sentinel"""
+        return np.where(hits.any(axis=-1), hits.argmax(axis=-1), sentinel)
+
+    def simulate_grid(
+        self,
+        entry_prices: Sequence[float],
+        directions: Sequence,
+        prices,
+        atrs,
+        exit_scores=None,
+        grid: Dict[str, Sequence[float]] | None = None,
+        return_arrays: bool = False,
+    ) -> List[Dict[str, Any]] | Dict[str, Any]:
+        """
+        一次評估多組出場設定：
+        :param entry_prices: (E,) 進場價
+        :param directions: (E,) "long"/"short" 或 +1/-1
+        :param prices: (E, T) 進場後的價格路徑（不足補 NaN，可用 extract_paths 產生）
+        :param atrs: (E, T) 或 (E,) ATR
+        :param exit_scores: (E, T) exit_score 路徑；None 表示不啟用 exit_score 出場（v3）
+        :param grid: {"k_sl": [...], "k_tp": [...], "exit_threshold": [...], "max_ticks": [...]}，缺省用本身設定
+        :return: 每組設定的 PnL、持倉 tick 數與出場原因分布；return_arrays=True 時另附 (S,P,X,M,E) 陣列
+
+        判斷與 TickEngine 相同：進場後第 j 筆（tick_since_entry=j+1）依序檢查
+        停損 → 停利 → exit_score → tick 數；路徑結束仍未出場記為 open 並以最後價格結算。
+        時間出場依賴實際時鐘，無法在此模擬。
+        """
+        grid = grid or {}
+        k_sl = np.asarray(grid.get("k_sl", [self.k_sl]), dtype=np.float64)
+        k_tp = np.asarray(grid.get("k_tp", [self.k_tp]), dtype=np.float64)
+        thresholds = np.asarray(grid.get("exit_threshold", [self.exit_threshold]), dtype=np.float64)
+        max_ticks = np.asarray(grid.get("max_ticks", [self.max_ticks]), dtype=np.int64)
+
+        entry = np.asarray(entry_prices, dtype=np.float64)
+        sign = np.array([
+            (1.0 if d == "long" else -1.0) if isinstance(d, str) else (1.0 if d > 0 else -1.0)
+            for d in directions
+        ])
+        px = np.asarray(prices, dtype=np.float64)
+        E, T = px.shape
+        atr = np.asarray(atrs, dtype=np.float64)
+        if atr.ndim == 1:
+            atr = np.broadcast_to(atr[:, None], (E, T))
+
+        pnl = sign[:, None] * (px - entry[:, None])       # (E, T)，NaN 比較恆為 False
+        last = np.isfinite(px).sum(axis=1) - 1             # 每筆路徑最後一個有效位置
+        sentinel = T
+
+        # 各參數獨立求「第一次觸發位置」，再以 broadcasting 組合成整個網格
+        first_sl = self._first_hit(pnl[None] <= -(k_sl[:, None, None] * atr[None]), sentinel)       # (S, E)
+        first_tp = self._first_hit(pnl[None] >= k_tp[:, None, None] * atr[None], sentinel)          # (P, E)
+        if exit_scores is None:
+            first_x = np.full((len(thresholds), E), sentinel)
+        else:
+            xs = np.asarray(exit_scores, dtype=np.float64)
+            first_x = self._first_hit(xs[None] >= thresholds[:, None, None], sentinel)              # (X, E)
+        first_m = np.maximum(max_ticks - 1, 0)                                                       # (M,)
+
+        fs = first_sl[:, None, None, None, :]
+        fp = first_tp[None, :, None, None, :]
+        fx = first_x[None, None, :, None, :]
+        fm = first_m[None, None, None, :, None]
+        fe = np.maximum(last, 0)[None, None, None, None, :]
+
+        exit_idx = np.minimum(np.minimum(np.minimum(fs, fp), np.minimum(fx, fm)), fe)
+        reason = np.select(
+            [fs == exit_idx, fp == exit_idx, fx == exit_idx, fm == exit_idx],
+            [0, 1, 2, 3], default=4,
+        )
+        exit_pnl = pnl[np.arange(E), exit_idx]
+        holding = exit_idx + 1
+
+        results: List[Dict[str, Any]] = []
+        for (i, a), (j, b), (k, c), (m, d) in itertools.product(
+            enumerate(k_sl), enumerate(k_tp), enumerate(thresholds), enumerate(max_ticks)
+        ):
+            p = exit_pnl[i, j, k, m]
+            counts = np.bincount(reason[i, j, k, m], minlength=len(self.EXIT_REASONS))
+            results.append({
+                "k_sl": float(a),
+                "k_tp": float(b),
+                "exit_threshold": float(c),
+                "max_ticks": int(d),
+                "count": int(E),
+                "total_pnl": round(float(np.nansum(p)), 2),
+                "avg_pnl": round(float(np.nanmean(p)), 2) if E else 0.0,
+                "win_rate": round(float(np.mean(p > 0)), 3) if E else 0.0,
+                "avg_holding_ticks": round(float(np.mean(holding[i, j, k, m])), 2) if E else 0.0,
+                "exit_reasons": {r: int(n) for r, n in zip(self.EXIT_REASONS, counts)},
+            })
+
+        if return_arrays:
+            return {"results": results, "pnl": exit_pnl, "holding_ticks": holding, "reason": reason}
+        return results
@@ -0,0 +1,199 @@
+# strategy_v4/engines/LiveBarRefresher.py
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping
+
+import numpy as np
+
+# 由最近一根已收盤 K 棒補入 tick 的指標
+BAR_INDICATOR_KEYS = ("rsi", "macd", "macd_signal", "macd_hist", "kd_k", "kd_d", "atr")
+
+
+class BarSnapshot:
+    """已發布的指標快照（不可變）：讀取端拿到的物件不會再被修改"""
+
+    __slots__ = ("bar_time", "values", "version")
+
+    def __init__(self, bar_time: datetime | None = None, values: Dict[str, float] | None = None, version: int = 0):
+        object.__setattr__(self, "bar_time", bar_time)
+        object.__setattr__(self, "values", MappingProxyType(dict(values or {})))
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("BarSnapshot 為不可變物件")
+
+
+class LiveBarRefresher:
+    """
+    即時 1m K 棒與指標刷新：
+    - on_tick()（tick 執行緒）只更新當根 K 棒的 OHLCV；跨分鐘時計算上一根收盤 K 棒
+    - async_=False（預設，回測 / 回放）：收盤 K 棒在 on_tick 內同步計算，下一個 tick 必定看到新指標，結果可重現
+    - async_=True（即時盤）：收盤 K 棒交給背景 worker，IncrementalIndicators 增量計算完成後整個替換 snapshot 參考
+    - 讀取端只讀 self.snapshot 一次（單一參考讀取，不需鎖），tick 執行緒不做任何指標計算
+    - reset() / update() 為同步版本，用於啟動暖機與外部補 K 棒
+    - 每次計算完成時一併發布指標狀態（_exported），export_state() 不等待背景計算也不取 _lock
+    - polars / IncrementalIndicators 在第一次計算時才載入（檢查點還原只保存狀態 dict，快速啟動）
+    """
+
+    def __init__(self, keys=BAR_INDICATOR_KEYS, async_: bool = False):
+        self.keys = tuple(keys)
+        self.async_ = async_
+        self.snapshot = BarSnapshot()
+        self.forming: Dict | None = None        # 當根（未收盤）K 棒
+        self.closed_bars = 0
+        self._state = None                       # IncrementalIndicators，第一次計算時建立
+        self._saved: dict | None = None          # 檢查點還原的狀態（尚未建立 _state）
+        self._lock = threading.Lock()            # 保護 _state（worker 與同步 update / reset）
+        self._exported = (None, self.snapshot)   # worker 最近一次發布的 (指標狀態 dict, 對應的 snapshot)
+        self._inflight: List[dict] = []          # 已送出、尚未反映在 _exported 的收盤 K 棒
+        self._inflight_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: Future | None = None
+
+    # ===== tick 執行緒 =====
+    def on_tick(self, price: float, volume: float, timestamp: datetime) -> bool:
+        """
+        更新當根 K 棒；跨分鐘時回傳 True（上一根已計算，或 async_ 時已送出計算）
+        - K 棒時間為該分鐘開始時間（與 KbarStore / BarPyramid 相同）
+        """
+        minute = timestamp.replace(second=0, microsecond=0)
+        bar = self.forming
+        if bar is not None and bar["datetime"] == minute:
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += volume
+            return False
+
+        closed = bar is not None and minute > bar["datetime"]
+        if closed:
+            self._submit([bar])
+        if bar is None or closed:
+            self.forming = {"datetime": minute, "open": price, "high": price, "low": price,
+                            "close": price, "volume": volume}
+        return closed
+
+    def _submit(self, bars: List[dict]):
+        if not self.async_:
+            self._apply(bars)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LiveBarRefresher")
+        with self._inflight_lock:
+            self._inflight.extend(bars)
+        self._pending = self._executor.submit(self._apply, bars, len(bars))
+
+    # ===== 背景 worker =====
+    def _indicators(self):
+        if self._state is None:
+            from strategy_v4.pipeline.polars_indicator_utils import IncrementalIndicators
+
+            saved, self._saved = self._saved, None
+            self._state = (IncrementalIndicators.from_dict(saved, max_rows=1) if saved is not None
+                           else IncrementalIndicators(max_rows=1))
+        return self._state
+
+    def _apply(self, bars, queued: int = 0) -> BarSnapshot:
+        from strategy_v4.pipeline.polars_indicator_utils import as_polars
+
+        bars = as_polars(bars)
+        with self._lock:
+            frame = self._indicators().update(bars)
+            snapshot = self.snapshot
+            if frame is not None and frame.height > 0 and "rsi" in frame.columns:
+                last = frame.row(-1, named=True)
+                self.closed_bars += bars.height
+                snapshot = self._publish(last, last.get("datetime"))
+            self._exported = (self._state.to_dict(), snapshot)
+        if queued:
+            with self._inflight_lock:
+                del self._inflight[:queued]   # 單一 worker 依送出順序完成
+        return snapshot
+
+    def _publish(self, row: Mapping, bar_time: datetime | None) -> BarSnapshot:
+        values = {k: round(float(row[k]), 4) for k in self.keys
+                  if row.get(k) is not None and not np.isnan(row[k])}
+        snapshot = BarSnapshot(bar_time, values, self.snapshot.version + 1)
+        self.snapshot = snapshot  # 原子替換參考
+        return snapshot
+
+    # ===== 同步介面 =====
+    def update(self, bars) -> BarSnapshot:
+        """同步計算已收盤 K 棒（已計算過的時間會被略過）"""
+        self.flush()
+        return self._apply(bars)
+
+    def reset(self, bars=None, state: dict | None = None) -> BarSnapshot:
+        """
+        清空狀態後以歷史 K 棒重新計算（暖機）：
+        - state 為 IncrementalIndicators.to_dict()（例如 BarPyramid.warm_state）時由該狀態接續，只計算之後的 K 棒
+        """
+        self.flush()
+        with self._lock:
+            self._state, self._saved = None, state
+            self.snapshot = BarSnapshot()
+            self.forming = None
+            self.closed_bars = 0
+            if state is not None:
+                warm = self._indicators()
+                self._publish(warm.last_values(), warm.last_datetime)
+            self._exported = (state, self.snapshot)
+        return self.update(bars) if bars is not None else self.snapshot
+
+    def flush(self, timeout: float | None = None):
+        """等待背景計算完成"""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def close(self):
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def values(self) -> Mapping[str, float]:
+        return self.snapshot.values
+
+    # ===== 檢查點 =====
+    def export_state(self) -> dict:
+        """
+        檢查點匯出（tick 執行緒呼叫，不等待背景計算）：
+        - 指標狀態與快照取自最近一次發布的 _exported（兩者一致）
+        - 已送出但尚未計算完成的收盤 K 棒放在 pending，還原時補算（重複的 K 棒依時間略過）
+        """
+        with self._inflight_lock:
+            pending = [dict(bar, datetime=bar["datetime"].isoformat()) for bar in self._inflight]
+        indicators, snap = self._exported
+        forming = dict(self.forming) if self.forming else None
+        if forming:
+            forming["datetime"] = forming["datetime"].isoformat()
+        return {
+            "indicators": indicators,
+            "values": dict(snap.values),
+            "bar_time": snap.bar_time.isoformat() if snap.bar_time else None,
+            "version": snap.version,
+            "forming": forming,
+            "pending": pending,
+        }
+
+    def load_state(self, state: dict):
+        self.flush()
+        with self._lock:
+            self._state, self._saved = None, state["indicators"]
+            bar_time = datetime.fromisoformat(state["bar_time"]) if state.get("bar_time") else None
+            self.snapshot = BarSnapshot(bar_time, state.get("values"), state.get("version", 0))
+            forming = state.get("forming")
+            if forming:
+                forming = dict(forming, datetime=datetime.fromisoformat(forming["datetime"]))
+            self.forming = forming
+            self._exported = (self._saved, self.snapshot)
+        with self._inflight_lock:
+            self._inflight.clear()
+        pending = [dict(bar, datetime=datetime.fromisoformat(bar["datetime"])) for bar in state.get("pending") or []]
+        if pending:
+            self._apply(pending)
@@ -76,6 +76,37 @@ class MultiTimeframeEngine:
             if len(self.close_15m) > 500:
                 self.close_15m.pop(0)
 
+    def seed(self, closes_1m: List[float], volumes: List[float],
+             closes_5m: List[float] | None = None, closes_15m: List[float] | None = None):
+        """
+        以歷史 K 棒暖機：
+        - closes_5m / closes_15m 未提供時，依 update() 的取樣規則（每 5 / 15 筆取一筆）由 1m 收盤切出
+        - tick_count 接續 1m 筆數，之後的 update() 取樣節奏不變
+        """
+        self.close_1m = [float(x) for x in closes_1m]
+        self.volumes = [float(x) for x in volumes]
+        if closes_5m is None:
+            closes_5m = self.close_1m[4::5]
+        if closes_15m is None:
+            closes_15m = self.close_1m[14::15]
+        self.close_5m = [float(x) for x in closes_5m][-500:]
+        self.close_15m = [float(x) for x in closes_15m][-500:]
+        self.tick_count = len(self.close_1m)
+
+    def export_state(self) -> dict:
+        return {
+            "tick_count": self.tick_count,
+            "close_1m": np.array(self.close_1m, dtype=np.float64),
+            "close_5m": np.array(self.close_5m, dtype=np.float64),
+            "close_15m": np.array(self.close_15m, dtype=np.float64),
+            "volumes": np.array(self.volumes, dtype=np.float64),
+        }
+
+    def load_state(self, state: dict):
+        self.seed(state["close_1m"].tolist(), state["volumes"].tolist(),
+                  state["close_5m"].tolist(), state["close_15m"].tolist())
+        self.tick_count = int(state["tick_count"])
+
     def extract_features(self) -> Dict[str, float]:
         """輸出多時間框架特徵"""
         features = {}
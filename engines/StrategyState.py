@@ -130,6 +130,24 @@ class StrategyState:
             "params_version": self.params_version,
         }
 
+    # ===== 檢查點 =====
+    STATE_FIELDS = (
+        "in_position", "direction", "entry_price", "current_position_size", "max_profit", "max_loss",
+        "tick_since_entry", "last_rsi", "last_macd", "last_kd_k", "last_kd_d", "mode", "params_version",
+    )
+
+    def export_state(self) -> dict:
+        """匯出持倉與損益追蹤狀態（風控參數來自 config，不列入）"""
+        out = {k: getattr(self, k) for k in self.STATE_FIELDS}
+        out["entry_time"] = self.entry_time.isoformat() if self.entry_time else None
+        return out
+
+    def load_state(self, state: dict):
+        for k in self.STATE_FIELDS:
+            if k in state:
+                setattr(self, k, state[k])
+        self.entry_time = datetime.fromisoformat(state["entry_time"]) if state.get("entry_time") else None
+
     def just_entered(self, seconds: int = 3) -> bool:
         if not self.entry_time:
             return False
@@ -1,18 +1,26 @@
 # strategy_v4/engines/TickEngine.py
 
+import time
 from datetime import datetime
+
+import numpy as np
+
 from strategy_v4.engines.StrategyState import StrategyState
 from strategy_v4.engines.DecisionEngine import DecisionEngine          # v3 規則型
 from strategy_v4.engines.DecisionEngine_v2 import DecisionEngineV2     # v4 回歸型
 from strategy_v4.engines.TickPatternTracker import TickPatternTracker
 from strategy_v4.io.TradeLogger import TradeLogger
 from strategy_v4.io.TickRecorder import TickRecorder
+from strategy_v4.io.ShadowLogger import ShadowLogger
+from strategy_v4.io.EngineCheckpoint import EngineCheckpoint
+from strategy_v4.io.EngineMetrics import EngineMetrics
+from strategy_v4.io.SignalBus import SignalBus
 from strategy_v4.engines.IndicatorEngine import extract_features
+from strategy_v4.engines.LiveBarRefresher import BAR_INDICATOR_KEYS, LiveBarRefresher
 from strategy_v4.engines.MultiTimeframeEngine import MultiTimeframeEngine
 from strategy_v4.models.ParamsStore import ParamsStore
 
 
-
 class TickEngine:
     def __init__(
         self,
@@ -23,15 +31,30 @@ class TickEngine:
         mode: str = "rule_based",  # rule_based | regression_based
         params_store: ParamsStore | None = None,
         config: dict | None = None,
+        shadow_engines: dict | None = None,
+        shadow_logger: ShadowLogger | None = None,
+        checkpoint: EngineCheckpoint | None = None,
+        signal_bus: SignalBus | None = None,
+        metrics: EngineMetrics | None = None,
+        async_bars: bool = False,
     ):
         self.state = state
         self.market_bias = market_bias
-        self.tick_tracker = TickPatternTracker()
         self.logger = trade_logger if trade_logger else TradeLogger()
         self.tick_recorder = tick_recorder
         self.mode = mode
         self.params_store = params_store
         self.config = config or {}
+        self.checkpoint = checkpoint  # 定期快照（背景寫入），當機重啟時 restore
+        self.signal_bus = signal_bus  # 每個 tick 的價格/特徵/分數/狀態寫入共享記憶體，供外部行程讀取
+        self.metrics = metrics        # on_tick 延遲、事件數等效能指標（MetricsServer 對外提供）
+        if metrics is not None:
+            metrics.bind(engine=self)
+
+        # 短線型態追蹤器（可由 config["tracker"] 指定 window / windows 多視窗）
+        tcfg = self.config.get("tracker", {})
+        self.tick_tracker = TickPatternTracker(window=tcfg.get("window", 20), windows=tcfg.get("windows"))
+        self.multi_window_features = len(self.tick_tracker.windows) > 1
 
         # v4 權重版本與決策引擎初始化
         self.params_version = "unversioned"
@@ -62,12 +85,176 @@ class TickEngine:
         # 多時間框架引擎
         self.multi_tf_engine = MultiTimeframeEngine()
 
+        # K 棒指標：tick 即時合成 1m K 棒，收盤後計算；最新快照補入每個 tick
+        # （async_bars=True 僅用於即時盤：收盤 K 棒於背景計算，tick 不等待；回測 / 回放同步計算以確保可重現）
+        self.warmup_bars = int(self.config.get("warmup_bars", 300))
+        self.bar_refresher = LiveBarRefresher(BAR_INDICATOR_KEYS, async_=async_bars)
+
         # 閾值配置（本地快取，用於 v3/v4 進場檢查）
         dcfg = self.config.get("decision", {})
         self.entry_threshold = float(dcfg.get("entry_threshold", 0.0))
         self.exit_threshold = float(dcfg.get("exit_threshold", 0.0))
         self.bias_prob_threshold = float(dcfg.get("bias_prob_threshold", 0.55))
 
+        # Shadow 模式：共用同一份特徵，額外評估其他決策引擎/權重版本（只記錄訊號，不交易）
+        self.shadow_engines: dict = {}
+        self.shadow_versions: dict = {}
+        self.shadow_logger = shadow_logger
+        for name, engine in (shadow_engines or {}).items():
+            self.add_shadow(name, engine)
+
+    # ===== 暖機 =====
+    def warm_start(self, bars, n: int | None = None, pyramid=None) -> int:
+        """
+        以歷史 K 棒（已收盤，時間由舊到新）暖機：
+        - bars 可為 polars / pandas DataFrame 或 list[dict]，需有 close，可選 high / low / volume / datetime
+        - 只取最後 n 根（預設 config["warmup_bars"]），一次取出 numpy 陣列填入價格/成交量序列
+        - MultiTimeframeEngine：有 datetime 時以 BarPyramid.aggregate 聚合 5m / 15m 收盤，否則依筆數取樣
+        - TickPatternTracker：填入最後 capacity 筆
+        - K 棒指標狀態：IncrementalIndicators 計算至最後一根，最新指標補入之後的 tick
+        - pyramid（BarPyramid）：1m 指標由其暖機狀態接續（等同完整歷史計算），5m / 15m 讀已存的分割，
+          只有最後一次建構之後的 1m K 棒才計算 / 聚合；暖機狀態與 bars 之間有缺口時改為上述一般流程
+        - polars / BarPyramid 在此才載入（由檢查點還原的快速啟動不需要）
+        :return: 暖機使用的 K 棒數
+        """
+        import polars as pl
+
+        from strategy_v4.pipeline.BarPyramid import aggregate
+        from strategy_v4.pipeline.polars_indicator_utils import as_polars
+
+        df = as_polars(bars)
+        if df.height == 0 or "close" not in df.columns:
+            print("[TickEngine] ⚠️ 無歷史 K 棒，略過暖機")
+            return 0
+        if "datetime" in df.columns:
+            df = df.sort("datetime")
+        df = df.tail(n or self.warmup_bars)
+
+        closes = df["close"].cast(pl.Float64).to_numpy()
+        highs = df["high"].cast(pl.Float64).to_numpy() if "high" in df.columns else closes
+        lows = df["low"].cast(pl.Float64).to_numpy() if "low" in df.columns else closes
+        volumes = df["volume"].cast(pl.Float64).to_numpy() if "volume" in df.columns else np.zeros(len(closes))
+
+        self.close_prices = closes.tolist()
+        self.high_prices = highs.tolist()
+        self.low_prices = lows.tolist()
+        self.volumes = volumes.tolist()
+
+        closes_5m = closes_15m = warm = None
+        if "datetime" in df.columns:
+            ohlc = df.with_columns(
+                pl.Series("open", closes) if "open" not in df.columns else pl.col("open"),
+                pl.Series("high", highs), pl.Series("low", lows), pl.Series("close", closes),
+            )
+            if pyramid is not None:
+                warm = pyramid.warm_state("1m")
+                if warm.last_datetime is None or warm.last_datetime < ohlc["datetime"][0]:
+                    print("[TickEngine] ⚠️ BarPyramid 暖機狀態早於歷史 K 棒，改為從頭計算")
+                    warm = None
+            if warm is not None:
+                newer = ohlc.filter(pl.col("datetime") > warm.last_datetime)
+                closes_5m, closes_15m = (
+                    pyramid.recent(res, 500).get_column("close", default=pl.Series([])).to_list()
+                    + aggregate(newer, minutes)["close"].to_list()
+                    for res, minutes in (("5m", 5), ("15m", 15))
+                )
+            else:
+                closes_5m = aggregate(ohlc, 5)["close"].to_list()
+                closes_15m = aggregate(ohlc, 15)["close"].to_list()
+        self.multi_tf_engine.seed(self.close_prices, self.volumes, closes_5m, closes_15m)
+        self.tick_tracker.seed(self.close_prices, self.volumes)
+
+        self.bar_refresher.reset(df.with_columns(pl.Series("high", highs), pl.Series("low", lows)),
+                                 state=warm.to_dict() if warm is not None else None)
+
+        print(f"[TickEngine] 暖機完成｜K 棒 {len(closes)} 根｜指標 {self.bar_indicators}")
+        return len(closes)
+
+    def update_bars(self, bars) -> dict:
+        """外部來源的已收盤 K 棒同步接續計算（已由 tick 合成的時間會被略過），回傳最新指標"""
+        return dict(self.bar_refresher.update(bars).values)
+
+    @property
+    def bar_indicators(self) -> dict:
+        """最近一根已收盤 K 棒的指標（LiveBarRefresher 發布的快照）"""
+        return dict(self.bar_refresher.values)
+
+    # ===== 檢查點 =====
+    def export_state(self) -> dict:
+        """
+        匯出完整引擎狀態（供 EngineCheckpoint 寫入）：
+        - 價格/成交量序列為 numpy 陣列（複製，之後的 tick 不影響快照）
+        - 其餘為可 JSON 序列化的值
+        """
+        return {
+            "mode": self.mode,
+            "market_bias": self.market_bias,
+            "params_version": self.params_version,
+            "close_prices": np.array(self.close_prices, dtype=np.float64),
+            "high_prices": np.array(self.high_prices, dtype=np.float64),
+            "low_prices": np.array(self.low_prices, dtype=np.float64),
+            "volumes": np.array(self.volumes, dtype=np.float64),
+            "bars": self.bar_refresher.export_state(),
+            "state": self.state.export_state(),
+            "multi_tf": self.multi_tf_engine.export_state(),
+            "tracker": self.tick_tracker.export_state(),
+        }
+
+    def load_state(self, state: dict):
+        """還原 export_state 的狀態（決策引擎與權重仍依建構參數）"""
+        if state.get("mode") != self.mode:
+            print(f"[TickEngine] ⚠️ 檢查點模式 {state.get('mode')} 與目前 {self.mode} 不同")
+        self.market_bias = state.get("market_bias", self.market_bias)
+        self.close_prices = state["close_prices"].tolist()
+        self.high_prices = state["high_prices"].tolist()
+        self.low_prices = state["low_prices"].tolist()
+        self.volumes = state["volumes"].tolist()
+        self.bar_refresher.load_state(state["bars"])
+        self.state.load_state(state["state"])
+        self.multi_tf_engine.load_state(state["multi_tf"])
+        self.tick_tracker.load_state(state["tracker"])
+
+    # ===== Shadow 模式 =====
+    def add_shadow(self, name: str, engine, params_version: str = "unversioned"):
+        """
+        加入 shadow 決策引擎：
+        - DecisionEngineV2（evaluate_tick）或 DecisionEngine（v3 規則型）皆可
+        - v3 引擎若未指定 tick_tracker，共用主引擎的追蹤器
+        """
+        if getattr(engine, "tick_tracker", False) is None:
+            engine.tick_tracker = self.tick_tracker
+        self.shadow_engines[name] = engine
+        self.shadow_versions[name] = params_version
+        if self.shadow_logger is None:
+            self.shadow_logger = ShadowLogger()
+
+    def add_shadow_weights(self, name: str, weights: dict, params_version: str | None = None):
+        """以另一組 v4 權重建立 shadow 引擎（權重版本 A/B 比較）"""
+        engine = DecisionEngineV2(
+            market_bias=self.market_bias,
+            weights=weights,
+            config=self.config.get("decision", {}),
+        )
+        self.add_shadow(name, engine, params_version or name)
+
+    def _evaluate_shadows(self, tick: dict, features: dict, price: float, timestamp):
+        """在同一份 tick/features 上評估所有 shadow 引擎並寫入 side log"""
+        for name, engine in self.shadow_engines.items():
+            if hasattr(engine, "evaluate_tick"):
+                res = engine.evaluate_tick(tick, features)
+                self.shadow_logger.log(
+                    timestamp, name, "v4", self.shadow_versions[name], price,
+                    res["bias"], res["bias_prob"], res["entry_score_v2"], res["exit_score_v2"], res["should_enter"],
+                )
+            else:
+                shadow_tick = dict(tick)  # v3 會回寫 momentum/direction_score/bias，避免污染主 tick
+                self.shadow_logger.log(
+                    timestamp, name, "v3", self.shadow_versions[name], price,
+                    engine.detect_market_bias(shadow_tick), None,
+                    float(engine.score_entry(shadow_tick)), float(engine.score_exit(shadow_tick)),
+                    engine.should_enter(shadow_tick),
+                )
+
     def _choose_direction_v3(self, tick: dict) -> str:
         dir_score = tick.get("direction_score", 0)
         bias = tick.get("bias", "neutral")
@@ -88,10 +275,30 @@ class TickEngine:
         # 若條件不足，回退 v3 規則方向
         return self._choose_direction_v3(tick)
 
-    def on_tick(self, tick: dict):
+    def on_tick(self, tick: dict) -> str | None:
+        """處理一筆 tick，回傳本 tick 的交易事件（ENTER / ADD / 出場事件，無則 None）"""
+        if self.metrics is None:
+            return self._on_tick(tick)
+        t0 = time.perf_counter()
+        try:
+            action = self._on_tick(tick)
+        except Exception:
+            self.metrics.observe_error()
+            raise
+        self.metrics.observe_tick(time.perf_counter() - t0, action)
+        return action
+
+    def _on_tick(self, tick: dict) -> str | None:
+        if self.checkpoint is not None:
+            self.checkpoint.maybe_save(self)
+
         price = float(tick.get("price", 0))
         volume = float(tick.get("volume", 0))
         timestamp = tick.get("timestamp", datetime.now())
+        if isinstance(timestamp, datetime):
+            self.bar_refresher.on_tick(price, volume, timestamp)  # 跨分鐘時先計算剛收盤的 K 棒
+        for key, value in self.bar_refresher.snapshot.values.items():
+            tick.setdefault(key, value)
 
         # 更新本地緩存
         self.close_prices.append(price)
@@ -106,6 +313,12 @@ class TickEngine:
         features = extract_features(tick, self.close_prices, self.high_prices, self.low_prices, self.volumes)
         tf_features = self.multi_tf_engine.extract_features()
         features.update(tf_features)
+        if self.multi_window_features:
+            features.update(self.tick_tracker.get_multi_status())
+
+        # Shadow 評估（在主引擎回寫 tick 之前，確保與獨立執行時輸入相同）
+        if self.shadow_engines:
+            self._evaluate_shadows(dict(tick), features, price, timestamp)
 
         # 判斷 Bias 與分數
         if self.mode == "regression_based":
@@ -146,6 +359,13 @@ class TickEngine:
         if self.tick_recorder:
             self.tick_recorder.record_tick(tick)
 
+        action = self._act(tick, price)
+        if self.signal_bus is not None:
+            self.signal_bus.publish(timestamp, price, volume, tick, features, self.state, action)
+        return action
+
+    def _act(self, tick: dict, price: float) -> str | None:
+        """進出場判斷與執行，回傳本 tick 的交易事件（無則 None）"""
         # 進場判斷
         if not self.state.in_position:
             if self.mode == "rule_based":
@@ -160,27 +380,34 @@ class TickEngine:
                 direction = self._choose_direction_v4(tick) if self.mode == "regression_based" else self._choose_direction_v3(tick)
                 self.state.enter(direction, price)
                 self.logger.log("ENTER", self.state.get_status(), price, tick)
-                return  # 進場後本 tick 不做出場判斷
+                return "ENTER"  # 進場後本 tick 不做出場判斷
 
         # 出場判斷（依序：停損 → 停利 → exit_score → tick/time → 其他）
         atr_val = float(tick.get("atr", 0))
         if self.state.should_stoploss(price, atr_val):
             self.logger.log("STOPLOSS", self.state.get_status(), price, tick)
             self.state.exit(price, reason="stoploss")
+            return "STOPLOSS"
         elif self.state.should_takeprofit(price, atr_val):
             self.logger.log("TAKEPROFIT", self.state.get_status(), price, tick)
             self.state.exit(price, reason="takeprofit")
+            return "TAKEPROFIT"
         elif self.mode == "regression_based" and self.state.should_exit_by_score(float(tick.get("exit_score_v2", 0.0))):
             self.logger.log("EXIT_SCORE", self.state.get_status(), price, tick)
             self.state.exit(price, reason="exit_score")
+            return "EXIT_SCORE"
         elif self.state.should_exit_by_tick() or self.state.should_exit_by_time():
             self.logger.log("TIME_EXIT", self.state.get_status(), price, tick)
             self.state.exit(price, reason="time_or_tick")
+            return "TIME_EXIT"
         elif not self.state.should_hold():
             self.logger.log("EXIT", self.state.get_status(), price, tick)
             self.state.exit(price, reason="hold_false")
+            return "EXIT"
         else:
             # 加碼判斷（可選）
             if self.state.should_add(price, tick):
                 self.state.current_position_size += 1
                 self.logger.log("ADD", self.state.get_status(), price, tick)
+                return "ADD"
+        return None
@@ -1,7 +1,8 @@
 # strategy_v4/engines/TickPatternTracker.py
 
-from collections import deque
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List
+
+import numpy as np
 
 class TickPatternTracker:
     """
@@ -9,56 +10,174 @@ class TickPatternTracker:
     - 追蹤最近 N 筆 tick 的價格變化
     - 計算 momentum、bias_prob 輔助值
     - 提供 exit_score 輔助判斷
+    - 以環形緩衝 + 累計量增量更新，所有統計皆為 O(1)
+    - 支援多個視窗長度（例如 10/20/50）共用同一個緩衝
     """
 
-    def __init__(self, window: int = 20):
+    # 每隔 RESYNC_FACTOR * capacity 筆重算一次浮點累計量，避免長時間累積誤差
+    RESYNC_FACTOR = 50
+
+    def __init__(self, window: int = 20, windows: Iterable[int] | None = None):
         self.window = window
-        self.prices = deque(maxlen=window)
-        self.volumes = deque(maxlen=window)
+        self.windows: List[int] = sorted({window, *(windows or ())})
+        if self.windows[0] < 1:
+            raise ValueError(f"[TickPatternTracker] 視窗長度必須 >= 1：{self.windows}")
+        self.capacity = max(self.windows)
+
+        # 共用環形緩衝（以全域序號 % capacity 定位）
+        self._prices = [0.0] * self.capacity
+        self._volumes = [0.0] * self.capacity
+        self._diffs = [0.0] * self.capacity
+        self._count = 0
+
+        # 各視窗的累計量：[上漲次數, |價差| 總和, 成交量總和]
+        self._stats: Dict[int, List[float]] = {w: [0, 0.0, 0.0] for w in self.windows}
 
     def update(self, price: float, volume: float = 0.0):
-        """更新 tick 資料"""
-        self.prices.append(price)
-        self.volumes.append(volume)
+        """更新 tick 資料（每個視窗只處理進出視窗的元素）"""
+        cap = self.capacity
+        n = self._count
+        diff = price - self._prices[(n - 1) % cap] if n > 0 else 0.0
+
+        for w, st in self._stats.items():
+            if n >= w:
+                # 視窗已滿：最舊的價格/成交量與其後的價差離開視窗
+                st[2] -= self._volumes[(n - w) % cap]
+                if w >= 2:
+                    old = self._diffs[(n - w + 1) % cap]
+                    st[0] -= old > 0
+                    st[1] -= abs(old)
+            if n > 0 and w >= 2:
+                st[0] += diff > 0
+                st[1] += abs(diff)
+            st[2] += volume
+
+        slot = n % cap
+        self._prices[slot] = price
+        self._volumes[slot] = volume
+        self._diffs[slot] = diff
+        self._count = n + 1
+
+        if self._count % (cap * self.RESYNC_FACTOR) == 0:
+            self._resync()
+
+    def seed(self, prices: Iterable[float], volumes: Iterable[float] | None = None):
+        """以歷史資料填入視窗（只需最後 capacity 筆）"""
+        prices = list(prices)[-self.capacity:]
+        volumes = list(volumes)[-len(prices):] if volumes is not None else [0.0] * len(prices)
+        for price, volume in zip(prices, volumes):
+            self.update(float(price), float(volume))
+
+    def export_state(self) -> Dict[str, Any]:
+        """匯出環形緩衝（numpy）與累計量"""
+        return {
+            "count": self._count,
+            "windows": list(self.windows),
+            "prices": np.array(self._prices, dtype=np.float64),
+            "volumes": np.array(self._volumes, dtype=np.float64),
+            "diffs": np.array(self._diffs, dtype=np.float64),
+            "stats": {str(w): list(st) for w, st in self._stats.items()},
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """還原 export_state 的狀態；視窗設定不同時以價格重新填入"""
+        if list(state["windows"]) != self.windows:
+            cap = len(state["prices"])
+            n = min(state["count"], cap)
+            order = [i % cap for i in range(state["count"] - n, state["count"])]
+            self.seed([state["prices"][i] for i in order], [state["volumes"][i] for i in order])
+            return
+        self._count = int(state["count"])
+        self._prices = [float(x) for x in state["prices"]]
+        self._volumes = [float(x) for x in state["volumes"]]
+        self._diffs = [float(x) for x in state["diffs"]]
+        self._stats = {int(w): [float(v) for v in st] for w, st in state["stats"].items()}
 
-    def momentum(self) -> float:
+    def _resync(self):
+        """重算浮點累計量（攤提成本 O(1)）"""
+        cap = self.capacity
+        for w, st in self._stats.items():
+            n = self._size(w)
+            start = self._count - n
+            st[1] = sum(abs(self._diffs[i % cap]) for i in range(start + 1, self._count))
+            st[2] = sum(self._volumes[i % cap] for i in range(start, self._count))
+
+    def _size(self, window: int | None = None) -> int:
+        return min(self._count, window or self.window)
+
+    def _check_window(self, window: int | None, stats: bool = True) -> int:
+        """
+        檢查查詢視窗：
+        - 超過緩衝容量（最大視窗）的資料已被覆寫，無法計算
+        - 依累計量計算的統計（bias_prob / exit_score / avg_volume）只支援建構時設定的視窗
+        """
+        w = window or self.window
+        if w > self.capacity:
+            raise ValueError(f"[TickPatternTracker] 視窗 {w} 超過緩衝容量 {self.capacity}（可用視窗：{self.windows}）")
+        if stats and w not in self._stats:
+            raise ValueError(f"[TickPatternTracker] 視窗 {w} 未設定（可用視窗：{self.windows}）")
+        return w
+
+    def _window_values(self, buf: List[float], window: int | None = None) -> List[float]:
+        cap = self.capacity
+        return [buf[i % cap] for i in range(self._count - self._size(window), self._count)]
+
+    @property
+    def prices(self) -> List[float]:
+        """主視窗內的價格（相容舊介面）"""
+        return self._window_values(self._prices)
+
+    @property
+    def volumes(self) -> List[float]:
+        """主視窗內的成交量（相容舊介面）"""
+        return self._window_values(self._volumes)
+
+    def momentum(self, window: int | None = None) -> float:
         """
         計算相對動能：
         - (最後價 / 第一價 - 1)，代表漲跌幅
+        - 只需價格緩衝：不超過緩衝容量的任意視窗皆可
         """
-        if len(self.prices) < 2 or self.prices[0] == 0:
+        n = self._size(self._check_window(window, stats=False))
+        first = self._prices[(self._count - n) % self.capacity]
+        if n < 2 or first == 0:
             return 0.0
-        return round((self.prices[-1] / self.prices[0]) - 1.0, 3)
+        return round((self._prices[(self._count - 1) % self.capacity] / first) - 1.0, 3)
 
-    def bias_prob(self) -> float:
+    def bias_prob(self, window: int | None = None) -> float:
         """
         計算 bias 機率輔助值：
         - 價格上漲比例作為 bullish 機率
         """
-        if len(self.prices) < 2:
+        w = self._check_window(window)
+        n = self._size(w)
+        if n < 2:
             return 0.5
-        up_moves = sum(1 for i in range(1, len(self.prices)) if self.prices[i] > self.prices[i-1])
-        prob = up_moves / (len(self.prices) - 1)
+        prob = self._stats[w][0] / (n - 1)
         return round(prob, 3)
 
-    def exit_score(self) -> float:
+    def exit_score(self, window: int | None = None) -> float:
         """
         計算 exit_score 輔助值：
         - 價格波動越大，exit_score 越高（越傾向出場）
         """
-        if len(self.prices) < 2:
+        w = self._check_window(window)
+        n = self._size(w)
+        if n < 2:
             return 0.0
-        diffs = [abs(self.prices[i] - self.prices[i-1]) for i in range(1, len(self.prices))]
-        avg_volatility = sum(diffs) / len(diffs)
-        base_price = self.prices[-1] if self.prices[-1] != 0 else 1.0
+        avg_volatility = self._stats[w][1] / (n - 1)
+        last = self._prices[(self._count - 1) % self.capacity]
+        base_price = last if last != 0 else 1.0
         score = avg_volatility / base_price
         return round(score, 3)
 
-    def avg_volume(self) -> float:
+    def avg_volume(self, window: int | None = None) -> float:
         """計算平均成交量"""
-        if not self.volumes:
+        w = self._check_window(window)
+        n = self._size(w)
+        if n == 0:
             return 0.0
-        return round(sum(self.volumes) / len(self.volumes), 2)
+        return round(self._stats[w][2] / n, 2)
 
     def get_status(self) -> Dict[str, Any]:
         """輸出追蹤狀態"""
@@ -66,7 +185,20 @@ class TickPatternTracker:
             "momentum": self.momentum(),
             "bias_prob": self.bias_prob(),
             "exit_score": self.exit_score(),
-            "last_price": self.prices[-1] if self.prices else None,
-            "count": len(self.prices),
+            "last_price": self._prices[(self._count - 1) % self.capacity] if self._count else None,
+            "count": self._size(),
             "avg_volume": self.avg_volume(),
         }
+
+    def get_multi_status(self) -> Dict[str, float]:
+        """
+        輸出所有視窗的短線特徵（扁平 dict，方便併入 features）：
+        - momentum_{w}、bias_prob_{w}、exit_score_{w}、avg_volume_{w}
+        """
+        out: Dict[str, float] = {}
+        for w in self.windows:
+            out[f"momentum_{w}"] = self.momentum(w)
+            out[f"bias_prob_{w}"] = self.bias_prob(w)
+            out[f"exit_score_{w}"] = self.exit_score(w)
+            out[f"avg_volume_{w}"] = self.avg_volume(w)
+        return out
@@ -1,27 +1,29 @@
-import pandas as pd
+from strategy_v4.pipeline.DataPipeline import DataPipeline
 
-print("🚀 event_flag_matrix.py 開始執行")
 
-# ====== 讀取事件表 ======
-df = pd.read_csv("events.csv", parse_dates=["date"])
-print("📂 讀到事件筆數：", len(df))
+def main():
+    """events.csv → event_flag_matrix.csv（date, event_mask）+ event_ids.json"""
+    print("🚀 event_flag_matrix.py 開始執行")
 
-# ====== 建立事件矩陣（pivot 格式） ======
-df["flag"] = 1
-matrix = df.pivot_table(
-    index="date",
-    columns="event",
-    values="flag",
-    aggfunc="max",   # 同一天多事件 → 保留 1
-    fill_value=0
-)
+    # ====== 讀取事件表（lazy） ======
+    pipeline = DataPipeline()
+    events = pipeline.scan_events("events.csv")
+    print("📂 讀到事件筆數：", events.select("date").collect().height)
 
-# ====== 依日期排序 ======
-matrix.sort_index(inplace=True)
+    # ====== 事件字典（既有事件位元不變，新事件往後配置） ======
+    codec = pipeline.event_codec("events.csv", "event_ids.json")
+    codec.save("event_ids.json")
 
-# ====== 存成 CSV ======
-matrix.to_csv("event_flag_matrix.csv", encoding="utf-8-sig")
+    # ====== 建立事件遮罩（每天一列：date, event_mask，依日期排序） ======
+    masks = pipeline.event_masks(events, codec).collect()
 
-print(f"✅ 已生成 event_flag_matrix.csv｜共 {len(matrix)} 天，{len(matrix.columns)} 類事件")
-print("📌 事件欄位：", list(matrix.columns))
-print(matrix.head())
+    # ====== 存成 CSV ======
+    masks.write_csv("event_flag_matrix.csv", include_bom=True)
+
+    print(f"✅ 已生成 event_flag_matrix.csv｜共 {masks.height} 天，{len(codec.ids)} 類事件（event_ids.json）")
+    print("📌 事件位元：", codec.ids)
+    print(masks.head())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
-import pandas as pd
+import polars as pl
+from strategy_v4.pipeline.DataPipeline import DataPipeline
 
-# ====== 讀取事件表 ======
-df = pd.read_csv("events.csv", parse_dates=["date"])
 
-# ====== 統計各類事件出現次數 ======
-summary = df["event"].value_counts().reset_index()
-summary.columns = ["event_type", "count"]
+def main():
+    """events.csv → event_summary.csv（各類事件次數與首尾日期）"""
+    # ====== 讀取事件表（lazy） ======
+    events = DataPipeline().scan_events("events.csv")
 
-# ====== 加入日期範圍與首尾日期 ======
-summary["start_date"] = df.groupby("event")["date"].min().values
-summary["end_date"] = df.groupby("event")["date"].max().values
+    # ====== 統計各類事件出現次數、首尾日期 ======
+    summary = (
+        events.group_by("event")
+        .agg([
+            pl.len().alias("count"),
+            pl.col("date").min().alias("start_date"),
+            pl.col("date").max().alias("end_date"),
+        ])
+        .rename({"event": "event_type"})
+        .sort("count", descending=True)
+        .collect()
+    )
 
-# ====== 存成 CSV ======
-summary.to_csv("event_summary.csv", index=False, encoding="utf-8-sig")
-print(f"✅ 已輸出 event_summary.csv｜共 {len(summary)} 類事件")
+    # ====== 存成 CSV ======
+    summary.write_csv("event_summary.csv", include_bom=True)
+    print(f"✅ 已輸出 event_summary.csv｜共 {summary.height} 類事件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# strategy_v4/io/ContractCache.py
+
+import json
+import os
+from datetime import date, datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+from strategy_v4.DataPathManager import DataPathManager
+
+CONTINUOUS = ("R1", "R2")   # 連續月（不參與近月排序）
+
+
+def session_date(ts: datetime) -> date:
+    """交易日（規則同 KbarStore.trading_date_of；此處不匯入 polars）"""
+    d = (ts + timedelta(hours=9)).date()
+    wd = d.weekday()
+    return d + timedelta(days=7 - wd) if wd >= 5 else d
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def contract_fields(contract) -> dict:
+    """Shioaji 合約 → 可 JSON 序列化的欄位 dict（pydantic 物件可直接 dict()）"""
+    try:
+        raw = dict(contract)
+    except (TypeError, ValueError):
+        raw = {k: v for k, v in vars(contract).items() if not k.startswith("_")}
+    return {k: _plain(v) for k, v in raw.items()}
+
+
+def shioaji_future(fields: dict):
+    """由快取欄位重建 Shioaji 期貨合約（登入時未下載合約檔）"""
+    from shioaji.contracts import Future
+
+    return Future(**fields)
+
+
+class ContractCache:
+    """
+    合約資料快取（快速啟動）：
+    - 指定商品（預設 TMF / TXF / MXF）的合約欄位（代號、交割日、交割月、標的…）存成 JSON
+    - 每個交易日更新一次：快取有效時登入可略過合約下載（api.login(fetch_contract=False)）
+    - resolve("TMF:0") 依交割日取近月、"TMF:1" 次月（排除 R1 / R2 連續月），其他字串視為代號
+    - contract() 優先使用 api 已載入的合約，否則由快取欄位重建
+    """
+
+    def __init__(self, path: str | Path | None = None, products: Iterable[str] = ("TMF", "TXF", "MXF"),
+                 path_manager: DataPathManager | None = None, clock: Callable[[], datetime] = datetime.now,
+                 factory: Callable[[dict], object] = shioaji_future):
+        self.path = Path(path or (path_manager or DataPathManager()).get_path("contracts.json"))
+        self.products = list(products)
+        self.clock = clock
+        self.factory = factory
+        self.contracts: Dict[str, dict] = {}
+        self.session: str | None = None
+        self._built: Dict[str, object] = {}
+
+    # ===== 讀寫 =====
+    def load(self) -> bool:
+        """讀取快取；同一交易日且涵蓋所有商品時回傳 True"""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        today = session_date(self.clock()).isoformat()
+        if data.get("session") != today or set(self.products) - set(data.get("products", [])):
+            return False
+        self.contracts = data["contracts"]
+        self.session = data["session"]
+        return True
+
+    @property
+    def fresh(self) -> bool:
+        return self.session == session_date(self.clock()).isoformat() and bool(self.contracts)
+
+    def refresh(self, api, download: bool = True) -> Dict[str, dict]:
+        """由 api 取得合約（download=True 時先 fetch_contracts）並寫入快取"""
+        if download:
+            api.fetch_contracts(contract_download=True)
+        contracts = {}
+        for product in self.products:
+            try:
+                group = getattr(api.Contracts.Futures, product)
+            except AttributeError:
+                print(f"[ContractCache] ⚠️ 找不到商品 {product}")
+                continue
+            for contract in group:
+                contracts[contract.code] = contract_fields(contract)
+                self._built[contract.code] = contract
+        self.contracts = contracts
+        self.session = session_date(self.clock()).isoformat()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"session": self.session, "products": self.products, "saved_at": self.clock().isoformat(),
+                       "contracts": contracts}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        print(f"[ContractCache] 已更新 {len(contracts)} 筆合約 → {self.path}")
+        return contracts
+
+    def ensure(self, api) -> Dict[str, dict]:
+        return self.contracts if (self.fresh or self.load()) else self.refresh(api)
+
+    # ===== 查詢 =====
+    def months(self, product: str) -> List[str]:
+        """商品各月合約代號，依交割日排序（不含連續月）"""
+        codes = [c for c, f in self.contracts.items()
+                 if c.startswith(product) and c[-2:] not in CONTINUOUS and f.get("delivery_date")]
+        return sorted(codes, key=lambda c: self.contracts[c]["delivery_date"])
+
+    def resolve(self, name: str) -> str:
+        if ":" in name:
+            product, idx = name.split(":")
+            today = self.clock().date().isoformat()
+            months = [c for c in self.months(product) if self.contracts[c]["delivery_date"].replace("/", "-") >= today]
+            return months[int(idx)]
+        return name
+
+    def delivery_date(self, code: str) -> str | None:
+        return self.contracts.get(code, {}).get("delivery_date")
+
+    def contract(self, api, name: str):
+        """合約物件：api 已下載合約時直接取用，否則由快取欄位重建"""
+        code = self.resolve(name)
+        if code in self._built:
+            return self._built[code]
+        contract = None
+        if api is not None:
+            try:
+                contract = getattr(api.Contracts.Futures, code[:3])[code]
+            except (AttributeError, KeyError, TypeError):
+                contract = None
+        if contract is None:
+            if code not in self.contracts:
+                raise KeyError(f"[ContractCache] 快取中沒有合約 {code}")
+            contract = self.factory(self.contracts[code])
+        self._built[code] = contract
+        return contract
@@ -0,0 +1,334 @@
+# strategy_v4/io/EngineCheckpoint.py
+
+import csv
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from strategy_v4.DataPathManager import DataPathManager
+
+MAGIC = b"SV4CKPT1"
+HEAD = struct.Struct("<8sII")   # magic, header 長度, payload crc32
+ALIGN = 16
+
+ENTRY_EVENTS = ("ENTER", "ADD")
+EXIT_EVENTS = ("STOPLOSS", "TAKEPROFIT", "EXIT_SCORE", "TIME_EXIT", "EXIT")
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def encode(state: Dict[str, Any], meta: Dict[str, Any] | None = None) -> bytes:
+    """
+    狀態 → 二進位檢查點：
+    - [magic | header 長度 | crc32][JSON header][對齊的 numpy 原始緩衝]
+    - state 中的 np.ndarray 以原始位元組存放，其餘值存在 JSON header
+    """
+    arrays: List[np.ndarray] = []
+
+    def strip(obj):
+        if isinstance(obj, np.ndarray):
+            arrays.append(np.ascontiguousarray(obj))
+            return {"__array__": len(arrays) - 1}
+        if isinstance(obj, dict):
+            return {k: strip(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [strip(v) for v in obj]
+        return obj
+
+    tree = strip(state)
+    specs, offset = [], 0
+    for arr in arrays:
+        specs.append({"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset})
+        offset += _aligned(arr.nbytes)
+    header = json.dumps({"meta": meta or {}, "state": tree, "arrays": specs}, ensure_ascii=False).encode("utf-8")
+
+    parts = []
+    for arr in arrays:
+        parts.append(arr.tobytes())
+        parts.append(b"\0" * (_aligned(arr.nbytes) - arr.nbytes))
+    payload = b"".join(parts)
+    pad = b"\0" * (_aligned(HEAD.size + len(header)) - HEAD.size - len(header))
+    return HEAD.pack(MAGIC, len(header), zlib.crc32(payload)) + header + pad + payload
+
+
+def decode(data: bytes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """二進位檢查點 → (state, meta)；格式或 crc 不符時拋出 ValueError"""
+    if len(data) < HEAD.size:
+        raise ValueError("檢查點檔案過短")
+    magic, header_len, crc = HEAD.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("檢查點格式不符")
+    header = json.loads(data[HEAD.size:HEAD.size + header_len].decode("utf-8"))
+    base = _aligned(HEAD.size + header_len)
+    if zlib.crc32(memoryview(data)[base:]) != crc:
+        raise ValueError("檢查點 crc 驗證失敗")
+
+    arrays = []
+    for spec in header["arrays"]:
+        dtype, count = np.dtype(spec["dtype"]), int(np.prod(spec["shape"]))
+        arr = np.frombuffer(data, dtype=dtype, count=count, offset=base + spec["offset"]) if count else np.empty(0, dtype)
+        arrays.append(arr.reshape(spec["shape"]))
+
+    def fill(obj):
+        if isinstance(obj, dict):
+            if set(obj) == {"__array__"}:
+                return arrays[obj["__array__"]]
+            return {k: fill(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [fill(v) for v in obj]
+        return obj
+
+    return fill(header["state"]), header["meta"]
+
+
+class EngineCheckpoint:
+    """
+    引擎檢查點（當機重啟用）：
+    - save() 在呼叫端只做 export_state（複製序列），編碼與寫檔在背景執行緒完成（tmp + fsync + os.replace）
+    - 背景寫入未完成時新的快照覆蓋待寫快照（只保留最新）
+    - maybe_save() 依 interval 秒數節流，可直接放在 tick 迴圈
+    - restore() 讀回狀態，並與 TradeLogger 紀錄比對：檢查點之後的進出場以紀錄為準補上
+    - 快照同時記錄紀錄檔識別（TradeLogger.identity），只有同一份紀錄檔才用來補上或修正持倉
+    """
+
+    def __init__(self, path: str | Path | None = None, interval: float = 30.0,
+                 path_manager: DataPathManager | None = None):
+        self.path = Path(path or (path_manager or DataPathManager()).get_path("engine.ckpt"))
+        self.interval = interval
+        self.saved = 0
+        self.skipped = 0
+        self.last_error: Exception | None = None
+        self._last_save = 0.0
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    # ===== 寫入 =====
+    def snapshot(self, engine) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        logger = getattr(engine, "logger", None)
+        meta = {
+            "created_at": datetime.now().isoformat(timespec="microseconds"),
+            "trade_log": str(logger.path) if logger is not None else None,
+            "trade_log_rows": getattr(logger, "rows", 0),
+            "trade_log_id": logger.identity() if hasattr(logger, "identity") else None,
+        }
+        return engine.export_state(), meta
+
+    def save(self, engine, sync: bool = False):
+        """建立快照；sync=True 時在目前執行緒寫完才返回"""
+        state, meta = self.snapshot(engine)
+        self._last_save = time.monotonic()
+        if sync:
+            self._write(state, meta)
+            return
+        with self._cond:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = (state, meta)
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name="EngineCheckpoint", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def maybe_save(self, engine, now: float | None = None) -> bool:
+        """距上次快照超過 interval 秒才寫入"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_save < self.interval:
+            return False
+        self.save(engine)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                job, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._write(*job)
+            except Exception as e:
+                self.last_error = e
+                print(f"[EngineCheckpoint] ❌ 寫入失敗：{e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write(self, state: Dict[str, Any], meta: Dict[str, Any]):
+        data = encode(state, meta)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.saved += 1
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待背景寫入完成"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def close(self, timeout: float | None = None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ===== 讀取 / 還原 =====
+    def load(self) -> Tuple[Dict[str, Any], Dict[str, Any]] | None:
+        """讀取檢查點；不存在或損毀時回傳 None"""
+        if not self.path.exists():
+            return None
+        try:
+            return decode(self.path.read_bytes())
+        except Exception as e:
+            print(f"[EngineCheckpoint] ⚠️ 檢查點無法讀取，略過：{e}")
+            return None
+
+    @staticmethod
+    def apply_entry(state: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+        """
+        依一筆交易紀錄修正持倉狀態（StrategyState.export_state 格式）：
+        - ENTER / ADD：持倉方向、價格、口數
+        - 出場類事件：清空持倉
+        :return: 是否有修改
+        """
+        event = entry.get("event")
+        before = dict(state)
+        if event == "ENTER":
+            state.update({
+                "in_position": True,
+                "direction": entry.get("direction") or None,
+                "entry_price": float(entry["price"]),
+                "entry_time": datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S").isoformat(),
+                "current_position_size": int(entry.get("position_size") or 1),
+                "max_profit": 0.0,
+                "max_loss": 0.0,
+                "tick_since_entry": 0,
+            })
+        elif event == "ADD":
+            state.update({
+                "in_position": True,
+                "direction": entry.get("direction") or state.get("direction"),
+                "current_position_size": int(entry.get("position_size") or state.get("current_position_size") or 1),
+            })
+            if state.get("entry_price") is None:
+                state["entry_price"] = float(entry["price"])
+        elif event in EXIT_EVENTS:
+            state.update({
+                "in_position": False,
+                "direction": None,
+                "entry_price": None,
+                "entry_time": None,
+                "current_position_size": 0,
+                "tick_since_entry": 0,
+            })
+        return state != before
+
+    def verify(self, state: Dict[str, Any], meta: Dict[str, Any], logger) -> Dict[str, Any]:
+        """
+        與 TradeLogger 比對（會呼叫 logger.resume()，之後的紀錄接續附加）：
+        - 紀錄筆數與檢查點相同 → 以最後一筆紀錄確認持倉方向一致
+        - 紀錄較多 → 檢查點之後的進出場依序補上
+        - 紀錄較少 → 紀錄檔被截斷或覆寫，保留檢查點狀態
+        - 紀錄檔不是檢查點所屬 session 寫的（例如尚未建立新檔時留下的前一次紀錄）→ 忽略舊檔、不接續
+        """
+        ckpt_rows = int(meta.get("trade_log_rows", 0))
+        strategy = state["state"]
+        recorded = meta.get("trade_log_id")
+        if recorded is not None and hasattr(logger, "identity"):
+            owned = self._owns_log(recorded, logger.identity())
+            if not owned:
+                report = {"consistent": not recorded.get("initialized"), "log_rows": 0, "checkpoint_rows": ckpt_rows,
+                          "replayed": [], "stale_log": True}
+                if recorded.get("initialized"):
+                    print(f"[EngineCheckpoint] ⚠️ 交易紀錄檔已被替換，與檢查點不符，保留檢查點狀態：{logger.path}")
+                else:
+                    print(f"[EngineCheckpoint] 交易紀錄檔為前一次執行留下的舊檔，不比對、不接續：{logger.path}")
+                return report
+
+        rows = logger.resume()
+        report = {"consistent": True, "log_rows": rows, "checkpoint_rows": ckpt_rows, "replayed": []}
+
+        if rows < ckpt_rows:
+            report["consistent"] = False
+            print(f"[EngineCheckpoint] ⚠️ 交易紀錄 {rows} 筆少於檢查點 {ckpt_rows} 筆，保留檢查點狀態")
+        elif rows > ckpt_rows:
+            report["consistent"] = False
+            for entry in self._entries_since(logger.path, ckpt_rows):
+                if self.apply_entry(strategy, entry):
+                    report["replayed"].append(entry.get("event"))
+            print(f"[EngineCheckpoint] ⚠️ 檢查點之後有 {rows - ckpt_rows} 筆交易紀錄，已補上：{report['replayed']}")
+        else:
+            last = logger.last_entry()
+            if last is not None:
+                implied = last.get("event") in ENTRY_EVENTS
+                direction = last.get("direction") or None
+                if implied != bool(strategy.get("in_position")) or (implied and direction != strategy.get("direction")):
+                    report["consistent"] = False
+                    self.apply_entry(strategy, last)
+                    report["replayed"].append(last.get("event"))
+                    print(f"[EngineCheckpoint] ⚠️ 持倉與最後交易紀錄不一致，依紀錄修正：{last.get('event')}")
+        return report
+
+    @staticmethod
+    def _owns_log(recorded: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        """
+        目前的紀錄檔是否為檢查點所屬 session 寫的：
+        - 快照時已建立新檔 → 檔案仍在、沒有變小、第一筆紀錄相同
+        - 快照時尚未建立 → 磁碟上的檔案與快照時不同（之後才由本 session 覆寫）才算
+        """
+        if current["size"] is None:
+            return not recorded.get("initialized")
+        if recorded.get("initialized"):
+            return (current["size"] >= (recorded.get("size") or 0)
+                    and (recorded.get("first_row") is None or current["first_row"] == recorded["first_row"]))
+        return (current["size"], current["first_row"]) != (recorded.get("size"), recorded.get("first_row"))
+
+    @staticmethod
+    def _entries_since(path: Path, skip: int) -> List[Dict[str, Any]]:
+        with Path(path).open("r", newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))[skip:]
+
+    def restore(self, engine, max_age: float | None = None) -> Dict[str, Any] | None:
+        """
+        由檢查點還原引擎：
+        - max_age：檢查點超過此秒數視為過期（例如前一盤），不還原
+        :return: 比對報告（含 seconds 還原耗時），無可用檢查點時回傳 None
+        """
+        t0 = time.perf_counter()
+        loaded = self.load()
+        if loaded is None:
+            return None
+        state, meta = loaded
+        age = (datetime.now() - datetime.fromisoformat(meta["created_at"])).total_seconds()
+        if max_age is not None and age > max_age:
+            print(f"[EngineCheckpoint] 檢查點已過期（{age / 60:.0f} 分鐘前），不還原")
+            return None
+        report = self.verify(state, meta, engine.logger)
+        engine.load_state(state)
+        report["created_at"] = meta.get("created_at")
+        report["seconds"] = time.perf_counter() - t0
+        print(f"[EngineCheckpoint] 已還原 {meta.get('created_at')} 的檢查點｜{report['seconds'] * 1000:.1f} ms"
+              f"｜一致={report['consistent']}")
+        return report
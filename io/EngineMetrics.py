@@ -0,0 +1,301 @@
+# strategy_v4/io/EngineMetrics.py
+
+import gc
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+# on_tick 延遲直方圖上界（秒）
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+PREFIX = "sv4_"
+
+
+def rss_bytes() -> int:
+    """目前行程 RSS（Linux 讀 /proc；其他平台以 ru_maxrss 近似）"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class Histogram:
+    """固定上界的累積直方圖（observe 為一次二分搜尋 + 兩次加法）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最後一格為 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, total = [], 0
+        for le, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            out.append(("+Inf" if le == float("inf") else repr(le), total))
+        return out
+
+    def quantile(self, q: float) -> float:
+        """以直方圖上界估計分位數"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        for le, total in zip(self.buckets + (self.max,), (c for _, c in self.cumulative())):
+            if total >= target:
+                return min(le, self.max)
+        return self.max
+
+
+class EngineMetrics:
+    """
+    引擎效能指標：
+    - tick 路徑只做計數與直方圖更新（observe_tick），其餘量測在 snapshot() 被讀取時才計算
+    - 計數：處理 tick 數、每秒 tick 數（最近 rate_window 秒）、on_tick 延遲直方圖、各交易事件數、錯誤數
+    - 量表：TickRecorder 緩衝深度、TradeLogger 紀錄數、進件佇列深度 / 合併 / 丟棄（LiveRuntime）、檢查點與 SignalBus
+    - GC：gc.callbacks 記錄各世代回收次數與暫停時間；行程 RSS
+    - snapshot()：JSON 用 dict；prometheus()：Prometheus 文字格式
+    """
+
+    def __init__(self, engine=None, runtime=None, rate_window: int = 10, buckets=LATENCY_BUCKETS):
+        self.engine = engine
+        self.runtime = runtime
+        self.started = time.time()
+        self.ticks = 0
+        self.errors = 0
+        self.events: Dict[str, int] = {}
+        self.latency = Histogram(buckets)
+        self.rate_window = int(rate_window)
+        self._sec = 0
+        self._sec_count = 0
+        self._per_sec: deque = deque(maxlen=self.rate_window)
+        self.gc_collections = [0, 0, 0]
+        self.gc_pause_total = 0.0
+        self.gc_pause_max = 0.0
+        self._gc_t0 = 0.0
+        self._gc_installed = False
+        self.install_gc()
+
+    def bind(self, engine=None, runtime=None) -> "EngineMetrics":
+        if engine is not None:
+            self.engine = engine
+        if runtime is not None:
+            self.runtime = runtime
+        return self
+
+    # ===== tick 路徑 =====
+    def observe_tick(self, seconds: float, event: str | None = None, now: float | None = None):
+        self.ticks += 1
+        self.latency.observe(seconds)
+        if event:
+            self.events[event] = self.events.get(event, 0) + 1
+        sec = int(now if now is not None else time.monotonic())
+        if sec != self._sec:
+            if self._sec_count:
+                self._per_sec.append((self._sec, self._sec_count))
+            self._sec, self._sec_count = sec, 0
+        self._sec_count += 1
+
+    def observe_error(self):
+        self.errors += 1
+
+    def ticks_per_second(self, now: float | None = None) -> float:
+        now = int(now if now is not None else time.monotonic())
+        lo = now - self.rate_window
+        total = sum(n for sec, n in self._per_sec if lo <= sec < now)
+        if lo <= self._sec < now:
+            total += self._sec_count
+        return total / self.rate_window
+
+    # ===== GC =====
+    def _on_gc(self, phase: str, info: dict):
+        if phase == "start":
+            self._gc_t0 = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._gc_t0
+        self.gc_collections[info.get("generation", 0)] += 1
+        self.gc_pause_total += pause
+        if pause > self.gc_pause_max:
+            self.gc_pause_max = pause
+
+    def install_gc(self):
+        if not self._gc_installed:
+            gc.callbacks.append(self._on_gc)
+            self._gc_installed = True
+
+    def close(self):
+        if self._gc_installed:
+            gc.callbacks.remove(self._on_gc)
+            self._gc_installed = False
+
+    # ===== 輸出 =====
+    def snapshot(self) -> Dict[str, Any]:
+        lat = self.latency
+        out: Dict[str, Any] = {
+            "uptime": round(time.time() - self.started, 3),
+            "ticks": self.ticks,
+            "ticks_per_second": self.ticks_per_second(),
+            "errors": self.errors,
+            "events": dict(self.events),
+            "latency": {
+                "count": lat.count,
+                "sum": lat.sum,
+                "avg": lat.sum / lat.count if lat.count else 0.0,
+                "p50": lat.quantile(0.5),
+                "p99": lat.quantile(0.99),
+                "max": lat.max,
+                "buckets": dict(lat.cumulative()),
+            },
+            "gc": {
+                "collections": list(self.gc_collections),
+                "pause_total": self.gc_pause_total,
+                "pause_max": self.gc_pause_max,
+            },
+            "rss_bytes": rss_bytes(),
+        }
+
+        engine = self.engine
+        if engine is not None:
+            recorder = getattr(engine, "tick_recorder", None)
+            logger = getattr(engine, "logger", None)
+            checkpoint = getattr(engine, "checkpoint", None)
+            bus = getattr(engine, "signal_bus", None)
+            out["recorder_buffer"] = len(recorder.buffer) if recorder is not None else 0
+            out["trade_log_rows"] = getattr(logger, "rows", 0)
+            if checkpoint is not None:
+                out["checkpoint"] = {"saved": checkpoint.saved, "skipped": checkpoint.skipped}
+            if bus is not None:
+                out["signal_bus_published"] = bus.published
+            state = getattr(engine, "state", None)
+            if state is not None:
+                out["in_position"] = bool(state.in_position)
+                out["position_size"] = int(state.current_position_size or 0)
+
+        if self.runtime is not None:
+            st = self.runtime.stats
+            out["ingest"] = {k: st.get(k) for k in
+                             ("received", "processed", "coalesced", "dropped", "depth", "max_depth", "avg_age", "max_age")}
+        return out
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        lines: List[str] = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples:
+                label = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+                lines.append(f"{PREFIX}{name}{label} {value if isinstance(value, int) else repr(float(value))}")
+
+        metric("ticks_total", "counter", "Ticks processed by on_tick", [({}, snap["ticks"])])
+        metric("ticks_per_second", "gauge", "Ticks per second over the rate window", [({}, snap["ticks_per_second"])])
+        metric("on_tick_errors_total", "counter", "on_tick exceptions", [({}, snap["errors"])])
+        metric("trade_events_total", "counter", "Trade events by type",
+               [({"type": k}, v) for k, v in sorted(snap["events"].items())])
+
+        lat = snap["latency"]
+        lines.append(f"# HELP {PREFIX}on_tick_seconds on_tick latency")
+        lines.append(f"# TYPE {PREFIX}on_tick_seconds histogram")
+        for le, n in lat["buckets"].items():
+            lines.append(f'{PREFIX}on_tick_seconds_bucket{{le="{le}"}} {n}')
+        lines.append(f"{PREFIX}on_tick_seconds_sum {lat['sum']!r}")
+        lines.append(f"{PREFIX}on_tick_seconds_count {lat['count']}")
+
+        metric("gc_collections_total", "counter", "GC collections by generation",
+               [({"generation": str(i)}, n) for i, n in enumerate(snap["gc"]["collections"])])
+        metric("gc_pause_seconds_total", "counter", "Total GC pause time", [({}, snap["gc"]["pause_total"])])
+        metric("gc_pause_seconds_max", "gauge", "Longest GC pause", [({}, snap["gc"]["pause_max"])])
+        metric("process_resident_memory_bytes", "gauge", "Resident set size", [({}, snap["rss_bytes"])])
+
+        if "recorder_buffer" in snap:
+            metric("recorder_buffer_depth", "gauge", "TickRecorder rows waiting for flush", [({}, snap["recorder_buffer"])])
+            metric("trade_log_rows", "gauge", "Rows written to the trade log", [({}, snap["trade_log_rows"])])
+        if "in_position" in snap:
+            metric("position_size", "gauge", "Open position size", [({}, snap["position_size"])])
+        if "ingest" in snap:
+            ing = snap["ingest"]
+            metric("ingest_queue_depth", "gauge", "Ticks waiting in the ingest queue", [({}, ing["depth"] or 0)])
+            metric("ingest_dropped_total", "counter", "Ticks shed by the ingest policy", [({}, ing["dropped"] or 0)])
+            metric("ingest_coalesced_total", "counter", "Ticks merged by the ingest policy", [({}, ing["coalesced"] or 0)])
+            metric("ingest_wait_seconds_max", "gauge", "Longest queue wait", [({}, ing["max_age"] or 0.0)])
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    本機指標 HTTP 端點（背景執行緒，標準函式庫）：
+    - GET /metrics → Prometheus 文字格式；GET /metrics.json → JSON snapshot
+    - 預設只綁 127.0.0.1；port=0 時自動選用可用埠（self.port）
+    """
+
+    def __init__(self, metrics: EngineMetrics, host: str = "127.0.0.1", port: int = 9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread: threading.Thread | None = None
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body = metrics.prometheus().encode("utf-8")
+                    ctype = "text/plain; version=0.0.4; charset=utf-8"
+                elif path in ("/metrics.json", "/snapshot"):
+                    body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                    ctype = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MetricsServer":
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        print(f"[MetricsServer] http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,195 @@
+# strategy_v4/io/KbarFetcher.py
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import polars as pl
+
+from strategy_v4.io.KbarStore import KbarStore, trading_date_expr, trading_date_of
+
+SESSION_CLOSE = dtime(13, 45)  # 日盤收盤：交易日在此之後才算完整
+
+
+class KbarSource(ABC):
+    """
+    K 線資料來源介面：
+    - fetch(contract, start, end) 回傳 Shioaji kbars 格式（dict / DataFrame）
+    - start / end 為日曆日（含），與 api.kbars 相同
+    - 抽象類別：未實作 fetch 的來源在建立時即失敗
+    """
+
+    @abstractmethod
+    def fetch(self, contract: str, start: date, end: date):
+        ...
+
+
+class ShioajiKbarSource(KbarSource):
+    """
+    Shioaji api.kbars 來源：
+    - contracts 可預先指定 {code: Contract}，否則由 api.Contracts.Futures[code] 取得
+    """
+
+    def __init__(self, api, contracts: Dict[str, object] | None = None):
+        self.api = api
+        self.contracts = dict(contracts or {})
+
+    def _contract(self, code: str):
+        if code not in self.contracts:
+            self.contracts[code] = self.api.Contracts.Futures[code]
+        return self.contracts[code]
+
+    def fetch(self, contract: str, start: date, end: date):
+        kbars = self.api.kbars(
+            contract=self._contract(contract),
+            start=start.strftime("%Y-%m-%d"),
+            end=end.strftime("%Y-%m-%d"),
+        )
+        return {**kbars}
+
+
+class RateLimiter:
+    """令牌桶限流（執行緒安全）：每 per 秒最多 rate 次請求"""
+
+    def __init__(self, rate: float = 5, per: float = 1.0):
+        self.rate = float(rate)
+        self.per = float(per)
+        self._tokens = self.rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate / self.per)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.per / self.rate
+            time.sleep(wait)
+
+
+class KbarFetcher:
+    """
+    增量 K 線下載：
+    - 依 KbarStore manifest 找出缺少或過期的交易日（更新時間早於該交易日收盤者視為過期，含盤中交易日）
+    - 連續缺口合併成區間，再切成 chunk_days 天一段並行抓取（受 RateLimiter 限流）
+    - 抓回的資料只保留計畫內交易日，經 transform 後 upsert 進 store；無資料的交易日記為空分割
+    """
+
+    def __init__(
+        self,
+        source: KbarSource,
+        store: KbarStore | None = None,
+        resolution: str = "1m",
+        max_workers: int = 4,
+        rate: float = 5,
+        per: float = 1.0,
+        chunk_days: int = 5,
+        holidays: Iterable[date] | None = None,
+        transform: Callable[[pl.DataFrame], pl.DataFrame] | None = None,
+    ):
+        self.source = source
+        self.store = store or KbarStore()
+        self.resolution = resolution
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, per)
+        self.chunk_days = max(1, int(chunk_days))
+        self.holidays = set(holidays or [])
+        self.transform = transform
+
+    # ===== 計畫 =====
+    def trading_days(self, start: date, end: date) -> List[date]:
+        """區間內的交易日（週一至週五，排除 holidays）"""
+        days, d = [], start
+        while d <= end:
+            if d.weekday() < 5 and d not in self.holidays:
+                days.append(d)
+            d += timedelta(days=1)
+        return days
+
+    def is_stale(self, contract: str, trading_date: date) -> bool:
+        """未儲存，或最後更新時間早於該交易日收盤"""
+        info = self.store.partition_info(contract, self.resolution, trading_date)
+        if not info or "updated_at" not in info:
+            return True
+        return datetime.fromisoformat(info["updated_at"]) < datetime.combine(trading_date, SESSION_CLOSE)
+
+    def plan(self, contract: str, start: date, end: date | None = None,
+             now: datetime | None = None) -> List[Tuple[date, date]]:
+        """
+        需要抓取的交易日區間（含頭尾）：
+        - end 預設為目前所屬交易日（盤中交易日一定會被重抓）
+        - 未來的交易日不列入
+        """
+        now = now or datetime.now()
+        end = min(end or trading_date_of(now), trading_date_of(now))
+        missing = [d for d in self.trading_days(start, end) if self.is_stale(contract, d)]
+
+        ranges: List[Tuple[date, date]] = []
+        for d in missing:
+            if ranges and self._next_trading_day(ranges[-1][1]) == d and \
+                    len(self.trading_days(ranges[-1][0], d)) <= self.chunk_days:
+                ranges[-1] = (ranges[-1][0], d)
+            else:
+                ranges.append((d, d))
+        return ranges
+
+    def _next_trading_day(self, d: date) -> date:
+        d += timedelta(days=1)
+        while d.weekday() >= 5 or d in self.holidays:
+            d += timedelta(days=1)
+        return d
+
+    # ===== 抓取 =====
+    def _fetch_range(self, contract: str, first: date, last: date, now: datetime) -> List[date]:
+        """抓取一段交易日：日曆區間從前一日開始（夜盤屬於下一個交易日）"""
+        self.limiter.acquire()
+        raw = self.source.fetch(contract, first - timedelta(days=3 if first.weekday() == 0 else 1), last)
+        df = KbarStore.normalize(raw)
+        if df.height:
+            df = (
+                df.with_columns(trading_date_expr())
+                .filter(pl.col("trading_date").is_between(first, last))
+                .drop("trading_date")
+            )
+        if self.transform is not None and df.height:
+            df = self.transform(df)
+
+        touched = self.store.upsert(df, contract, self.resolution, updated_at=now) if df.height else []
+        empty = [d for d in self.trading_days(first, last) if d not in set(touched)]
+        if empty:
+            self.store.mark_empty(contract, self.resolution, empty, updated_at=now)
+        return touched
+
+    def sync(self, contract: str, start: date, end: date | None = None,
+             now: datetime | None = None) -> dict:
+        """
+        補齊 store 到最新：
+        :return: {"ranges": 抓取區間, "touched": 寫入的交易日, "failed": 失敗區間}
+        """
+        now = now or datetime.now()
+        ranges = self.plan(contract, start, end, now=now)
+        touched: List[date] = []
+        failed: List[Tuple[date, date]] = []
+        if not ranges:
+            print(f"[KbarFetcher] {contract}/{self.resolution} 已是最新")
+            return {"ranges": [], "touched": [], "failed": []}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_range, contract, a, b, now): (a, b) for a, b in ranges}
+            for fut in as_completed(futures):
+                a, b = futures[fut]
+                try:
+                    touched.extend(fut.result())
+                except Exception as e:
+                    failed.append((a, b))
+                    print(f"[KbarFetcher] ❌ 抓取失敗 {contract} {a}~{b}: {e}")
+
+        print(f"[KbarFetcher] {contract}/{self.resolution} 抓取 {len(ranges)} 段｜寫入 {len(touched)} 個交易日｜失敗 {len(failed)} 段")
+        return {"ranges": ranges, "touched": sorted(touched), "failed": sorted(failed)}
@@ -0,0 +1,197 @@
+# strategy_v4/io/KbarStore.py
+
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import polars as pl
+
+from strategy_v4.DataPathManager import DataPathManager
+
+# Shioaji kbars / pandas 常見欄位 → 統一欄位
+COLUMN_ALIASES = {
+    "ts": "datetime", "Open": "open", "High": "high", "Low": "low",
+    "Close": "close", "Volume": "volume", "Amount": "amount",
+}
+FLOAT_COLUMNS = ("open", "high", "low", "close", "amount")
+
+
+def trading_date_expr(col: str = "datetime") -> pl.Expr:
+    """
+    TAIFEX 交易日：
+    - 夜盤 15:00 起至次日 05:00 屬於下一個交易日，日盤 08:45~13:45 屬於當日
+    - 做法：時間 +9 小時後取日期（15:00 → 隔日 00:00，05:00 → 當日 14:00）
+    - 週五夜盤落在週六，順延到週一（國定假日不處理）
+    """
+    d = (pl.col(col) + pl.duration(hours=9)).dt.date()
+    wd = d.dt.weekday()  # 週一=1 … 週日=7
+    return (
+        pl.when(wd == 6).then(d + pl.duration(days=2))
+        .when(wd == 7).then(d + pl.duration(days=1))
+        .otherwise(d)
+        .alias("trading_date")
+    )
+
+
+def trading_date_of(ts: datetime) -> date:
+    """單一時間點的交易日（規則同 trading_date_expr）"""
+    d = (ts + timedelta(hours=9)).date()
+    wd = d.weekday()  # 週一=0 … 週日=6
+    return d + timedelta(days=7 - wd) if wd >= 5 else d
+
+
+class KbarStore:
+    """
+    K 線 Parquet 儲存層：
+    - 依 contract / resolution / 交易日 分割，每個分割一個 Parquet 檔
+    - 欄位型別固定（datetime 為 Datetime，OHLC/amount 為 Float64，volume 為 Int64）
+    - manifest.json 記錄每個分割的版本（每次寫入 +1）、筆數、時間範圍與更新時間
+    - upsert 以 datetime 去重（新資料覆蓋舊資料），重複寫入結果不變
+    """
+
+    def __init__(self, root: str | Path | None = None, path_manager: DataPathManager | None = None):
+        self.paths = path_manager or DataPathManager()
+        self.root = Path(root) if root else Path(self.paths.get_kbar_store_root())
+        self.manifest_path = self.root / "manifest.json"
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, dict] | None = None
+
+    # ===== manifest =====
+    @staticmethod
+    def _key(contract: str, resolution: str, trading_date: date) -> str:
+        return f"{contract}/{resolution}/{trading_date.isoformat()}"
+
+    def manifest(self) -> Dict[str, dict]:
+        """載入 manifest（快取於記憶體）"""
+        if self._manifest is None:
+            if self.manifest_path.exists():
+                with self.manifest_path.open("r", encoding="utf-8") as f:
+                    self._manifest = json.load(f).get("partitions", {})
+            else:
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"partitions": self.manifest()}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def dates(self, contract: str, resolution: str = "1m", include_empty: bool = False) -> List[date]:
+        """已儲存的交易日（排序）；include_empty=True 時包含已抓取但無資料的日期"""
+        prefix = f"{contract}/{resolution}/"
+        return sorted(
+            date.fromisoformat(k[len(prefix):])
+            for k, info in self.manifest().items()
+            if k.startswith(prefix) and (include_empty or info.get("rows", 0) > 0)
+        )
+
+    def partition_info(self, contract: str, resolution: str, trading_date: date) -> dict | None:
+        return self.manifest().get(self._key(contract, resolution, trading_date))
+
+    def partition_path(self, contract: str, resolution: str, trading_date: date) -> Path:
+        return Path(self.paths.get_kbar_partition(contract, resolution, trading_date, root=self.root))
+
+    # ===== 寫入 =====
+    @staticmethod
+    def normalize(df) -> pl.DataFrame:
+        """統一欄位名稱與型別（接受 pandas / polars / Shioaji kbars dict）"""
+        if isinstance(df, dict):
+            df = pl.DataFrame(df)
+        elif not isinstance(df, pl.DataFrame):
+            df = pl.from_pandas(df.reset_index() if df.index.name else df)
+        df = df.rename({k: v for k, v in COLUMN_ALIASES.items() if k in df.columns})
+        if "datetime" not in df.columns:  # 空的 kbars 回應
+            return pl.DataFrame(schema={"datetime": pl.Datetime("us")})
+
+        ts = df["datetime"]
+        if ts.dtype == pl.Int64:  # Shioaji ts 為奈秒 epoch
+            df = df.with_columns(pl.from_epoch("datetime", time_unit="ns").cast(pl.Datetime("us")))
+        elif ts.dtype == pl.String:
+            df = df.with_columns(pl.col("datetime").str.to_datetime().cast(pl.Datetime("us")))
+        else:
+            df = df.with_columns(pl.col("datetime").cast(pl.Datetime("us")))
+
+        casts = [pl.col(c).cast(pl.Float64) for c in FLOAT_COLUMNS if c in df.columns]
+        if "volume" in df.columns:
+            casts.append(pl.col("volume").cast(pl.Int64))
+        return df.with_columns(casts)
+
+    def _write_partition(self, path: Path, df: pl.DataFrame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        df.write_parquet(tmp, statistics=True)
+        os.replace(tmp, path)
+
+    def upsert(self, df, contract: str, resolution: str = "1m", updated_at: datetime | None = None) -> List[date]:
+        """
+        寫入/更新 K 線（只改寫受影響的交易日分割）
+        :param updated_at: 資料取得時間（預設為現在），供增量抓取判斷是否過期
+        :return: 被改寫的交易日列表
+        """
+        stamp = (updated_at or datetime.now()).isoformat(timespec="seconds")
+        data = self.normalize(df)
+        if data.height == 0:
+            return []
+        data = data.with_columns(trading_date_expr())
+
+        touched: List[date] = []
+        with self._lock:
+            for (td,), part in data.partition_by("trading_date", as_dict=True, maintain_order=True).items():
+                part = part.drop("trading_date")
+                path = self.partition_path(contract, resolution, td)
+                if path.exists():
+                    old = pl.read_parquet(path)
+                    part = pl.concat([old, part], how="diagonal_relaxed")
+                part = part.unique(subset="datetime", keep="last").sort("datetime")
+
+                self._write_partition(path, part)
+                key = self._key(contract, resolution, td)
+                self.manifest()[key] = {
+                    "version": self.manifest().get(key, {}).get("version", 0) + 1,
+                    "rows": part.height,
+                    "start": part["datetime"][0].isoformat(),
+                    "end": part["datetime"][-1].isoformat(),
+                    "updated_at": stamp,
+                }
+                touched.append(td)
+            self._save_manifest()
+        return touched
+
+    def mark_empty(self, contract: str, resolution: str, trading_dates: Iterable[date],
+                   updated_at: datetime | None = None):
+        """記錄已抓取但沒有 K 棒的交易日（休市日），避免重複抓取；已有資料的日期不受影響"""
+        now = (updated_at or datetime.now()).isoformat(timespec="seconds")
+        with self._lock:
+            for td in trading_dates:
+                info = self.manifest().setdefault(self._key(contract, resolution, td), {"rows": 0})
+                if info.get("rows", 0) == 0:
+                    info["updated_at"] = now
+            self._save_manifest()
+
+    # ===== 讀取 =====
+    def files(self, contract: str, resolution: str = "1m", start: date | None = None,
+              end: date | None = None) -> List[Path]:
+        """依 manifest 取得交易日區間內的分割檔（不列目錄）"""
+        return [
+            self.partition_path(contract, resolution, d)
+            for d in self.dates(contract, resolution)
+            if (start is None or d >= start) and (end is None or d <= end)
+        ]
+
+    def scan(self, contract: str, resolution: str = "1m", start: date | None = None,
+             end: date | None = None, columns: Iterable[str] | None = None) -> pl.LazyFrame:
+        """延遲讀取交易日區間（只打開區間內的分割檔）"""
+        files = self.files(contract, resolution, start, end)
+        if not files:
+            return pl.LazyFrame(schema={"datetime": pl.Datetime("us")})
+        lf = pl.scan_parquet(files)
+        return lf.select(list(columns)) if columns is not None else lf
+
+    def read(self, contract: str, resolution: str = "1m", start: date | None = None,
+             end: date | None = None, columns: Iterable[str] | None = None) -> pl.DataFrame:
+        return self.scan(contract, resolution, start, end, columns).collect()
@@ -0,0 +1,227 @@
+# strategy_v4/io/MarketData.py
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+TickCallback = Callable[[dict], None]
+
+# kbar 展開成 tick 時，每根 K 棒內的四個價格點（秒）
+BAR_TICK_OFFSETS = (0, 15, 30, 59)
+
+
+class MarketDataAdapter(ABC):
+    """
+    行情來源介面：
+    - subscribe(codes, callback)：callback 收到統一格式的 tick dict（code, price, volume, bid, ask, timestamp）
+    - start()：開始推送（不阻塞）；stop()：停止推送
+    - 即時（Shioaji）與回放（ReplayAdapter）共用同一個 callback，策略端不需區分
+    - 抽象類別：未實作 subscribe 的來源在建立時即失敗
+    """
+
+    @abstractmethod
+    def subscribe(self, codes: Iterable[str], callback: TickCallback):
+        ...
+
+    def start(self, on_done: Callable[[], None] | None = None):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ShioajiAdapter(MarketDataAdapter):
+    """
+    Shioaji 即時行情：
+    - contracts 為 {code: Contract}（或由 api.Contracts.Futures 依代號取得）
+    - on_tick_fop_v1 callback 只轉成 tick dict 後交給 callback（不做計算）
+    - start() 時才向券商訂閱，接收端就緒前不會收到 tick
+    """
+
+    def __init__(self, api, contracts: Dict[str, object] | None = None):
+        self.api = api
+        self.contracts = dict(contracts or {})
+        self.codes: List[str] = []
+        self.callback: TickCallback | None = None
+
+    def _contract(self, code: str):
+        if code not in self.contracts:
+            self.contracts[code] = getattr(self.api.Contracts.Futures, code[:3])[code]
+        return self.contracts[code]
+
+    @staticmethod
+    def to_tick(tick) -> dict:
+        return {
+            "code": tick.code,
+            "price": tick.close,
+            "volume": tick.volume,
+            "bid": getattr(tick, "bid_price", None),
+            "ask": getattr(tick, "ask_price", None),
+            "timestamp": tick.datetime,
+        }
+
+    def subscribe(self, codes: Iterable[str], callback: TickCallback):
+        self.callback = callback
+        self.codes = list(codes)
+
+        @self.api.on_tick_fop_v1()
+        def tick_callback(exchange, tick):
+            callback(self.to_tick(tick))
+
+    def start(self, on_done: Callable[[], None] | None = None):
+        from shioaji.constant import QuoteType, QuoteVersion
+
+        for code in self.codes:
+            self.api.quote.subscribe(self._contract(code), quote_type=QuoteType.Tick, version=QuoteVersion.v1)
+
+    def stop(self):
+        from shioaji.constant import QuoteType, QuoteVersion
+
+        for code in self.codes:
+            self.api.quote.unsubscribe(self._contract(code), quote_type=QuoteType.Tick, version=QuoteVersion.v1)
+
+
+class ReplayAdapter(MarketDataAdapter):
+    """
+    錄製資料回放：
+    - source：tick 檔（timestamp, price, volume[, code]，例如 TickRecorder 的 tick_data.csv）
+      或 kbar 檔（datetime/ts, open, high, low, close, volume），CSV / Parquet / DataFrame / list[dict]
+    - kbar 每根展開成 O → L/H → H/L → C 四筆 tick（收紅先低後高），volume 平均分配
+    - speed：1.0 依錄製時間間隔、N 倍速；None 或 0 為最快速度（不等待）
+    - tick 的 timestamp 保留錄製時間，策略看到的時間與實盤一致
+    - polars 只在讀取回放來源時載入（即時模式不需要）
+    """
+
+    def __init__(self, source, speed: float | None = 1.0, code: str = "REPLAY",
+                 start: datetime | None = None, end: datetime | None = None):
+        self.source = source
+        self.speed = speed
+        self.code = code
+        self.start_at = start
+        self.end_at = end
+        self.codes: List[str] = []
+        self.callback: TickCallback | None = None
+        self.delivered = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ===== 讀取 =====
+    @staticmethod
+    def _read(source) -> "pl.DataFrame":
+        import polars as pl
+
+        from strategy_v4.pipeline.polars_indicator_utils import as_polars
+
+        if isinstance(source, (str, Path)):
+            path = Path(source)
+            if path.suffix == ".parquet":
+                return pl.read_parquet(path)
+            return pl.read_csv(path, try_parse_dates=True, infer_schema_length=10000)
+        return as_polars(source)
+
+    def ticks(self) -> List[dict]:
+        """來源 → 依時間排序的 tick 列表"""
+        import polars as pl
+
+        df = self._read(self.source)
+        if "ts" in df.columns and "datetime" not in df.columns and "timestamp" not in df.columns:
+            df = df.with_columns(pl.from_epoch("ts", time_unit="ns").alias("datetime"))
+
+        if "price" in df.columns:
+            time_col = "timestamp" if "timestamp" in df.columns else "datetime"
+            df = df.filter(pl.col("price").is_not_null())
+        else:
+            time_col = "timestamp"
+            df = self._bars_to_ticks(df)
+
+        if df.schema[time_col] == pl.String:
+            df = df.with_columns(pl.col(time_col).str.to_datetime())
+        if self.start_at is not None:
+            df = df.filter(pl.col(time_col) >= self.start_at)
+        if self.end_at is not None:
+            df = df.filter(pl.col(time_col) <= self.end_at)
+        if "code" not in df.columns:
+            df = df.with_columns(pl.lit(self.code).alias("code"))
+        if self.codes:
+            df = df.filter(pl.col("code").is_in(self.codes))
+
+        df = df.sort(time_col, maintain_order=True)
+        cols = [c for c in ("code", "price", "volume", "bid", "ask") if c in df.columns]
+        out = df.select(*cols, pl.col(time_col).alias("timestamp")).to_dicts()
+        return out
+
+    @staticmethod
+    def _bars_to_ticks(bars: "pl.DataFrame") -> "pl.DataFrame":
+        import polars as pl
+
+        time_col = "datetime" if "datetime" in bars.columns else "timestamp"
+        up = pl.col("close") >= pl.col("open")
+        volume = pl.col("volume").cast(pl.Float64) / len(BAR_TICK_OFFSETS) if "volume" in bars.columns else pl.lit(0.0)
+        keep = [c for c in ("code",) if c in bars.columns]
+        points = [
+            pl.col("open"),
+            pl.when(up).then(pl.col("low")).otherwise(pl.col("high")),
+            pl.when(up).then(pl.col("high")).otherwise(pl.col("low")),
+            pl.col("close"),
+        ]
+        parts = [
+            bars.select(
+                *keep,
+                (pl.col(time_col) + pl.duration(seconds=offset)).alias("timestamp"),
+                price.cast(pl.Float64).alias("price"),
+                volume.alias("volume"),
+                pl.lit(i).alias("_seq"),
+            )
+            for i, (offset, price) in enumerate(zip(BAR_TICK_OFFSETS, points))
+        ]
+        return pl.concat(parts).sort("timestamp", "_seq").drop("_seq")
+
+    # ===== 推送 =====
+    def subscribe(self, codes: Iterable[str], callback: TickCallback):
+        self.codes = [c for c in codes if c]
+        self.callback = callback
+
+    def run(self) -> int:
+        """在目前執行緒回放全部資料（stop() 可中斷），回傳推送筆數"""
+        ticks = self.ticks()
+        self._stop.clear()
+        t0 = time.perf_counter()
+        first = ticks[0]["timestamp"] if ticks else None
+        pacing = bool(self.speed) and isinstance(first, datetime)
+        for tick in ticks:
+            if self._stop.is_set():
+                break
+            if pacing:
+                target = t0 + (tick["timestamp"] - first) / timedelta(seconds=1) / self.speed
+                delay = target - time.perf_counter()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            self.callback(tick)
+            self.delivered += 1
+        self.elapsed = time.perf_counter() - t0
+        rate = self.delivered / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"[ReplayAdapter] 回放 {self.delivered} 筆｜{self.elapsed:.2f}s｜{rate:,.0f} ticks/s")
+        return self.delivered
+
+    def start(self, on_done: Callable[[], None] | None = None):
+        """背景執行緒回放；結束後呼叫 on_done（例如停止 LiveRuntime）"""
+        def target():
+            try:
+                self.run()
+            finally:
+                if on_done is not None:
+                    on_done()
+
+        self._thread = threading.Thread(target=target, name="ReplayAdapter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout: float | None = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,58 @@
+# strategy_v4/io/ShadowLogger.py
+
+import csv
+from pathlib import Path
+from typing import Any, List
+
+class ShadowLogger:
+    """
+    影子引擎訊號紀錄器：
+    - 記錄 shadow 決策引擎在同一筆特徵上的假設訊號（不下單）
+    - 欄位精簡：每筆 tick × 每個 shadow 一列
+    - 與 TickRecorder 相同採 buffer 批次寫入
+    """
+
+    HEADER = [
+        "timestamp", "shadow", "mode", "params_version", "price",
+        "bias", "bias_prob", "entry_score", "exit_score", "should_enter",
+    ]
+
+    def __init__(self, log_path: str | Path = "shadow_log.csv", buffer_size: int = 500):
+        self.path = Path(log_path)
+        self.buffer_size = buffer_size
+        self.buffer: List[List[Any]] = []
+        self._initialized = False
+
+    def _init_file(self):
+        """初始化 CSV 檔案，建立標題列"""
+        if not self._initialized:
+            with self.path.open("w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(self.HEADER)
+            self._initialized = True
+
+    def log(self, timestamp, shadow: str, mode: str, params_version: str, price: float,
+            bias: str, bias_prob: float | None, entry_score: float, exit_score: float, should_enter: bool):
+        """寫入一筆 shadow 訊號到 buffer"""
+        if not self._initialized:
+            self._init_file()
+
+        self.buffer.append([
+            timestamp, shadow, mode, params_version, price, bias,
+            "" if bias_prob is None else round(bias_prob, 4),
+            round(entry_score, 4), round(exit_score, 4), int(bool(should_enter)),
+        ])
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """將 buffer 寫入檔案"""
+        if not self.buffer:
+            return
+        with self.path.open("a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(self.buffer)
+        self.buffer.clear()
+
+    def force_flush(self):
+        """強制立即寫入檔案"""
+        self.flush()
@@ -0,0 +1,245 @@
+# strategy_v4/io/SignalBus.py
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from strategy_v4.DataPathManager import DataPathManager
+
+MAGIC = b"SV4BUS01"
+VERSION = 1
+HEADER_SIZE = 64
+NAMES_SIZE = 4096          # 特徵名稱 JSON 區塊
+DATA_OFFSET = HEADER_SIZE + NAMES_SIZE
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("capacity", "<u4"),
+    ("record_size", "<u4"),
+    ("n_features", "<u4"),
+    ("write_seq", "<u8"),     # 已完成寫入的筆數（下一筆的序號）
+    ("created", "<f8"),
+    ("pid", "<u4"),
+    ("_pad", "V20"),
+])
+
+# 事件代碼（record["action"]）
+ACTIONS = ("", "ENTER", "ADD", "STOPLOSS", "TAKEPROFIT", "EXIT_SCORE", "TIME_EXIT", "EXIT")
+BIAS = {"bearish": -1, "neutral": 0, "bullish": 1}
+DIRECTION = {"short": -1, "long": 1}
+
+
+def record_dtype(n_features: int) -> np.dtype:
+    """
+    固定版面的紀錄格式（little-endian、8 byte 對齊）：
+    - seq：seqlock 序號，寫入中為奇數，寫完為 2 * (序號 + 1)
+    - ts：tick 時間（epoch ns）；features：特徵向量（名稱存於檔頭）
+    """
+    return np.dtype([
+        ("seq", "<u8"),
+        ("ts", "<i8"),
+        ("price", "<f8"),
+        ("volume", "<f8"),
+        ("entry_score", "<f8"),
+        ("exit_score", "<f8"),
+        ("bias_prob", "<f8"),
+        ("unrealized", "<f8"),
+        ("position_size", "<i4"),
+        ("bias", "i1"),
+        ("direction", "i1"),
+        ("in_position", "i1"),
+        ("action", "i1"),
+        ("features", "<f8", (n_features,)),
+    ])
+
+
+def _ts_ns(timestamp) -> int:
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp() * 1e9)
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    return time.time_ns()
+
+
+class SignalBus:
+    """
+    引擎訊號匯流排（寫入端，單一寫入者）：
+    - 每個 tick 的價格、特徵向量、分數與持倉狀態寫入 mmap 環形緩衝（固定版面、numpy structured array）
+    - 每筆紀錄以 seqlock 序號保護：讀取端不加鎖、不影響交易迴圈，讀到寫入中的紀錄會自動略過
+    - 特徵名稱在第一筆 publish 時固定（或由 features 指定），之後缺少的特徵寫入 NaN
+    - 外部行程以 SignalBusReader 讀取（儀表板、記錄器、第二策略）
+    """
+
+    def __init__(self, path: str | Path | None = None, capacity: int = 65536, features: List[str] | None = None,
+                 path_manager: DataPathManager | None = None):
+        self.path = Path(path or (path_manager or DataPathManager()).get_path("signal_bus.bin"))
+        self.capacity = int(capacity)
+        self.features: List[str] | None = list(features) if features is not None else None
+        self.published = 0
+        self._mm: np.memmap | None = None
+        self._header = None
+        self._records = None
+        self._seq = None
+        self._scratch = None
+        self._index: Dict[str, int] = {}
+        if self.features is not None:
+            self._open()
+
+    def _open(self):
+        names = json.dumps(self.features).encode("utf-8")
+        if len(names) > NAMES_SIZE:
+            raise ValueError(f"[SignalBus] 特徵名稱超過 {NAMES_SIZE} bytes")
+        dtype = record_dtype(len(self.features))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(DATA_OFFSET + self.capacity * dtype.itemsize,))
+        self._mm[HEADER_SIZE:HEADER_SIZE + len(names)] = np.frombuffer(names, dtype=np.uint8)
+        self._header = self._mm[:HEADER_SIZE].view(HEADER_DTYPE)
+        self._records = self._mm[DATA_OFFSET:].view(dtype)
+        self._seq = self._records["seq"]
+        self._scratch = np.zeros(1, dtype=dtype)
+        self._index = {name: i for i, name in enumerate(self.features)}
+        self._header[0] = (MAGIC, VERSION, self.capacity, dtype.itemsize, len(self.features), 0, time.time(), os.getpid(), b"")
+        print(f"[SignalBus] {self.path}｜容量 {self.capacity}｜特徵 {len(self.features)}｜每筆 {dtype.itemsize} bytes")
+
+    def publish(self, timestamp, price: float, volume: float, tick: dict, features: Dict[str, float],
+                state=None, action: str | None = None) -> int:
+        """寫入一筆紀錄，回傳其序號"""
+        if self._records is None:
+            self.features = sorted(k for k, v in features.items() if isinstance(v, (int, float)))
+            self._open()
+
+        rec = self._scratch[0]
+        n = self.published
+        rec["seq"] = 2 * n + 1
+        rec["ts"] = _ts_ns(timestamp)
+        rec["price"] = price
+        rec["volume"] = volume
+        v4 = tick.get("mode") == "v4"
+        rec["entry_score"] = float(tick.get("entry_score_v2" if v4 else "entry_score", 0.0) or 0.0)
+        rec["exit_score"] = float(tick.get("exit_score_v2" if v4 else "exit_score", 0.0) or 0.0)
+        rec["bias_prob"] = float(tick.get("bias_prob", np.nan))
+        rec["bias"] = BIAS.get(tick.get("bias"), 0)
+        rec["action"] = ACTIONS.index(action) if action in ACTIONS else 0
+        if state is not None and state.in_position:
+            rec["in_position"] = 1
+            rec["direction"] = DIRECTION.get(state.direction, 0)
+            rec["position_size"] = int(state.current_position_size or 0)
+            rec["unrealized"] = state.get_unrealized_profit(price)
+        else:
+            rec["in_position"] = rec["direction"] = rec["position_size"] = 0
+            rec["unrealized"] = 0.0
+        vec = rec["features"]
+        vec[:] = np.nan
+        for key, value in features.items():
+            i = self._index.get(key)
+            if i is not None:
+                vec[i] = value
+
+        # seqlock：奇數序號 → 寫入內容 → 偶數序號 → 推進 write_seq
+        slot = n % self.capacity
+        self._seq[slot] = 2 * n + 1
+        self._records[slot] = rec
+        self._seq[slot] = 2 * n + 2
+        self.published = n + 1
+        self._header["write_seq"] = n + 1
+        return n
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = self._header = self._records = self._seq = None
+
+
+class SignalBusReader:
+    """
+    SignalBus 讀取端（任意行程、可多個，不加鎖）：
+    - read(since)：讀取序號 since 之後的紀錄（複製），回傳 (records, 下一個序號, 遺失筆數)
+    - latest()：最新一筆；view() 為環形緩衝的零複製 numpy 視圖（需自行檢查 seq）
+    - follow()：輪詢新紀錄的產生器；to_dicts() 轉成含特徵名稱的 dict
+    """
+
+    def __init__(self, path: str | Path | None = None, path_manager: DataPathManager | None = None):
+        self.path = Path(path or (path_manager or DataPathManager()).get_path("signal_bus.bin"))
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self._header = self._mm[:HEADER_SIZE].view(HEADER_DTYPE)
+        head = self._header[0]
+        if head["magic"] != MAGIC or head["version"] != VERSION:
+            raise ValueError(f"[SignalBusReader] 格式不符：{self.path}")
+        self.capacity = int(head["capacity"])
+        self.dtype = record_dtype(int(head["n_features"]))
+        names = bytes(self._mm[HEADER_SIZE:DATA_OFFSET]).rstrip(b"\0")
+        self.features: List[str] = json.loads(names.decode("utf-8"))
+        self._records = self._mm[DATA_OFFSET:DATA_OFFSET + self.capacity * self.dtype.itemsize].view(self.dtype)
+        self.lost = 0
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._header["write_seq"][0])
+
+    def view(self) -> np.ndarray:
+        """零複製視圖（寫入端可能同時覆寫，讀取後需比對 seq）"""
+        return self._records
+
+    def read(self, since: int = 0, limit: int | None = None) -> Tuple[np.ndarray, int, int]:
+        head = self.write_seq
+        lost = 0
+        if head - since > self.capacity:
+            lost = head - self.capacity - since
+            since = head - self.capacity
+        if limit is not None:
+            head = min(head, since + limit)
+        if head <= since:
+            return self._records[:0].copy(), since, lost
+
+        seqs = np.arange(since, head, dtype=np.uint64)
+        slots = (seqs % self.capacity).astype(np.intp)
+        out = self._records[slots]                       # fancy index = 複製
+        after = self._records["seq"][slots]
+        ok = (out["seq"] == 2 * seqs + 2) & (after == out["seq"])
+        if not ok.all():
+            # 被寫入端追上（覆寫中或已覆寫）的紀錄視為遺失
+            lost += int((~ok).sum())
+            out = out[ok]
+        self.lost += lost
+        return out, head, lost
+
+    def latest(self) -> np.void | None:
+        head = self.write_seq
+        if head == 0:
+            return None
+        records, _, _ = self.read(head - 1)
+        return records[0] if len(records) else None
+
+    def follow(self, since: int | None = None, interval: float = 0.05, idle_timeout: float | None = None) -> Iterator[np.ndarray]:
+        """持續輪詢：每次產生一批新紀錄；idle_timeout 秒內無新資料則結束（None 為不結束）"""
+        since = self.write_seq if since is None else since
+        idle = 0.0
+        while True:
+            records, since, _ = self.read(since)
+            if len(records):
+                idle = 0.0
+                yield records
+                continue
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            time.sleep(interval)
+            idle += interval
+
+    def to_dicts(self, records: np.ndarray) -> List[dict]:
+        rows = []
+        for rec in records:
+            row = {name: rec[name].item() for name in self.dtype.names if name != "features"}
+            row["timestamp"] = datetime.fromtimestamp(row.pop("ts") / 1e9)
+            row["action"] = ACTIONS[row["action"]] or None
+            row.update(zip(self.features, rec["features"].tolist()))
+            rows.append(row)
+        return rows
+
+    def close(self):
+        self._mm = self._header = self._records = None
@@ -0,0 +1,87 @@
+# strategy_v4/io/TickIngestor.py
+
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+POLICIES = ("all", "coalesce", "shed")
+
+
+class TickIngestor:
+    """
+    Tick 進件佇列與過載策略（單一執行緒使用：put / get 都在事件迴圈執行緒）：
+    - all：每筆都處理；佇列滿時丟棄新進 tick
+    - coalesce：有積壓時，新 tick 併入佇列尾端同合約的 tick（價格取最新、volume 累加、high/low 取極值）
+    - shed：取出時丟棄等待超過 deadline 秒的 tick（保留最新一筆，避免用過期價格決策）
+    - stats：received / processed / coalesced / dropped、佇列深度與等待時間（last / max / avg）
+    """
+
+    def __init__(self, policy: str = "all", maxsize: int = 10000, deadline: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"[TickIngestor] 未知的過載策略：{policy}（可用：{POLICIES}）")
+        self.policy = policy
+        self.maxsize = int(maxsize)
+        self.deadline = float(deadline)
+        self.clock = clock
+        self._queue: deque = deque()   # [抵達時間, tick]
+        self.stats: Dict[str, Any] = {
+            "received": 0, "processed": 0, "coalesced": 0, "dropped": 0,
+            "depth": 0, "max_depth": 0, "last_age": 0.0, "max_age": 0.0, "avg_age": 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @staticmethod
+    def _merge(old: dict, new: dict) -> dict:
+        merged = dict(old)
+        merged.update(new)
+        merged["volume"] = float(old.get("volume") or 0) + float(new.get("volume") or 0)
+        prices = [p for p in (old.get("high", old.get("price")), old.get("low", old.get("price")), new.get("price"))
+                  if p is not None]
+        if prices:
+            merged["high"], merged["low"] = max(prices), min(prices)
+        merged["coalesced"] = int(old.get("coalesced", 1)) + 1
+        return merged
+
+    def put(self, tick: dict) -> bool:
+        """放入 tick；回傳 False 表示被丟棄"""
+        st = self.stats
+        st["received"] += 1
+        q = self._queue
+        if self.policy == "coalesce" and q and q[-1][1].get("code") == tick.get("code"):
+            q[-1][1] = self._merge(q[-1][1], tick)   # 保留最早抵達時間，等待時間反映最舊的資訊
+            st["coalesced"] += 1
+            return True
+        if len(q) >= self.maxsize:
+            st["dropped"] += 1
+            return False
+        q.append([self.clock(), tick])
+        st["depth"] = len(q)
+        st["max_depth"] = max(st["max_depth"], len(q))
+        return True
+
+    def get(self) -> dict | None:
+        """取出下一筆 tick（佇列為空時回傳 None）"""
+        q = self._queue
+        if not q:
+            return None
+        st = self.stats
+        now = self.clock()
+        if self.policy == "shed":
+            while len(q) > 1 and now - q[0][0] > self.deadline:
+                q.popleft()
+                st["dropped"] += 1
+        arrived, tick = q.popleft()
+        age = now - arrived
+        st["processed"] += 1
+        st["depth"] = len(q)
+        st["last_age"] = age
+        st["max_age"] = max(st["max_age"], age)
+        st["avg_age"] += (age - st["avg_age"]) / st["processed"]
+        return tick
+
+    def oldest_age(self) -> float:
+        """目前佇列最舊 tick 的等待秒數"""
+        return self.clock() - self._queue[0][0] if self._queue else 0.0
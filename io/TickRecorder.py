@@ -1,6 +1,7 @@
 # strategy_v4/io/TickRecorder.py
 
 import csv
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
@@ -10,6 +11,7 @@ class TickRecorder:
     Tick 資料紀錄器：
     - 記錄每筆 tick 的指標與分數
     - 支援 v3/v4 模式，增加 mode、params_version、bias_prob、entry_score_v2、exit_score_v2 欄位
+    - flush 可由其他執行緒呼叫（buffer 以鎖交換後寫檔，不阻擋 record_tick）
     """
 
     def __init__(self, record_path: str | Path = "tick_data.csv", buffer_size: int = 100):
@@ -17,6 +19,8 @@ class TickRecorder:
         self.buffer_size = buffer_size
         self.buffer: List[List[Any]] = []
         self._initialized = False
+        self._lock = threading.Lock()        # 保護 buffer
+        self._write_lock = threading.Lock()  # 依序寫檔
 
     def _init_file(self):
         """初始化 CSV 檔案，建立標題列"""
@@ -70,19 +74,23 @@ class TickRecorder:
             tick.get("tick_since_entry", "")
         ]
 
-        self.buffer.append(row)
+        with self._lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.buffer_size
 
-        if len(self.buffer) >= self.buffer_size:
+        if full:
             self.flush()
 
     def flush(self):
         """將 buffer 寫入檔案"""
-        if not self.buffer:
-            return
-        with self.path.open("a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerows(self.buffer)
-        self.buffer.clear()
+        with self._write_lock:
+            with self._lock:
+                if not self.buffer:
+                    return
+                rows, self.buffer = self.buffer, []
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerows(rows)
 
     def force_flush(self):
         """強制立即寫入檔案"""
@@ -1,78 +1,173 @@
 # strategy_v4/io/TradeAnalyzer.py
 
 import csv
+import math
 from pathlib import Path
-from typing import Dict, Any, List
-from statistics import mean
+from typing import Any, Dict, Iterable, Iterator
+
+ENTRY_EVENTS = ("ENTER", "ADD")
+EXIT_EVENTS = ("STOPLOSS", "TAKEPROFIT", "EXIT_SCORE", "TIME_EXIT", "EXIT")
+
+
+class GroupStats:
+    """
+    單一分群的線上累計（每筆 round-trip 損益更新一次，記憶體固定）：
+    - Welford 平均 / 變異數、勝場數
+    - 累計損益曲線的高點、低點與最大回撤（起點為 0）
+    - merge() 視為「本段之後接另一段」合併，平均 / 變異數與順序無關，回撤依接續順序計算
+    """
+
+    __slots__ = ("count", "wins", "mean", "m2", "total", "peak", "trough", "max_drawdown")
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.peak = 0.0
+        self.trough = 0.0
+        self.max_drawdown = 0.0
+
+    def update(self, pnl: float):
+        self.count += 1
+        self.wins += pnl > 0
+        delta = pnl - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (pnl - self.mean)
+
+        self.total += pnl
+        self.peak = max(self.peak, self.total)
+        self.trough = min(self.trough, self.total)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.total)
+
+    def merge(self, other: "GroupStats") -> "GroupStats":
+        if other.count == 0:
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count = n
+        self.wins += other.wins
+
+        # 另一段的曲線平移到本段終點之後
+        self.max_drawdown = max(self.max_drawdown, other.max_drawdown, self.peak - (self.total + other.trough))
+        self.peak = max(self.peak, self.total + other.peak)
+        self.trough = min(self.trough, self.total + other.trough)
+        self.total += other.total
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "win_rate": round(self.wins / self.count, 3) if self.count else 0.0,
+            "avg_pnl": round(self.mean, 2),
+            "std_pnl": round(math.sqrt(self.variance), 2),
+            "total_pnl": round(self.total, 2),
+            "max_drawdown": round(self.max_drawdown, 2),
+        }
+
 
 class TradeAnalyzer:
     """
-    交易分析器：
-    - 讀取 trade_log.csv
-    - 分群比較 v3/v4、不同 params_version 的績效
-    - 計算勝率、平均盈虧、最大回撤
+    交易分析器（串流、單次掃描）：
+    - 逐列讀取 trade_log.csv，不保留整份紀錄；任意大小的紀錄檔記憶體固定
+    - ENTER / ADD 為進場腿，STOPLOSS / TAKEPROFIT / EXIT_SCORE / TIME_EXIT / EXIT 平倉，組成一筆 round-trip
+    - 損益由成交價計算（點數，含加碼腿），不使用 unrealized_profit 欄位
+    - 依進場時的 mode + params_version 分群累計勝率、平均 / 標準差、最大回撤
+    - merge() 合併多個平行回測的結果（例如各 worker 各自分析一份紀錄檔）
     """
 
     def __init__(self, log_path: str | Path = "trade_log.csv"):
         self.path = Path(log_path)
-        self.trades: List[Dict[str, Any]] = []
+        self.groups: Dict[str, GroupStats] = {}
+        self.open: Dict[str, Any] | None = None   # 目前未平倉的 round-trip
+        self.unmatched = 0                        # 無對應進場的出場列 / 被覆蓋的未平倉
+        self.skipped = 0                          # 價格無法解析的列
 
-    def load(self):
-        """載入交易紀錄"""
+    def rows(self) -> Iterator[Dict[str, str]]:
+        """逐列產生交易紀錄"""
         if not self.path.exists():
             print("[Analyzer] 無交易紀錄檔")
             return
-        with self.path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            self.trades = [row for row in reader]
-
-    def group_by_mode_version(self) -> Dict[str, List[Dict[str, Any]]]:
-        """依 mode + params_version 分群"""
-        groups: Dict[str, List[Dict[str, Any]]] = {}
-        for trade in self.trades:
-            key = f"{trade.get('mode','v3')}_{trade.get('params_version','unversioned')}"
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(trade)
-        return groups
-
-    def compute_stats(self, trades: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """計算統計數據"""
-        profits = []
-        max_drawdown = 0.0
-        current_peak = 0.0
-
-        for t in trades:
-            try:
-                pnl = float(t.get("unrealized_profit", 0.0))
-            except ValueError:
-                pnl = 0.0
-            profits.append(pnl)
-
-            # 計算回撤
-            current_peak = max(current_peak, pnl)
-            dd = current_peak - pnl
-            max_drawdown = max(max_drawdown, dd)
-
-        win_rate = sum(1 for p in profits if p > 0) / len(profits) if profits else 0.0
-        avg_pnl = mean(profits) if profits else 0.0
+        with self.path.open("r", newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
 
-        return {
-            "count": len(profits),
-            "win_rate": round(win_rate, 3),
-            "avg_pnl": round(avg_pnl, 2),
-            "max_drawdown": round(max_drawdown, 2),
-        }
+    @staticmethod
+    def group_key(row: Dict[str, Any]) -> str:
+        return f"{row.get('mode') or 'v3'}_{row.get('params_version') or 'unversioned'}"
 
-    def analyze(self):
-        """分群分析並輸出結果"""
-        self.load()
-        groups = self.group_by_mode_version()
-        results: Dict[str, Dict[str, Any]] = {}
+    def feed(self, row: Dict[str, Any]) -> float | None:
+        """處理一列紀錄；平倉時回傳該 round-trip 損益"""
+        event = row.get("event")
+        if event not in ENTRY_EVENTS and event not in EXIT_EVENTS:
+            return None
+        try:
+            price = float(row["price"])
+            size = int(float(row.get("position_size") or 0))
+        except (KeyError, TypeError, ValueError):
+            self.skipped += 1
+            return None
+
+        if event == "ENTER":
+            if self.open is not None:
+                self.unmatched += 1
+            qty = size or 1
+            self.open = {"key": self.group_key(row), "sign": -1.0 if row.get("direction") == "short" else 1.0,
+                         "size": qty, "cost": price * qty}
+            return None
+        if self.open is None:
+            self.unmatched += 1
+            return None
+        if event == "ADD":
+            qty = size - self.open["size"] if size > self.open["size"] else 1
+            self.open["size"] += qty
+            self.open["cost"] += price * qty
+            return None
 
-        for key, trades in groups.items():
-            stats = self.compute_stats(trades)
-            results[key] = stats
-            print(f"[Analyzer] {key} | 勝率={stats['win_rate']} | 平均盈虧={stats['avg_pnl']} | 最大回撤={stats['max_drawdown']} | 筆數={stats['count']}")
+        trade, self.open = self.open, None
+        pnl = trade["sign"] * (price * trade["size"] - trade["cost"])
+        self.groups.setdefault(trade["key"], GroupStats()).update(pnl)
+        return pnl
 
+    def run(self, rows: Iterable[Dict[str, Any]] | None = None) -> Dict[str, GroupStats]:
+        for row in (self.rows() if rows is None else rows):
+            self.feed(row)
+        return self.groups
+
+    def merge(self, other: "TradeAnalyzer") -> "TradeAnalyzer":
+        """合併另一個分析結果（同分群累計值相加，回撤視為接在本結果之後）"""
+        for key, stats in other.groups.items():
+            self.groups.setdefault(key, GroupStats()).merge(stats)
+        self.unmatched += other.unmatched
+        self.skipped += other.skipped
+        return self
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        return {key: stats.to_dict() for key, stats in self.groups.items()}
+
+    def compute_stats(self, trades: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """單一分群的統計（trades 為紀錄列，不分群）"""
+        analyzer = TradeAnalyzer(self.path)
+        stats = GroupStats()
+        for row in trades:
+            pnl = analyzer.feed(row)
+            if pnl is not None:
+                stats.update(pnl)
+        return stats.to_dict()
+
+    def analyze(self):
+        """分群分析並輸出結果"""
+        if not self.groups:
+            self.run()
+        results = self.results()
+        for key, stats in results.items():
+            print(f"[Analyzer] {key} | 勝率={stats['win_rate']} | 平均盈虧={stats['avg_pnl']} | 標準差={stats['std_pnl']} | 最大回撤={stats['max_drawdown']} | 筆數={stats['count']}")
+        if self.open is not None or self.unmatched:
+            print(f"[Analyzer] 未平倉 {int(self.open is not None)} 筆｜無法配對 {self.unmatched} 筆")
         return results
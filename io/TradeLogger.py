@@ -15,6 +15,7 @@ class TradeLogger:
     def __init__(self, log_path: str | Path = "trade_log.csv"):
         self.path = Path(log_path)
         self._initialized = False
+        self.rows = 0  # 已寫入的紀錄筆數（不含標題）
 
     def _init_file(self):
         """初始化 CSV 檔案，建立標題列"""
@@ -57,5 +58,49 @@ class TradeLogger:
         with self.path.open("a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(row)
+        self.rows += 1
 
         print(f"[LOG] {event} @ {price} | mode={state.get('mode')} | ver={state.get('params_version')}")
+
+    def resume(self) -> int:
+        """
+        接續既有紀錄檔（當機重啟時使用）：
+        - 不重寫標題、不清空檔案，之後的紀錄直接附加
+        :return: 既有紀錄筆數
+        """
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with self.path.open("r", newline="", encoding="utf-8") as f:
+                self.rows = max(sum(1 for _ in csv.reader(f)) - 1, 0)
+            self._initialized = True
+        return self.rows
+
+    def identity(self) -> Dict[str, Any]:
+        """
+        紀錄檔識別（檢查點比對用）：
+        - initialized：本 session 是否已建立（覆寫）過紀錄檔；未建立時磁碟上可能是前一次的舊檔
+        - size / first_row：檔案大小與第一筆紀錄原文，檔案不存在時為 None
+        """
+        size, first_row = None, None
+        if self.path.exists():
+            size = self.path.stat().st_size
+            with self.path.open("r", newline="", encoding="utf-8") as f:
+                f.readline()
+                first_row = f.readline().rstrip("\r\n") or None
+        return {"initialized": self._initialized, "size": size, "first_row": first_row}
+
+    def last_entry(self) -> Dict[str, Any] | None:
+        """最後一筆紀錄（只讀檔尾，無紀錄時回傳 None）"""
+        if not self.path.exists():
+            return None
+        with self.path.open("rb") as f:
+            header = f.readline()
+            f.seek(0, 2)
+            size = f.tell()
+            f.seek(max(size - 8192, len(header)))
+            tail = f.read().decode("utf-8", errors="ignore").splitlines()
+        lines = [line for line in tail if line.strip()]
+        if not lines:
+            return None
+        keys = next(csv.reader([header.decode("utf-8").strip()]))
+        values = next(csv.reader([lines[-1]]))
+        return dict(zip(keys, values)) if values != keys else None
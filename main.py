@@ -1,75 +1,225 @@
-import json
-from datetime import datetime
-import shioaji as sj
-from shioaji.constant import QuoteType, QuoteVersion
+from strategy_v4.StartupTimer import StartupTimer  # 最先匯入：之後的匯入耗時計入 imports 階段
 
+import json
+import signal
+import threading
+from datetime import datetime, timedelta
+from functools import partial
 
-from KlineInitializer import KlineInitializer
+from strategy_v4.LiveRuntime import LiveRuntime
 from strategy_v4.engines.StrategyState import StrategyState
 from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.ContractCache import ContractCache
+from strategy_v4.io.EngineCheckpoint import EngineCheckpoint
+from strategy_v4.io.EngineMetrics import EngineMetrics, MetricsServer
+from strategy_v4.io.MarketData import ReplayAdapter, ShioajiAdapter
+from strategy_v4.io.SignalBus import SignalBus
 from strategy_v4.io.TradeLogger import TradeLogger
 from strategy_v4.io.TickRecorder import TickRecorder
 
-# ====== 讀取設定與登入 ======
-with open("config.json", "r", encoding="utf-8") as f:
-    config = json.load(f)
+WARMUP_CONTRACT = "TMFR1"   # 暖機用連續月（與 backtest_kbars 的 KbarStore 相同）
+WARMUP_DAYS = 5             # 往回補齊的日曆日數（涵蓋週末）
+CHECKPOINT_MAX_AGE = 6 * 3600  # 超過此秒數的檢查點不還原（視為前一盤）
+
+
+def login(config: dict):
+    """
+    Shioaji 登入（回放模式不需要，故延遲匯入 shioaji）：
+    - 登入時不下載合約檔，合約由 ContractCache 提供（每個交易日只下載一次）
+    """
+    import shioaji as sj
+
+    simulation_mode = config.get("simulation", True)
+    api = sj.Shioaji(simulation=simulation_mode)
+    api.login(api_key=config["api_key"], secret_key=config["secret_key"], fetch_contract=False)
+    print(f"✅ 登入成功｜模式：{'模擬' if simulation_mode else '真實'}")
+
+    # ====== 憑證啟用（真實模式） ======
+    if not simulation_mode and "ca_path" in config:
+        api.activate_ca(
+            ca_path=config["ca_path"],
+            ca_passwd=config["ca_passwd"],
+            person_id=config["person_id"]
+        )
+        print("✅ 憑證啟用成功")
+    return api
+
+
+def load_warmup_bars(api, n: int, warmup: str = WARMUP_CONTRACT, cache: ContractCache | None = None):
+    """
+    暖機 K 棒：
+    - 先以 KbarFetcher 增量補齊 KbarStore 最近幾天（已收盤的交易日不重抓；api 為 None 時只讀 store）
+    - 再更新 BarPyramid（只重建有更新的交易日），供 warm_start 接續指標狀態與讀取 5m / 15m
+    - 由 store 讀出最後 n 根 1m K 棒
+    - KbarStore / KbarFetcher / BarPyramid（polars）在此才匯入：由檢查點還原時不需要
+    :return: (1m K 棒, BarPyramid；建構失敗時為 None)
+    """
+    from strategy_v4.io.KbarFetcher import KbarFetcher, ShioajiKbarSource
+    from strategy_v4.io.KbarStore import KbarStore
+    from strategy_v4.pipeline.BarPyramid import BarPyramid
+
+    store = KbarStore()
+    start = (datetime.now() - timedelta(days=WARMUP_DAYS)).date()
+    if api is not None:
+        try:
+            source = ShioajiKbarSource(api, {warmup: (cache or ContractCache()).contract(api, warmup)})
+            KbarFetcher(source, store).sync(warmup, start)
+        except Exception as e:
+            print(f"⚠️ 暖機 K 棒同步失敗，使用既有資料：{e}")
+    pyramid = BarPyramid(store, warmup)
+    try:
+        pyramid.build()
+    except Exception as e:
+        print(f"⚠️ BarPyramid 更新失敗，暖機改為從頭計算：{e}")
+        pyramid = None
+    bars = store.read(warmup, "1m") if api is None else store.read(warmup, "1m", start=start)
+    return bars.tail(n), pyramid
+
+
+def load_contracts(api, config: dict) -> ContractCache:
+    """
+    合約快取：同一交易日直接讀本機 JSON，否則下載合約檔後更新（config["contracts"]["products"]）
+    - 合約別名："TMF:0" 為 TMF 最近月、"TMF:1" 為次月（依交割日排序，排除 R1/R2 連續月）
+    """
+    ccfg = config.get("contracts", {})
+    cache = ContractCache(ccfg.get("path"), products=ccfg.get("products", ("TMF", "TXF", "MXF")))
+    cache.ensure(api)
+    return cache
+
+
+def make_adapter(api, config: dict, contracts: dict | None = None):
+    """行情來源：config["replay"] 有設定時回放錄製檔，否則為 Shioaji 即時行情"""
+    rcfg = config.get("replay")
+    if rcfg:
+        return ReplayAdapter(rcfg["path"], speed=rcfg.get("speed", 1.0), code=rcfg.get("code", "REPLAY"))
+    return ShioajiAdapter(api, contracts)
+
 
-simulation_mode = config.get("simulation", True)
-api_key = config["api_key"]
-secret_key = config["secret_key"]
+def run_host(api, config: dict, cache: ContractCache | None = None):
+    """
+    多合約模式（config["host"]）：
+    - contracts：{合約別名或代號: 引擎設定}，每個合約獨立 StrategyState / 參數 / 紀錄檔
+    - 合約分配到 EngineHost 的 worker 行程；行情 callback 依 tick code 分派
+    """
+    from strategy_v4.EngineHost import EngineHost
 
-api = sj.Shioaji(simulation=simulation_mode)
-api.login(api_key=api_key, secret_key=secret_key)
-print(f"✅ 登入成功｜模式：{'模擬' if simulation_mode else '真實'}")
+    hcfg = config["host"]
+    specs, contracts = {}, {}
+    for name, spec in hcfg["contracts"].items():
+        spec = {"config": config.get("strategy", {}), **(spec or {})}
+        code = name
+        if api is not None:
+            contract = cache.contract(api, name)
+            code = contract.code
+            contracts[code] = contract
+        spec.setdefault("warmup", code[:3] + "R1")
+        specs[code] = spec
+        print(f"✅ 使用合約：{name} → {code}")
+    for warmup in {spec["warmup"] for spec in specs.values()}:
+        load_warmup_bars(api, 0, warmup, cache)  # worker 只讀 store / BarPyramid，網路同步與建構在主行程完成
 
-# ====== 憑證啟用（真實模式） ======
-if not simulation_mode and "ca_path" in config:
-    api.activate_ca(
-        ca_path=config["ca_path"],
-        ca_passwd=config["ca_passwd"],
-        person_id=config["person_id"]
+    host = EngineHost(specs, workers=hcfg.get("workers"), ingest=hcfg.get("ingest"),
+                      report_interval=hcfg.get("report_interval", 1.0)).start()
+    stopped = threading.Event()
+    adapter = make_adapter(api, config, contracts)
+    adapter.subscribe(list(specs), host.route)
+    adapter.start(on_done=stopped.set)
+
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        while not stopped.wait(hcfg.get("report_every", 60)):
+            print(f"[EngineHost] {host.snapshot()['totals']}")
+    except KeyboardInterrupt:
+        pass
+    print("🛑 結束")
+    adapter.stop()
+    host.stop()
+    if api is not None:
+        api.logout()
+
+
+def main():
+    startup = StartupTimer()
+    startup.mark("imports")
+
+    # ====== 讀取設定與登入（回放模式離線執行） ======
+    with open("config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+    startup.budget.update(config.get("startup", {}))  # 例如 {"imports": 0.3, "ready": 1.0}（秒）
+    api = None if config.get("replay") else login(config)
+    startup.mark("login")
+    cache = load_contracts(api, config) if api is not None else None
+    startup.mark("contracts")
+
+    # ====== 多合約模式 ======
+    if config.get("host", {}).get("contracts"):
+        run_host(api, config, cache)
+        return
+
+    # ====== 合約選擇（取最早交割月；回放模式使用錄製檔的代號） ======
+    if api is not None:
+        contract = cache.contract(api, "TMF:0")
+        code, contracts = contract.code, {contract.code: contract}
+    else:
+        code, contracts = config["replay"].get("code", "REPLAY"), {}
+    print(f"✅ 使用合約：{code}")
+
+    # ====== 初始化狀態與記錄模組 ======
+    strategy_config = config.get("strategy", {})
+    state = StrategyState(config=strategy_config)
+    tick_recorder = TickRecorder("tick_record.csv")
+    trade_logger = TradeLogger("trade_log.csv")
+    checkpoint = EngineCheckpoint(interval=config.get("checkpoint_interval", 30))
+    bcfg = config.get("signal_bus")  # 例如 {"path": "/dev/shm/sv4_bus.bin", "capacity": 65536}
+    signal_bus = SignalBus(bcfg.get("path"), capacity=bcfg.get("capacity", 65536)) if bcfg else None
+    mcfg = config.get("metrics")  # 例如 {"port": 9108}；本機 /metrics（Prometheus）與 /metrics.json
+    metrics = EngineMetrics() if mcfg else None
+    tick_engine = TickEngine(
+        state=state,
+        market_bias="neutral",
+        trade_logger=trade_logger,
+        tick_recorder=tick_recorder,
+        config=strategy_config,
+        checkpoint=checkpoint,
+        signal_bus=signal_bus,
+        metrics=metrics,
+        async_bars=True,
     )
-    print("✅ 憑證啟用成功")
-
-# ====== 合約選擇（取最早交割月） ======
-contracts = [c for c in api.Contracts.Futures.TMF if c.code[-2:] not in ["R1", "R2"]]
-contract = min(contracts, key=lambda c: c.delivery_date)
-print(f"✅ 使用合約：{contract.code}")
-
-# ====== 初始化策略模組 ======
-kline = KlineInitializer(api, contract)
-kline.fetch_kline()
-kline.compute_indicators()
-indicators = kline.get_indicators()
-
-# ====== 初始化狀態與記錄模組 ======
-bias = "auto"
-state = StrategyState()
-tick_recorder = TickRecorder(filename="tick_record.csv")
-trade_logger = TradeLogger(tick_recorder=tick_recorder)
-tick_engine = TickEngine(state, bias, indicators, trade_logger, tick_recorder)
-
-# ====== 訂閱 Tick 並註冊回調 ======
-api.quote.subscribe(contract, quote_type=QuoteType.Tick, version=QuoteVersion.v1)
-
-@api.on_tick_fop_v1()
-def tick_callback(exchange, tick):
-    tick_dict = {
-        "price": tick.close,
-        "volume": tick.volume,
-        "bid": getattr(tick, "bid_price", None),
-        "ask": getattr(tick, "ask_price", None),
-        "timestamp": tick.datetime,
-        "rsi": indicators.get("rsi", 50),
-        "macd": indicators.get("macd", 0),
-        "macd_signal": indicators.get("macd_signal", 0),
-        "kd_k": indicators.get("kd_k", 50),
-        "kd_d": indicators.get("kd_d", 50)
-    }
-    tick_engine.on_tick(tick_dict)
-
-# ====== 主程式掛住等待 Tick ======
+    startup.mark("engine")
+
+    # ====== 當機重啟：由檢查點還原；否則以歷史 K 棒暖機（指標、多時間框架、短線追蹤器） ======
+    if api is not None and checkpoint.restore(tick_engine, max_age=CHECKPOINT_MAX_AGE) is not None:
+        startup.mark("restore")
+    else:
+        bars, pyramid = load_warmup_bars(api, tick_engine.warmup_bars, cache=cache)
+        tick_engine.warm_start(bars, pyramid=pyramid)
+        startup.mark("warm_start")
+
+    # ====== 即時執行環境：callback 只交付 tick，策略在事件迴圈的單一消費者執行 ======
+    # （1m K 棒由 tick 即時合成，指標於 LiveBarRefresher 背景計算，不再輪詢 KbarStore）
+    runtime = LiveRuntime(tick_engine, config.get("runtime"))
+    runtime.on_shutdown(tick_engine.bar_refresher.close)
+    if metrics is not None:
+        server = MetricsServer(metrics.bind(runtime=runtime), mcfg.get("host", "127.0.0.1"), mcfg.get("port", 9108))
+        runtime.on_start(server.start)
+        runtime.on_shutdown(server.stop)
+        runtime.on_shutdown(metrics.close)
+
+    # ====== 行情來源（Shioaji 即時 / 錄製回放）在事件迴圈就緒後才開始推送 ======
+    adapter = make_adapter(api, config, contracts)
+    # 回放以最快速度推送時由佇列背壓控制節奏（阻塞回放執行緒），即時行情則不阻塞券商執行緒
+    adapter.subscribe([code], partial(runtime.feed, block=True) if isinstance(adapter, ReplayAdapter) else runtime.feed)
+    runtime.on_start(lambda: adapter.start(on_done=runtime.stop))
+    runtime.on_start(lambda: (startup.mark("ready"), startup.report()))
+    runtime.on_shutdown(adapter.stop)
+    if signal_bus is not None:
+        runtime.on_shutdown(signal_bus.close)
+    if api is not None:
+        runtime.on_shutdown(api.logout)
+
+    # ====== 事件迴圈（閒置不佔 CPU），SIGINT / SIGTERM 優雅關閉 ======
+    runtime.start()
+
+
 if __name__ == "__main__":
-    print("🚀 等待 Tick 資料中...")
-    while True:
-        pass  # 或 time.sleep(1)
+    main()
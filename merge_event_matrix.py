@@ -1,25 +1,25 @@
-import pandas as pd
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.pipeline.DataPipeline import DataPipeline
 
-# ====== 讀取 K 線資料 ======
-df_1m = pd.read_csv("kbars_6m.csv", parse_dates=["datetime"])
-df_5m = pd.read_csv("kbars_5m.csv", parse_dates=["datetime"])
+CONTRACT = "TMFR1"
 
-# ====== 讀取事件矩陣 ======
-matrix = pd.read_csv("event_flag_matrix.csv", parse_dates=["date"])
 
-# ====== 合併到 1 分 K ======
-df_1m["date"] = df_1m["datetime"].dt.normalize()
-df_1m = df_1m.merge(matrix, left_on="date", right_on="date", how="left")
-df_1m.fillna(0, inplace=True)
+def main():
+    """KbarStore + events.csv → kbars_with_events.csv、kbars_5m_with_events.csv"""
+    # ====== K 線（KbarStore）+ 事件遮罩：單一 lazy 查詢計畫 ======
+    store = KbarStore()
+    pipeline = DataPipeline()
+    codec = pipeline.event_codec("events.csv", "event_ids.json")  # 位元字典由 event_flag_matrix.py 維護
+    df_1m = pipeline.kbars_with_events(pipeline.scan_store(store, CONTRACT, "1m"), "events.csv", codec=codec).collect()
+    df_5m = pipeline.kbars_with_events(pipeline.scan_store(store, CONTRACT, "5m"), "events.csv", codec=codec).collect()
 
-# ====== 合併到 5 分 K ======
-df_5m["date"] = df_5m["datetime"].dt.normalize()
-df_5m = df_5m.merge(matrix, left_on="date", right_on="date", how="left")
-df_5m.fillna(0, inplace=True)
+    # ====== 存檔（輸出到新檔，不覆寫原始 K 線，重跑結果一致） ======
+    df_1m.write_csv("kbars_with_events.csv", include_bom=True, datetime_format="%Y-%m-%d %H:%M:%S")
+    df_5m.write_csv("kbars_5m_with_events.csv", include_bom=True, datetime_format="%Y-%m-%d %H:%M:%S")
 
-# ====== 存檔 ======
-df_1m.to_csv("kbars_6m.csv", index=False, encoding="utf-8-sig")
-df_5m.to_csv("kbars_5m.csv", index=False, encoding="utf-8-sig")
+    print(f"✅ 已將事件遮罩整合進 kbars_with_events.csv（{df_1m.height} 筆，event_ids.json 為位元字典）")
+    print(f"✅ 已將事件遮罩整合進 kbars_5m_with_events.csv（{df_5m.height} 筆）")
 
-print(f"✅ 已將 event_flag_matrix 整合進 kbars_6m.csv（{len(df_1m)} 筆）")
-print(f"✅ 已將 event_flag_matrix 整合進 kbars_5m.csv（{len(df_5m)} 筆）")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,7 @@
 # strategy_v4/models/RegressionCalibrator.py
 
 import numpy as np
-import pandas as pd
 from typing import List, Dict
-from sklearn.linear_model import LinearRegression
 from pathlib import Path
 from strategy_v4.models.ParamsStore import ParamsStore
 
@@ -30,6 +28,10 @@ class RegressionCalibrator:
         if not ticks:
             return {}
 
+        # pandas / sklearn 只在校正時載入（sklearn 匯入約 1 秒，不拖慢 WalkforwardTester 以外的啟動）
+        import pandas as pd
+        from sklearn.linear_model import LinearRegression
+
         # 建立 DataFrame
         df = pd.DataFrame(ticks)
 
@@ -46,11 +48,17 @@ class RegressionCalibrator:
             if col not in df.columns:
                 df[col] = 0.0
 
+        # 目標欄位需由 pipeline.forward_labels.attach_forward_labels 產生；缺失時不訓練
         if target_key not in df.columns:
-            df[target_key] = 0.0
+            print(f"[Calibrator] 缺少目標欄位 {target_key}，請先 attach_forward_labels")
+            return {}
+        df = df[df[target_key].notna()]
+        if df.empty:
+            print(f"[Calibrator] {target_key} 全為空值，略過校正")
+            return {}
 
         features = df[feature_cols].fillna(0.0).values
-        target = df[target_key].fillna(0.0).values
+        target = df[target_key].values
 
         # 線性回歸
         model = LinearRegression()
@@ -64,6 +72,8 @@ class RegressionCalibrator:
         執行校正並更新 ParamsStore
         """
         weights = self.fit(ticks, target_key)
+        if not weights:
+            return {}
         version = f"{self.version_prefix}{version_suffix}"
         self.params_store.update(version, weights)
         print(f"[Calibrator] 更新權重版本 {version}")
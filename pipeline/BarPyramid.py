@@ -0,0 +1,222 @@
+# strategy_v4/pipeline/BarPyramid.py
+
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, List
+
+import polars as pl
+
+from strategy_v4.io.KbarStore import KbarStore, trading_date_expr
+from strategy_v4.pipeline.polars_indicator_utils import IncrementalIndicators
+
+# 週期（分鐘）與其來源週期：逐層聚合，每層只讀上一層
+PYRAMID = {"5m": ("1m", 5), "15m": ("5m", 15), "60m": ("15m", 60), "1d": ("60m", None)}
+RESOLUTIONS = ("1m", "5m", "15m", "60m", "1d")
+
+
+def session_start_expr(col: str = "datetime") -> pl.Expr:
+    """
+    TAIFEX 盤別起點（K 棒時間為開始時間）：
+    - 日盤 08:45~13:45 → 當日 08:45
+    - 夜盤 15:00~05:00 → 開盤日 15:00（凌晨的 K 棒屬於前一日 15:00 開始的夜盤）
+    """
+    t = pl.col(col)
+    minutes = t.dt.hour().cast(pl.Int32) * 60 + t.dt.minute().cast(pl.Int32)
+    day = t.dt.truncate("1d")
+    return (
+        pl.when(minutes < 8 * 60 + 45).then(day - pl.duration(hours=9))
+        .when(minutes < 15 * 60).then(day + pl.duration(hours=8, minutes=45))
+        .otherwise(day + pl.duration(hours=15))
+    )
+
+
+def _agg_exprs(columns: List[str]) -> List[pl.Expr]:
+    exprs = [
+        pl.col("open").first(),
+        pl.col("high").max(),
+        pl.col("low").min(),
+        pl.col("close").last(),
+    ]
+    for name, expr in (
+        ("volume", pl.col("volume").sum()),
+        ("amount", pl.col("amount").sum()),
+        ("event", pl.col("event").drop_nulls().first()),
+        ("event_flag", pl.col("event_flag").max()),
+        ("is_holiday", pl.col("is_holiday").max()),
+    ):
+        if name in columns:
+            exprs.append(expr)
+    return exprs
+
+
+def aggregate(df: pl.DataFrame, minutes: int | None) -> pl.DataFrame:
+    """
+    K 棒聚合：
+    - minutes 為分鐘數時，以盤別起點對齊（60m 日盤為 08:45、09:45 …，最後一根為 12:45~13:45）
+    - minutes=None 時聚合成日 K（依交易日，datetime 標為交易日 00:00）
+    - 聚合區間不跨盤別，也不跨交易日
+    """
+    if df.height == 0:
+        return df
+    if minutes is None:
+        bucket = trading_date_expr().cast(pl.Datetime("us"))
+    else:
+        start = session_start_expr()
+        offset = (pl.col("datetime") - start).dt.total_minutes() // minutes * minutes
+        bucket = start + pl.duration(minutes=offset)
+    return (
+        df.sort("datetime")
+        .group_by(bucket.alias("_bucket"), maintain_order=True)
+        .agg(_agg_exprs(df.columns))
+        .rename({"_bucket": "datetime"})
+        .sort("datetime")
+    )
+
+
+class BarPyramid:
+    """
+    多週期 K 線快取：
+    - 由 KbarStore 的 1m 分割逐層建出 5m → 15m → 60m → 1d，依交易日寫回同一個 store
+    - 每個交易日只在 1m 分割有更新時重建；之後的交易日僅重算指標狀態
+    - 每個週期保存最近 keep_days 個交易日收盤後的 IncrementalIndicators 暖機狀態（pyramid.json，不隨歷史增長）
+    - 更早的交易日沒有快照時，由 store 的 K 棒從頭重算（結果相同，只是較慢）
+    - load() / warm_state() / recent() 讓回測與即時引擎直接取用任一週期，不需重新聚合或從頭計算指標
+      （TickEngine.warm_start(pyramid=...) 以 1m 暖機狀態接續指標，5m / 15m 直接讀已存的分割）
+    """
+
+    def __init__(self, store: KbarStore | None = None, contract: str = "TMFR1", keep_days: int = 5):
+        self.store = store or KbarStore()
+        self.contract = contract
+        self.keep_days = max(int(keep_days), 1)
+        self.state_path = Path(self.store.root) / contract / "pyramid.json"
+        self._state: Dict | None = None
+
+    # ===== 狀態檔 =====
+    def state(self) -> Dict:
+        if self._state is None:
+            if self.state_path.exists():
+                with self.state_path.open("r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            else:
+                self._state = {"built": {}, "indicators": {res: {} for res in RESOLUTIONS}}
+        return self._state
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.state(), f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def dirty_dates(self) -> List[date]:
+        """1m 分割版本與上次建構時不同（或尚未建構）的交易日"""
+        built = self.state()["built"]
+        dirty = []
+        for d in self.store.dates(self.contract, "1m"):
+            info = self.store.partition_info(self.contract, "1m", d)
+            if built.get(d.isoformat()) != info.get("version"):
+                dirty.append(d)
+        return dirty
+
+    # ===== 建構 =====
+    def build(self) -> List[date]:
+        """
+        建構/更新所有週期：
+        :return: 重新聚合的交易日
+        """
+        dirty = self.dirty_dates()
+        if not dirty:
+            print(f"[BarPyramid] {self.contract} 已是最新")
+            return []
+
+        dates = [d for d in self.store.dates(self.contract, "1m") if d >= dirty[0]]
+        dirty_set = set(dirty)
+        state = self.state()
+        trackers = {res: self._state_before(res, dirty[0]) for res in RESOLUTIONS}
+        for res in RESOLUTIONS:
+            state["indicators"][res] = {k: v for k, v in state["indicators"].get(res, {}).items()
+                                        if k < dirty[0].isoformat()}
+
+        for d in dates:
+            key = d.isoformat()
+            bars = {"1m": self.store.read(self.contract, "1m", start=d, end=d)}
+            for res, (src, minutes) in PYRAMID.items():
+                if d in dirty_set:
+                    bars[res] = aggregate(bars[src], minutes)
+                    self.store.upsert(bars[res], self.contract, res)
+                else:
+                    bars[res] = self.store.read(self.contract, res, start=d, end=d)
+
+            for res in RESOLUTIONS:
+                trackers[res].update(bars[res])
+                trackers[res].frame = None  # 只保留暖機狀態
+                state["indicators"].setdefault(res, {})[key] = trackers[res].to_dict()
+
+            if d in dirty_set:
+                state["built"][key] = self.store.partition_info(self.contract, "1m", d).get("version")
+
+        self._prune()
+        self._save_state()
+        print(f"[BarPyramid] {self.contract} 重建 {len(dirty)} 個交易日｜更新指標狀態 {len(dates)} 個交易日")
+        return dirty
+
+    def _prune(self):
+        """每個週期只保留最近 keep_days 個交易日的快照（重建最近幾天與即時暖機只需要這些）"""
+        indicators = self.state()["indicators"]
+        for res, snapshots in indicators.items():
+            keep = sorted(snapshots)[-self.keep_days:]
+            indicators[res] = {k: snapshots[k] for k in keep}
+
+    def _state_at(self, resolution: str, trading_date: date) -> IncrementalIndicators:
+        """trading_date 收盤後的指標狀態；快照已被清除時由 store 從頭重算"""
+        snapshot = self.state()["indicators"].get(resolution, {}).get(trading_date.isoformat())
+        if snapshot is not None:
+            return IncrementalIndicators.from_dict(snapshot)
+        print(f"[BarPyramid] {self.contract} {resolution} 無 {trading_date} 的暖機快照，由歷史 K 棒重算")
+        state = IncrementalIndicators()
+        state.update(self.store.read(self.contract, resolution, end=trading_date))
+        state.frame = None
+        return state
+
+    def _state_before(self, resolution: str, trading_date: date) -> IncrementalIndicators:
+        """trading_date 之前最近一個交易日收盤後的指標狀態（沒有更早的交易日則為空狀態）"""
+        prior = [d for d in self.store.dates(self.contract, resolution) if d < trading_date]
+        return self._state_at(resolution, prior[-1]) if prior else IncrementalIndicators()
+
+    # ===== 讀取 =====
+    def warm_state(self, resolution: str, as_of: date | None = None) -> IncrementalIndicators:
+        """
+        即時引擎暖機：取得 as_of（預設最近一次建構的最新交易日）收盤後的指標狀態
+        - 之後以 update() 餵入新收盤的 K 棒即可
+        """
+        if as_of is None:
+            snapshots = self.state()["indicators"].get(resolution, {})
+            return IncrementalIndicators.from_dict(snapshots[max(snapshots)]) if snapshots else IncrementalIndicators()
+        prior = [d for d in self.store.dates(self.contract, resolution) if d <= as_of]
+        return self._state_at(resolution, prior[-1]) if prior else IncrementalIndicators()
+
+    def recent(self, resolution: str, n: int) -> pl.DataFrame:
+        """最後 n 根 K 棒（由最新交易日往前逐一讀分割，不讀整段歷史，不含指標）"""
+        frames, rows = [], 0
+        for d in reversed(self.store.dates(self.contract, resolution)):
+            frame = self.store.read(self.contract, resolution, start=d, end=d)
+            frames.append(frame)
+            rows += frame.height
+            if rows >= n:
+                break
+        return pl.concat(frames[::-1], how="vertical_relaxed").tail(n) if frames else pl.DataFrame()
+
+    def load(self, resolution: str, start: date | None = None, end: date | None = None,
+             with_indicators: bool = True) -> pl.DataFrame:
+        """
+        讀取任一週期的 K 線（交易日區間）：
+        - with_indicators=True 時由 start 前一交易日的暖機狀態接續計算，結果與完整歷史計算一致
+        """
+        bars = self.store.read(self.contract, resolution, start=start, end=end)
+        if not with_indicators or bars.height == 0:
+            return bars
+        state = self._state_before(resolution, start) if start is not None else IncrementalIndicators()
+        result = state.update(bars)
+        return result if result is not None else bars
@@ -0,0 +1,143 @@
+# strategy_v4/pipeline/DataPipeline.py
+
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterable, List
+
+import polars as pl
+
+from strategy_v4.pipeline.EventMask import EventMask
+from strategy_v4.pipeline.polars_indicator_utils import indicator_exprs
+
+
+class DataPipeline:
+    """
+    共用資料讀取層（Polars LazyFrame）：
+    - scan_csv / scan_parquet 延遲讀取，日期區間與欄位選擇下推到掃描階段
+    - 事件遮罩、K 線合併與指標計算組成同一個查詢計畫，最後才 collect
+    - Parquet 來源可依 row group 統計略過區間外資料；CSV 來源則在解析時即過濾
+    """
+
+    def __init__(self, base_dir: str | Path = "."):
+        self.base_dir = Path(base_dir)
+
+    def _resolve(self, path: str | Path) -> Path:
+        p = Path(path)
+        return p if p.is_absolute() else self.base_dir / p
+
+    @staticmethod
+    def _bound(value, end: bool = False):
+        """
+        區間邊界轉換：
+        - 'YYYY-MM-DD' / date → 當日 00:00；作為結束邊界時為隔日 00:00（含當日整天）
+        - 含時間的字串 / datetime → 原值
+        """
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+        if isinstance(value, datetime):
+            return value
+        day = datetime(value.year, value.month, value.day)
+        return day + timedelta(days=1) if end else day
+
+    def scan(
+        self,
+        path: str | Path | pl.LazyFrame,
+        columns: Iterable[str] | None = None,
+        start=None,
+        end=None,
+        time_col: str = "datetime",
+    ) -> pl.LazyFrame:
+        """延遲掃描 CSV / Parquet（或既有 LazyFrame），並下推時間區間與欄位選擇"""
+        if isinstance(path, pl.LazyFrame):
+            lf = path
+        elif (p := self._resolve(path)).suffix == ".parquet" or p.is_dir():
+            lf = pl.scan_parquet(p / "**/*.parquet" if p.is_dir() else p)
+        else:
+            lf = pl.scan_csv(p, try_parse_dates=True)
+
+        lo, hi = self._bound(start), self._bound(end, end=True)
+        if lo is not None:
+            lf = lf.filter(pl.col(time_col) >= lo)
+        if hi is not None:
+            lf = lf.filter(pl.col(time_col) < hi)
+        if columns is not None:
+            lf = lf.select(list(columns))
+        return lf
+
+    def scan_kbars(self, path: str | Path | pl.LazyFrame = "kbars_6m.csv", start=None, end=None,
+                   columns: Iterable[str] | None = None) -> pl.LazyFrame:
+        """K 線資料（datetime 欄位）"""
+        return self.scan(path, columns=columns, start=start, end=end, time_col="datetime")
+
+    def scan_store(self, store, contract: str, resolution: str = "1m", start=None, end=None,
+                   columns: Iterable[str] | None = None) -> pl.LazyFrame:
+        """
+        從 KbarStore 讀取 K 線：
+        - 先依交易日挑選分割檔（夜盤屬於下一交易日，週五夜盤屬於週一，結束日往後多取 3 天）
+        - 再以 datetime 精確過濾
+        """
+        lo, hi = self._bound(start), self._bound(end, end=True)
+        lf = store.scan(
+            contract, resolution,
+            start=lo.date() if lo is not None else None,
+            end=hi.date() + timedelta(days=3) if hi is not None else None,
+        )
+        return self.scan(lf, columns=columns, start=start, end=end, time_col="datetime")
+
+    def scan_events(self, path: str | Path = "events.csv", start=None, end=None) -> pl.LazyFrame:
+        """事件表（date, event）"""
+        return self.scan(path, start=start, end=end, time_col="date").with_columns(
+            pl.col("date").cast(pl.Date)
+        )
+
+    def event_names(self, events: pl.LazyFrame) -> List[str]:
+        """事件種類（只收集 event 欄位的唯一值）"""
+        return sorted(events.select(pl.col("event").unique()).collect()["event"].drop_nulls().to_list())
+
+    def event_codec(self, events_path: str | Path = "events.csv",
+                    ids_path: str | Path | None = "event_ids.json") -> EventMask:
+        """事件位元字典：載入 ids_path 並補上事件表中的新事件（ids_path=None 時不落地）"""
+        names = self.event_names(self.scan_events(events_path))
+        if ids_path is None:
+            return EventMask().extend(names)
+        return EventMask.load(self._resolve(ids_path), names)
+
+    def event_masks(self, events: pl.LazyFrame, codec: EventMask) -> pl.LazyFrame:
+        """事件遮罩（每天一列：date, event_mask）"""
+        return codec.encode(events)
+
+    def kbars_with_events(
+        self,
+        kbar_path: str | Path | pl.LazyFrame = "kbars_6m.csv",
+        events_path: str | Path = "events.csv",
+        start=None,
+        end=None,
+        columns: Iterable[str] | None = None,
+        with_indicators: bool = False,
+        codec: EventMask | None = None,
+    ) -> pl.LazyFrame:
+        """
+        K 線 + 事件遮罩（+ 指標）的單一查詢計畫：
+        - kbar_path 可為檔案路徑或 LazyFrame（例如 scan_store 的結果）
+        - 事件以 event_mask（Int64 位元遮罩）表示，依日期 as-of join，無事件為 0
+        - codec 預設由全部事件種類建立；需要固定位元時傳入 EventMask.load("event_ids.json")
+        - 指標只在區間內計算，需要暖機資料時請放寬 start
+        """
+        codec = codec or self.event_codec(events_path, ids_path=None)
+        events = self.scan_events(events_path, start=start, end=end)
+        kbars = self.scan_kbars(kbar_path, start=start, end=end, columns=columns)
+        if with_indicators:
+            kbars = self.with_indicators(kbars)
+        return codec.join_bars(
+            kbars.with_columns(pl.col("datetime").dt.date().alias("date")),
+            self.event_masks(events, codec),
+        )
+
+    @staticmethod
+    def with_indicators(lf: pl.LazyFrame) -> pl.LazyFrame:
+        """將 polars_indicator_utils 的指標表達式併入查詢計畫"""
+        for stage in indicator_exprs():
+            lf = lf.with_columns(stage)
+        return lf
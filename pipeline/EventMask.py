@@ -0,0 +1,118 @@
+# strategy_v4/pipeline/EventMask.py
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+import polars as pl
+
+MAX_EVENTS = 63  # Int64 可用位元數
+
+
+class EventMask:
+    """
+    事件位元遮罩編碼：
+    - 每種事件對應一個位元（event_ids.json：{事件名稱: 位元}），新事件依序往後配置，既有位元不變
+    - 每天的事件以單一 Int64 event_mask 表示，取代一事件一欄的 0/1 寬表
+    - has_event_expr / has_event 以位元運算向量化判斷是否含某些事件
+    """
+
+    def __init__(self, ids: Dict[str, int] | None = None):
+        self.ids: Dict[str, int] = dict(ids or {})
+
+    # ===== 事件字典 =====
+    @classmethod
+    def load(cls, path: str | Path, names: Iterable[str] | None = None) -> "EventMask":
+        """載入事件字典（檔案不存在時為空），並補上 names 中的新事件"""
+        p = Path(path)
+        ids = {}
+        if p.exists():
+            with p.open("r", encoding="utf-8") as f:
+                ids = json.load(f)
+        codec = cls(ids)
+        if names is not None:
+            codec.extend(names)
+        return codec
+
+    def save(self, path: str | Path):
+        p = Path(path)
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, p)
+
+    def extend(self, names: Iterable[str]) -> "EventMask":
+        for name in sorted(set(names) - set(self.ids)):
+            if len(self.ids) >= MAX_EVENTS:
+                raise ValueError(f"事件種類超過 {MAX_EVENTS} 種，無法以 Int64 位元遮罩表示")
+            self.ids[name] = len(self.ids)
+        return self
+
+    @property
+    def names(self) -> List[str]:
+        """依位元順序排列的事件名稱"""
+        return sorted(self.ids, key=self.ids.get)
+
+    def bits(self, names: str | Iterable[str]) -> int:
+        """事件名稱 → 位元遮罩（未知事件忽略）"""
+        if isinstance(names, str):
+            names = [names]
+        return sum(1 << self.ids[n] for n in set(names) if n in self.ids)
+
+    def decode(self, mask: int) -> List[str]:
+        return [n for n in self.names if mask >> self.ids[n] & 1]
+
+    # ===== 編碼 =====
+    def encode(self, events: pl.LazyFrame) -> pl.LazyFrame:
+        """事件表（date, event）→ 每天一列（date, event_mask），依日期排序"""
+        table = pl.LazyFrame(
+            {"event": list(self.ids), "bit": [1 << b for b in self.ids.values()]},
+            schema={"event": pl.String, "bit": pl.Int64},
+        )
+        return (
+            events.select("date", "event")
+            .unique()
+            .join(table, on="event", how="inner")
+            .group_by("date")
+            .agg(pl.col("bit").sum().alias("event_mask"))
+            .sort("date")
+        )
+
+    def join_bars(self, bars: pl.LazyFrame, masks: pl.LazyFrame, date_col: str = "date") -> pl.LazyFrame:
+        """
+        K 棒附加 event_mask：
+        - 依日期排序後 join_asof（backward），只保留同一天的事件，其餘為 0
+        """
+        right = masks.rename({"date": "_event_date"}).with_columns(pl.col("_event_date").alias("_on"))
+        return (
+            bars.sort(date_col, maintain_order=True)
+            .join_asof(right, left_on=date_col, right_on="_on", strategy="backward")
+            .with_columns(
+                pl.when(pl.col("_event_date") == pl.col(date_col))
+                .then(pl.col("event_mask")).otherwise(0)
+                .cast(pl.Int64).alias("event_mask")
+            )
+            .drop("_event_date", "_on")
+        )
+
+    # ===== 查詢 =====
+    def has_event_expr(self, names: str | Iterable[str], col: str = "event_mask", all_: bool = False) -> pl.Expr:
+        """Polars 表達式：是否含任一（all_=True 時為全部）指定事件"""
+        mask = self.bits(names)
+        hit = pl.col(col) & mask
+        return (hit == mask) if all_ else (hit != 0)
+
+    def has_event(self, masks, names: str | Iterable[str], all_: bool = False) -> np.ndarray:
+        """NumPy 版本：masks 為 event_mask 陣列"""
+        mask = np.int64(self.bits(names))
+        hit = np.asarray(masks, dtype=np.int64) & mask
+        return (hit == mask) if all_ else (hit != 0)
+
+    def to_flags(self, lf: pl.LazyFrame, names: Iterable[str] | None = None, col: str = "event_mask") -> pl.LazyFrame:
+        """展開成一事件一欄的 0/1（舊格式相容用）"""
+        names = list(names) if names is not None else self.names
+        return lf.with_columns([
+            ((pl.col(col) & (1 << self.ids[n])) != 0).cast(pl.Int8).alias(n) for n in names
+        ])
@@ -0,0 +1,256 @@
+# strategy_v4/pipeline/PipelineRunner.py
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from strategy_v4.DataPathManager import DataPathManager
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+# KbarStore 的 manifest 位於 DataPathManager 的資料目錄（不隨 base_dir 改變），以絕對路徑宣告
+KBAR_MANIFEST = str(Path(DataPathManager().get_kbar_store_root()).resolve() / "manifest.json")
+
+
+class Step:
+    """
+    DAG 節點：
+    - module：以 python -m 執行的模組（腳本需有 main() 與 __main__ 保護）
+    - inputs / outputs：相對 base_dir 的檔案（絕對路徑直接使用）；inputs 變動或 outputs 缺少時才重跑
+    - code：參與雜湊的程式檔（相對套件根目錄），預設為模組本身
+    - ttl：外部資料來源（網路、API）的有效秒數，超過即重跑；None 表示只看雜湊
+    """
+
+    def __init__(self, name: str, module: str, inputs: List[str] | None = None, outputs: List[str] | None = None,
+                 code: List[str] | None = None, deps: List[str] | None = None, ttl: float | None = None):
+        self.name = name
+        self.module = module
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.code = list(code or [])
+        self.deps = list(deps or [])
+        self.ttl = ttl
+
+    def code_files(self) -> List[Path]:
+        files = self.code or [self.module.split(".", 1)[1].replace(".", "/") + ".py"]
+        return [PACKAGE_DIR / f for f in files]
+
+
+# ===== 資料準備流程 =====
+DEFAULT_STEPS = [
+    Step("calendar", "strategy_v4.generate_taifex_calendar",
+         outputs=["taifex_calendar.csv"], ttl=7 * 86400),
+    Step("kbars", "strategy_v4.backtest_kbars",
+         inputs=["taifex_calendar.csv", "config.json"],
+         outputs=["events.csv", KBAR_MANIFEST],
+         code=["backtest_kbars.py", "io/KbarStore.py", "io/KbarFetcher.py", "pipeline/BarPyramid.py"],
+         deps=["calendar"], ttl=3600),
+    Step("event_matrix", "strategy_v4.event_flag_matrix",
+         inputs=["events.csv"], outputs=["event_flag_matrix.csv", "event_ids.json"],
+         code=["event_flag_matrix.py", "pipeline/EventMask.py"], deps=["kbars"]),
+    Step("event_summary", "strategy_v4.event_summary",
+         inputs=["events.csv"], outputs=["event_summary.csv"], deps=["kbars"]),
+    Step("merge", "strategy_v4.merge_event_matrix",
+         inputs=["events.csv", "event_ids.json", KBAR_MANIFEST],
+         outputs=["kbars_with_events.csv", "kbars_5m_with_events.csv"],
+         code=["merge_event_matrix.py", "pipeline/DataPipeline.py", "pipeline/EventMask.py"],
+         deps=["kbars", "event_matrix"]),
+]
+
+
+class PipelineRunner:
+    """
+    內容雜湊的 DAG 執行器：
+    - 每個步驟的雜湊 = 程式檔 + 輸入檔內容；與上次成功時相同且輸出都在 → 跳過
+    - 檔案內容雜湊以 (大小, mtime) 快取，未變動的檔案不重讀，no-op 只需毫秒
+    - 相依步驟完成後才排程，彼此獨立的步驟以子行程平行執行
+    - 狀態與每步耗時記錄在 .pipeline_state.json
+    """
+
+    def __init__(self, steps: List[Step] | None = None, base_dir: str | Path = ".",
+                 max_workers: int = 4, state_file: str = ".pipeline_state.json"):
+        self.steps: Dict[str, Step] = {s.name: s for s in (steps or DEFAULT_STEPS)}
+        self.base_dir = Path(base_dir).resolve()
+        self.max_workers = max_workers
+        self.state_path = self.base_dir / state_file
+        self.state = self._load_state()
+        self._lock = threading.Lock()
+        self._check_graph()
+
+    # ===== 狀態 =====
+    def _load_state(self) -> dict:
+        if self.state_path.exists():
+            with self.state_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"files": {}, "steps": {}}
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def _check_graph(self):
+        for step in self.steps.values():
+            missing = [d for d in step.deps if d not in self.steps]
+            if missing:
+                raise ValueError(f"[PipelineRunner] {step.name} 相依的步驟不存在：{missing}")
+        self.order()  # 檢查循環
+
+    def order(self) -> List[str]:
+        """拓撲排序"""
+        done, order = set(), []
+
+        def visit(name, stack):
+            if name in done:
+                return
+            if name in stack:
+                raise ValueError(f"[PipelineRunner] 步驟相依有循環：{' → '.join(stack + [name])}")
+            for dep in self.steps[name].deps:
+                visit(dep, stack + [name])
+            done.add(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return order
+
+    # ===== 雜湊 =====
+    def _file_digest(self, path: Path) -> str:
+        """檔案內容 sha256（以大小與 mtime 快取）"""
+        if not path.exists():
+            return "missing"
+        st = path.stat()
+        key = str(path)
+        with self._lock:
+            cached = self.state["files"].get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self.state["files"][key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def step_hash(self, step: Step) -> str:
+        h = hashlib.sha256(step.module.encode())
+        for path in step.code_files():
+            h.update(f"code:{path.name}:{self._file_digest(path)}".encode())
+        for name in step.inputs:
+            h.update(f"in:{name}:{self._file_digest(self.base_dir / name)}".encode())
+        return h.hexdigest()
+
+    def is_up_to_date(self, step: Step, digest: str) -> bool:
+        record = self.state["steps"].get(step.name)
+        if not record or record.get("status") != "ok" or record.get("hash") != digest:
+            return False
+        if not all((self.base_dir / out).exists() for out in step.outputs):
+            return False
+        if step.ttl is not None and time.time() - record.get("finished", 0) > step.ttl:
+            return False
+        return True
+
+    # ===== 執行 =====
+    def _execute(self, step: Step) -> tuple:
+        t0 = time.perf_counter()
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PACKAGE_DIR.parent), env.get("PYTHONPATH")]))
+        proc = subprocess.run([sys.executable, "-m", step.module], cwd=self.base_dir, env=env,
+                              capture_output=True, text=True)
+        return proc.returncode, time.perf_counter() - t0, proc.stdout + proc.stderr
+
+    def run(self, targets: List[str] | None = None, force: List[str] | None = None) -> Dict[str, dict]:
+        """
+        執行 DAG（targets 及其上游）：
+        - force 指定的步驟無視雜湊強制重跑
+        - 上游失敗的步驟不執行
+        :return: {步驟: {"status": ok/skipped/failed/blocked, "seconds": 耗時}}
+        """
+        t_start = time.perf_counter()
+        wanted = self._closure(targets or list(self.steps))
+        force = set(force or [])
+        results: Dict[str, dict] = {}
+        pending = [n for n in self.order() if n in wanted]
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    step = self.steps[name]
+                    if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in step.deps):
+                        results[name] = {"status": "blocked", "seconds": 0.0}
+                        pending.remove(name)
+                        continue
+                    if not all(d in results or d not in wanted for d in step.deps):
+                        continue
+                    pending.remove(name)
+                    t0 = time.perf_counter()
+                    digest = self.step_hash(step)
+                    if name not in force and self.is_up_to_date(step, digest):
+                        results[name] = {"status": "skipped", "seconds": time.perf_counter() - t0}
+                        continue
+                    running[pool.submit(self._execute, step)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    code, seconds, output = fut.result()
+                    status = "ok" if code == 0 else "failed"
+                    results[name] = {"status": status, "seconds": seconds}
+                    record = {"status": status, "seconds": round(seconds, 3), "finished": time.time(),
+                              "finished_at": datetime.now().isoformat(timespec="seconds")}
+                    if status == "ok":
+                        # 以執行後的輸入重新計算（上游可能在同一輪更新過）
+                        record["hash"] = self.step_hash(self.steps[name])
+                    else:
+                        print(f"[PipelineRunner] ❌ {name} 失敗（exit {code}）\n{output[-2000:]}")
+                    self.state["steps"][name] = record
+
+        self._save_state()
+        self.report(results, time.perf_counter() - t_start)
+        return results
+
+    def _closure(self, targets: List[str]) -> set:
+        wanted, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.steps:
+                raise ValueError(f"[PipelineRunner] 未知步驟：{name}")
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(self.steps[name].deps)
+        return wanted
+
+    @staticmethod
+    def report(results: Dict[str, dict], total: float):
+        for name, res in results.items():
+            print(f"[PipelineRunner] {name:<14} {res['status']:<8} {res['seconds'] * 1000:9.1f} ms")
+        print(f"[PipelineRunner] 總耗時 {total * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="資料準備 DAG（雜湊判斷是否需要重跑）")
+    parser.add_argument("targets", nargs="*", help="要產生的步驟（預設全部）")
+    parser.add_argument("--force", nargs="*", default=[], help="強制重跑的步驟")
+    parser.add_argument("--base-dir", default=".", help="資料檔所在目錄")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    results = PipelineRunner(base_dir=args.base_dir, max_workers=args.workers).run(args.targets or None, args.force)
+    sys.exit(1 if any(r["status"] in ("failed", "blocked") for r in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# strategy_v4/pipeline/forward_labels.py
+
+import numpy as np
+from typing import Dict, Iterable, List, Sequence
+
+DEFAULT_HORIZONS = (5, 10, 30)
+DEFAULT_BARRIER_MULTS = (1.0, 2.0)
+
+
+def _simple_atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """簡易 ATR（TR 的 rolling mean），僅在資料沒有 atr 欄位時作為 barrier 寬度"""
+    prev_close = np.concatenate(([closes[0]], closes[:-1]))
+    tr = np.maximum(highs - lows, np.maximum(np.abs(highs - prev_close), np.abs(lows - prev_close)))
+    csum = np.concatenate(([0.0], np.cumsum(tr)))
+    atr = np.full(len(tr), np.nan)
+    if len(tr) >= period:
+        atr[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return atr
+
+
+def compute_forward_labels(
+    prices: Sequence[float],
+    horizons: Iterable[int] = DEFAULT_HORIZONS,
+    atr: Sequence[float] | None = None,
+    barrier_mults: Iterable[float] = DEFAULT_BARRIER_MULTS,
+    highs: Sequence[float] | None = None,
+    lows: Sequence[float] | None = None,
+    chunk_size: int = 65536,
+) -> Dict[str, np.ndarray]:
+    """
+    多 horizon 前瞻標籤（一次向量化掃描）：
+    - fwd_ret_{h}：h 根後的報酬率 p[t+h] / p[t] - 1
+    - mfe_{h} / mae_{h}：(t, t+h] 內最大有利 / 不利偏移（多方視角，價格點數）
+    - barrier_{k}atr_{h}：±k*ATR 障礙先觸及者，上 = 1、下 = -1、未觸及或同根觸及 = 0
+    - 未來資料不足 h 根（或 ATR 無效）時為 NaN
+    做法：以最大 horizon 建立滑動視窗，沿視窗做累積 max/min，所有較短 horizon 直接取對應欄
+    """
+    p = np.asarray(prices, dtype=np.float64)
+    n = len(p)
+    horizons = sorted({int(h) for h in horizons})
+    barrier_mults = list(barrier_mults)
+    hi = p if highs is None else np.asarray(highs, dtype=np.float64)
+    lo = p if lows is None else np.asarray(lows, dtype=np.float64)
+    atr_arr = None if atr is None else np.asarray(atr, dtype=np.float64)
+
+    out: Dict[str, np.ndarray] = {}
+    for h in horizons:
+        out[f"fwd_ret_{h}"] = np.full(n, np.nan)
+        out[f"mfe_{h}"] = np.full(n, np.nan)
+        out[f"mae_{h}"] = np.full(n, np.nan)
+        if atr_arr is not None:
+            for k in barrier_mults:
+                out[f"barrier_{k:g}atr_{h}"] = np.full(n, np.nan)
+    if n == 0 or not horizons:
+        return out
+
+    H = horizons[-1]
+    hi_pad = np.concatenate((hi[1:], np.full(H, np.nan)))
+    lo_pad = np.concatenate((lo[1:], np.full(H, np.nan)))
+    idx = np.arange(n)
+
+    for h in horizons:
+        valid = idx + h < n
+        fwd = out[f"fwd_ret_{h}"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fwd[valid] = p[h:] / p[:n - h] - 1.0
+
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        rows = slice(start, stop)
+        # (rows, H) 視窗：第 j 欄為 t+1+j
+        hi_win = np.lib.stride_tricks.sliding_window_view(hi_pad[start:stop + H - 1], H)
+        lo_win = np.lib.stride_tricks.sliding_window_view(lo_pad[start:stop + H - 1], H)
+        run_max = np.fmax.accumulate(hi_win, axis=1)
+        run_min = np.fmin.accumulate(lo_win, axis=1)
+        base = p[rows]
+        valid_rows = {h: idx[rows] + h < n for h in horizons}
+
+        for h in horizons:
+            v = valid_rows[h]
+            out[f"mfe_{h}"][rows] = np.where(v, run_max[:, h - 1] - base, np.nan)
+            out[f"mae_{h}"][rows] = np.where(v, base - run_min[:, h - 1], np.nan)
+
+        if atr_arr is None:
+            continue
+        a = atr_arr[rows]
+        atr_ok = np.isfinite(a) & (a > 0)
+        for k in barrier_mults:
+            # 第一次觸及的位置（累積極值單調，用 argmax 找第一個 True）
+            up_hit = run_max >= (base + k * a)[:, None]
+            dn_hit = run_min <= (base - k * a)[:, None]
+            first_up = np.where(up_hit.any(axis=1), up_hit.argmax(axis=1), H)
+            first_dn = np.where(dn_hit.any(axis=1), dn_hit.argmax(axis=1), H)
+            for h in horizons:
+                label = np.where((first_up < h) & (first_up < first_dn), 1.0,
+                                 np.where((first_dn < h) & (first_dn < first_up), -1.0, 0.0))
+                out[f"barrier_{k:g}atr_{h}"][rows] = np.where(valid_rows[h] & atr_ok, label, np.nan)
+
+    return out
+
+
+def attach_forward_labels(
+    data,
+    horizons: Iterable[int] = DEFAULT_HORIZONS,
+    target_horizon: int | None = None,
+    target_key: str = "future_return",
+    barrier_mults: Iterable[float] = DEFAULT_BARRIER_MULTS,
+    price_key: str | None = None,
+):
+    """
+    將前瞻標籤附加到特徵矩陣：
+    - 支援 list[dict]（BacktestDataLoader.to_ticks 的 ticks）、pandas.DataFrame、polars.DataFrame
+    - target_key（預設 future_return）= fwd_ret_{target_horizon}，供 RegressionCalibrator 使用
+    - 有 high/low 欄位時用於 MFE/MAE 與 barrier；沒有 atr 欄位時以簡易 ATR 代替
+    """
+    horizons = sorted({int(h) for h in horizons})
+    target_horizon = target_horizon or horizons[0]
+    if target_horizon not in horizons:
+        horizons = sorted(horizons + [target_horizon])
+
+    is_records = isinstance(data, list)
+    if is_records:
+        if not data:
+            return data
+        keys = set(data[0].keys())
+        column = lambda k: np.array([np.nan if r.get(k) is None else r.get(k) for r in data], dtype=np.float64)
+    elif type(data).__module__.startswith("polars"):
+        keys = set(data.columns)
+        column = lambda k: data[k].cast(float).fill_null(np.nan).to_numpy()
+    else:
+        keys = set(data.columns)
+        column = lambda k: data[k].astype(float).to_numpy()
+
+    price_key = price_key or ("price" if "price" in keys else "close")
+    prices = column(price_key)
+    highs = column("high") if "high" in keys else None
+    lows = column("low") if "low" in keys else None
+    if highs is not None and not np.isfinite(highs).all():
+        highs = np.where(np.isfinite(highs) & (highs > 0), highs, prices)
+    if lows is not None and not np.isfinite(lows).all():
+        lows = np.where(np.isfinite(lows) & (lows > 0), lows, prices)
+
+    atr = column("atr") if "atr" in keys else None
+    if atr is None or not np.isfinite(atr).any():
+        atr = _simple_atr(prices if highs is None else highs, prices if lows is None else lows, prices)
+
+    labels = compute_forward_labels(prices, horizons, atr=atr, barrier_mults=barrier_mults, highs=highs, lows=lows)
+    labels[target_key] = labels[f"fwd_ret_{target_horizon}"]
+
+    if is_records:
+        names: List[str] = list(labels)
+        for i, row in enumerate(data):
+            for name in names:
+                row[name] = float(labels[name][i])
+        return data
+    if type(data).__module__.startswith("polars"):
+        import polars as pl
+        return data.with_columns([pl.Series(k, v) for k, v in labels.items()])
+    return data.assign(**labels)
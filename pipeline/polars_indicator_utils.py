@@ -1,9 +1,29 @@
+import math
+from collections import deque
+from datetime import datetime
 import polars as pl
-import polars_talib as plta
-import pandas as pd
+
+# polars_talib 與 pandas 在需要時才匯入（即時路徑只用 IncrementalIndicators，不需載入）
+
+
+def is_pandas(obj) -> bool:
+    """不匯入 pandas 的 DataFrame 判斷：輸入本身是 pandas 物件時 pandas 必然已載入"""
+    return type(obj).__module__.startswith("pandas.")
+
+
+def as_polars(data) -> pl.DataFrame:
+    """polars / pandas DataFrame 或 list[dict] → polars DataFrame"""
+    if isinstance(data, pl.DataFrame):
+        return data
+    if is_pandas(data):
+        return pl.from_pandas(data)
+    return pl.DataFrame(list(data))
+
 
 def compute_polars_indicators(df, target_len=None, debug=False) -> pl.DataFrame:
-    if isinstance(df, pd.DataFrame):
+    import polars_talib as plta
+
+    if is_pandas(df):
         df = pl.from_pandas(df)
 
     if df is None or df.shape[0] < 30:
@@ -78,7 +98,7 @@ def compute_polars_indicators(df, target_len=None, debug=False) -> pl.DataFrame:
     # ATR
     try:
         df = df.with_columns([
-            pl.col("close").ta.atr(14).alias("atr")
+            pl.col("close").ta.atr(timeperiod=14).alias("atr")
         ])
     except Exception as e:
         if debug:
@@ -107,11 +127,264 @@ def compute_polars_indicators(df, target_len=None, debug=False) -> pl.DataFrame:
     return df.tail(target_len or df.shape[0])
 
 
-def prepare_kbar(df_raw: pl.DataFrame, length: int = 30) -> pl.DataFrame:
-    df_kbar = df_raw.tail(length + 100)
-    print(f"📊 目前 K 線筆數：{df_kbar.shape[0]}")
+def indicator_exprs() -> list:
+    """
+    與 compute_polars_indicators 相同指標的表達式（依相依順序分段）：
+    - 供 LazyFrame 使用，讓指標計算併入同一個查詢計畫
+    - 每段為一個 with_columns 的表達式列表
+    """
+    import polars_talib as plta
+
+    stoch = plta.stoch(
+        high=pl.col("high"), low=pl.col("low"), close=pl.col("close"),
+        fastk_period=9, slowk_period=3, slowd_period=3
+    )
+    bband = plta.bbands(pl.col("close"), timeperiod=20)
+    return [
+        [
+            pl.col("close").cast(pl.Float64),
+            pl.col("high").cast(pl.Float64),
+            pl.col("low").cast(pl.Float64),
+        ],
+        [
+            pl.col("close").ta.rsi(14).alias("rsi"),
+            pl.col("close").ewm_mean(span=12).alias("ema_fast"),
+            pl.col("close").ewm_mean(span=26).alias("ema_slow"),
+            stoch.struct.field("slowk").alias("kd_k"),
+            stoch.struct.field("slowd").alias("kd_d"),
+            pl.col("close").ta.atr(timeperiod=14).alias("atr"),
+            bband.struct.field("upperband").alias("bband_upper"),
+            bband.struct.field("middleband").alias("bband_middle"),
+            bband.struct.field("lowerband").alias("bband_lower"),
+        ],
+        [(pl.col("ema_fast") - pl.col("ema_slow")).alias("macd")],
+        [pl.col("macd").ewm_mean(span=9).alias("macd_signal")],
+        [
+            (pl.col("macd") - pl.col("macd_signal")).alias("macd_hist"),
+            pl.when(pl.col("close") > pl.col("bband_upper")).then(pl.lit("BreakUp"))
+              .when(pl.col("close") < pl.col("bband_lower")).then(pl.lit("BreakDown"))
+              .otherwise(pl.lit("Neutral")).alias("bband_signal"),
+        ],
+    ]
+
+
+class IncrementalIndicators:
+    """
+    增量指標狀態（與 compute_polars_indicators 相同的指標與欄位）：
+    - 保存 EWM 累加器（adjust=True）、RSI/ATR 的 Wilder 平滑、KD 與 BBand 視窗
+    - update(df) 只計算新增的 K 棒，並附加到快取的 frame
+    - 有 datetime 欄位時以時間判斷新 K 棒，否則以筆數判斷（需傳入同一條持續增長的序列）
+    - K 棒須為已收盤資料；已計算過的 K 棒不會被改寫
+    """
+
+    RSI_PERIOD = 14
+    ATR_PERIOD = 14
+    MACD_SPANS = {"fast": 12, "slow": 26, "signal": 9}
+    STOCH = (9, 3, 3)
+    BB_PERIOD = 20
+    BB_MULT = 2.0
+
+    def __init__(self, max_rows: int | None = None):
+        self.max_rows = max_rows
+        self.frame: pl.DataFrame | None = None
+        self.count = 0
+        self.last_datetime = None
+
+        self._prev_close = None
+        self._ewm = {k: [0.0, 0.0] for k in self.MACD_SPANS}   # [加權和, 權重和]
+        self._decay = {k: 1.0 - 2.0 / (span + 1) for k, span in self.MACD_SPANS.items()}
+        self._rsi_sums = [0.0, 0.0]
+        self._avg_gain = self._avg_loss = None
+        self._tr_sum = 0.0
+        self._atr = None
+        fastk, slowk, slowd = self.STOCH
+        self._hl = deque(maxlen=fastk)
+        self._fastk = deque(maxlen=slowk)
+        self._slowk = deque(maxlen=slowd)
+        self._bb = deque(maxlen=self.BB_PERIOD)
+
+    def _ewm_step(self, key: str, x: float) -> float:
+        acc = self._ewm[key]
+        d = self._decay[key]
+        acc[0] = x + d * acc[0]
+        acc[1] = 1.0 + d * acc[1]
+        return acc[0] / acc[1]
+
+    def _step(self, close: float, high: float, low: float) -> tuple:
+        i = self.count
+        nan = math.nan
+
+        # RSI / ATR（TA-Lib：前 period 筆取平均，之後 Wilder 平滑）
+        rsi = atr = nan
+        if i > 0:
+            delta = close - self._prev_close
+            tr = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+            p = self.RSI_PERIOD
+            if i <= p:
+                self._rsi_sums[0] += max(delta, 0.0)
+                self._rsi_sums[1] += max(-delta, 0.0)
+                if i == p:
+                    self._avg_gain, self._avg_loss = self._rsi_sums[0] / p, self._rsi_sums[1] / p
+            else:
+                self._avg_gain = (self._avg_gain * (p - 1) + max(delta, 0.0)) / p
+                self._avg_loss = (self._avg_loss * (p - 1) + max(-delta, 0.0)) / p
+            if i >= p:
+                total = self._avg_gain + self._avg_loss
+                rsi = 100.0 * self._avg_gain / total if total != 0 else 0.0
 
-    df_kbar = compute_polars_indicators(df_kbar, target_len=length, debug=True)
+            q = self.ATR_PERIOD
+            if i <= q:
+                self._tr_sum += tr
+                if i == q:
+                    self._atr = self._tr_sum / q
+            else:
+                self._atr = (self._atr * (q - 1) + tr) / q
+            if i >= q:
+                atr = self._atr
+        self._prev_close = close
+
+        # MACD
+        ema_fast = self._ewm_step("fast", close)
+        ema_slow = self._ewm_step("slow", close)
+        macd = ema_fast - ema_slow
+        macd_signal = self._ewm_step("signal", macd)
+
+        # KD（slowk/slowd 皆為 SMA，TA-Lib 於 lookback 之後才同時輸出）
+        kd_k = kd_d = nan
+        self._hl.append((high, low))
+        if len(self._hl) == self._hl.maxlen:
+            hh = max(h for h, _ in self._hl)
+            ll = min(l for _, l in self._hl)
+            self._fastk.append(100.0 * (close - ll) / (hh - ll) if hh != ll else 0.0)
+            if len(self._fastk) == self._fastk.maxlen:
+                self._slowk.append(sum(self._fastk) / len(self._fastk))
+                if len(self._slowk) == self._slowk.maxlen:
+                    kd_k = self._slowk[-1]
+                    kd_d = sum(self._slowk) / len(self._slowk)
+
+        # BBand（SMA ± 2 * 母體標準差）
+        upper = middle = lower = nan
+        self._bb.append(close)
+        if len(self._bb) == self.BB_PERIOD:
+            middle = sum(self._bb) / self.BB_PERIOD
+            std = math.sqrt(sum((x - middle) ** 2 for x in self._bb) / self.BB_PERIOD)
+            upper, lower = middle + self.BB_MULT * std, middle - self.BB_MULT * std
+
+        self.count = i + 1
+        return rsi, ema_fast, ema_slow, macd, macd_signal, macd - macd_signal, kd_k, kd_d, atr, upper, middle, lower
+
+    def _new_rows(self, df: pl.DataFrame) -> pl.DataFrame:
+        if self.last_datetime is not None and "datetime" in df.columns:
+            return df.filter(pl.col("datetime") > self.last_datetime)
+        if self.frame is None:
+            return df
+        return df.slice(self.count)
+
+    def to_dict(self) -> dict:
+        """匯出暖機狀態（不含快取 frame），可 JSON 序列化"""
+        return {
+            "count": self.count,
+            "last_datetime": self.last_datetime.isoformat() if self.last_datetime is not None else None,
+            "prev_close": self._prev_close,
+            "ewm": {k: list(v) for k, v in self._ewm.items()},
+            "rsi_sums": list(self._rsi_sums),
+            "avg_gain": self._avg_gain,
+            "avg_loss": self._avg_loss,
+            "tr_sum": self._tr_sum,
+            "atr": self._atr,
+            "hl": [list(x) for x in self._hl],
+            "fastk": list(self._fastk),
+            "slowk": list(self._slowk),
+            "bb": list(self._bb),
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict, max_rows: int | None = None) -> "IncrementalIndicators":
+        """由 to_dict 的狀態還原；之後 update 的指標與不中斷計算一致"""
+        inst = cls(max_rows=max_rows)
+        inst.count = state["count"]
+        inst.last_datetime = datetime.fromisoformat(state["last_datetime"]) if state.get("last_datetime") else None
+        inst._prev_close = state["prev_close"]
+        inst._ewm = {k: list(v) for k, v in state["ewm"].items()}
+        inst._rsi_sums = list(state["rsi_sums"])
+        inst._avg_gain, inst._avg_loss = state["avg_gain"], state["avg_loss"]
+        inst._tr_sum, inst._atr = state["tr_sum"], state["atr"]
+        inst._hl.extend(tuple(x) for x in state["hl"])
+        inst._fastk.extend(state["fastk"])
+        inst._slowk.extend(state["slowk"])
+        inst._bb.extend(state["bb"])
+        return inst
+
+    def last_values(self) -> dict:
+        """最後一根已計算 K 棒的指標（由累加器推得，不需快取 frame；尚無輸出的指標為 NaN）"""
+        if self.count == 0:
+            return {}
+        nan = math.nan
+        ema = {k: acc[0] / acc[1] for k, acc in self._ewm.items()}
+        macd = ema["fast"] - ema["slow"]
+        rsi = atr = nan
+        if self.count > self.RSI_PERIOD:
+            total = self._avg_gain + self._avg_loss
+            rsi = 100.0 * self._avg_gain / total if total != 0 else 0.0
+        if self.count > self.ATR_PERIOD:
+            atr = self._atr
+        full = len(self._slowk) == self._slowk.maxlen
+        upper = middle = lower = nan
+        if len(self._bb) == self.BB_PERIOD:
+            middle = sum(self._bb) / self.BB_PERIOD
+            std = math.sqrt(sum((x - middle) ** 2 for x in self._bb) / self.BB_PERIOD)
+            upper, lower = middle + self.BB_MULT * std, middle - self.BB_MULT * std
+        return {
+            "rsi": rsi, "ema_fast": ema["fast"], "ema_slow": ema["slow"], "macd": macd,
+            "macd_signal": ema["signal"], "macd_hist": macd - ema["signal"],
+            "kd_k": self._slowk[-1] if full else nan, "kd_d": sum(self._slowk) / len(self._slowk) if full else nan,
+            "atr": atr, "bband_upper": upper, "bband_middle": middle, "bband_lower": lower,
+        }
+
+    def update(self, df) -> pl.DataFrame:
+        """計算新增 K 棒的指標並附加到快取 frame，回傳完整快取"""
+        if is_pandas(df):
+            df = pl.from_pandas(df)
+        if {"close", "high", "low"} - set(df.columns):
+            return self.frame if self.frame is not None else df
+
+        new = self._new_rows(df)
+        if new.height == 0:
+            return self.frame
+        new = new.with_columns([
+            pl.col("close").cast(pl.Float64),
+            pl.col("high").cast(pl.Float64),
+            pl.col("low").cast(pl.Float64)
+        ])
+
+        names = ["rsi", "ema_fast", "ema_slow", "macd", "macd_signal", "macd_hist",
+                 "kd_k", "kd_d", "atr", "bband_upper", "bband_middle", "bband_lower"]
+        values = [self._step(c, h, l) for c, h, l in zip(new["close"], new["high"], new["low"])]
+        ind = pl.DataFrame(values, schema={n: pl.Float64 for n in names}, orient="row")
+
+        rows = new.hstack(ind).with_columns([
+            pl.when(pl.col("close") > pl.col("bband_upper")).then(pl.lit("BreakUp"))
+             .when(pl.col("close") < pl.col("bband_lower")).then(pl.lit("BreakDown"))
+             .otherwise(pl.lit("Neutral")).alias("bband_signal")
+        ])
+
+        self.frame = rows if self.frame is None else pl.concat([self.frame, rows], how="vertical_relaxed")
+        if self.max_rows:
+            self.frame = self.frame.tail(self.max_rows)
+        if "datetime" in rows.columns:
+            self.last_datetime = rows["datetime"][-1]
+        return self.frame
+
+
+def prepare_kbar(df_raw: pl.DataFrame, length: int = 30, state: IncrementalIndicators | None = None) -> pl.DataFrame:
+    if state is not None:
+        # 增量模式：只計算新收盤的 K 棒
+        df_kbar = state.update(df_raw).tail(length)
+        print(f"📊 增量更新 K 線｜累計筆數：{state.count}")
+    else:
+        df_kbar = df_raw.tail(length + 100)
+        print(f"📊 目前 K 線筆數：{df_kbar.shape[0]}")
+        df_kbar = compute_polars_indicators(df_kbar, target_len=length, debug=True)
     df_kbar = df_kbar.tail(length)
 
     latest = safe_last(df_kbar)
@@ -129,13 +402,16 @@ def prepare_kbar(df_raw: pl.DataFrame, length: int = 30) -> pl.DataFrame:
     return df_kbar
 
 
-def merge_indicators(df_kbar: pl.DataFrame) -> pl.DataFrame:
+def merge_indicators(df_kbar: pl.DataFrame, state: IncrementalIndicators | None = None) -> pl.DataFrame:
     df_kbar = df_kbar.with_columns([
         pl.col("datetime").dt.truncate("1m").alias("datetime")
     ])
 
     target_len = df_kbar.shape[0]
-    df_ind = compute_polars_indicators(df_kbar, target_len=target_len, debug=True)
+    if state is not None:
+        df_ind = state.update(df_kbar).tail(target_len)
+    else:
+        df_ind = compute_polars_indicators(df_kbar, target_len=target_len, debug=True)
 
     indicator_cols = [col for col in [
         "macd", "macd_signal", "macd_hist",
@@ -159,7 +435,7 @@ def safe_last(df):
     try:
         if isinstance(df, pl.DataFrame):
             return dict(zip(df.columns, df.row(-1)))
-        elif isinstance(df, pd.DataFrame):
+        elif is_pandas(df):
             return df.iloc[-1].to_dict()
         elif isinstance(df, pl.Series):
             return {df.name: df[-1]}
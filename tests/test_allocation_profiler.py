@@ -0,0 +1,87 @@
+# test_allocation_profiler.py
+
+import gc
+import math
+from datetime import datetime, timedelta
+
+import polars as pl
+
+import strategy_v4.engines.TickEngine as tick_engine_module
+from strategy_v4.engines.AllocationProfiler import AllocationProfiler
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.MarketData import ReplayAdapter
+from strategy_v4.io.TradeLogger import TradeLogger
+
+# 每 tick 配置預算（回放 60 根暖機 K 棒後的 tick；超過代表熱路徑新增了大量暫存或留存物件）
+PEAK_BYTES_PER_TICK = 64 * 1024
+NET_BYTES_PER_TICK = 8 * 1024
+NET_BLOCKS_PER_TICK = 120
+
+
+def make_engine(tmp_path):
+    start = datetime(2025, 11, 3, 8, 45)
+    closes = [20000 + 30 * math.sin(i / 7) + i * 0.5 for i in range(80)]
+    bars = pl.DataFrame({
+        "datetime": [start + timedelta(minutes=i) for i in range(80)],
+        "open": closes,
+        "high": [c + 3 for c in closes],
+        "low": [c - 3 for c in closes],
+        "close": closes,
+        "volume": [10.0] * 80,
+    })
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"))
+    engine.warm_start(bars.head(60))
+    return engine, ReplayAdapter(bars.slice(60, 10), speed=None).ticks()
+
+
+def test_allocation_budget_per_tick(tmp_path):
+    engine, ticks = make_engine(tmp_path)
+    report = AllocationProfiler(engine).run(ticks)
+
+    assert report["ticks"] == len(ticks) == 40
+    for stage in ("features", "multi_tf", "decision", "log", "act"):
+        assert report["stages"][stage]["calls"] >= len(ticks)
+    peaks = [row["peak_bytes_per_tick"] for row in report["stages"].values()]
+    assert peaks == sorted(peaks, reverse=True)
+    assert report["sites"] and all(s["bytes_per_tick"] > 0 for s in report["sites"])
+
+    per_tick = report["per_tick"]
+    assert per_tick["peak_bytes_per_tick"] < PEAK_BYTES_PER_TICK
+    assert per_tick["net_bytes_per_tick"] < NET_BYTES_PER_TICK
+    assert per_tick["net_blocks_per_tick"] < NET_BLOCKS_PER_TICK
+
+
+def test_gc_attributed_to_stage_and_patches_removed(tmp_path):
+    engine, ticks = make_engine(tmp_path)
+    update = engine.tick_tracker.update
+
+    def collecting_update(price, volume):
+        gc.collect()
+        update(price, volume)
+
+    engine.tick_tracker.update = collecting_update
+    report = AllocationProfiler(engine).run(ticks[:3])
+
+    assert report["stages"]["tracker"]["gc_collections"][2] >= 3
+    assert report["per_tick"]["gc_collections"][2] >= 3
+    assert "_on_tick" not in vars(engine) and engine.tick_tracker.update is collecting_update
+    assert "print" not in vars(tick_engine_module)
+    assert tick_engine_module.extract_features.__module__.endswith("IndicatorEngine")
+
+
+def test_nested_profilers_restore_previous_wrappers(tmp_path):
+    engine, ticks = make_engine(tmp_path)
+    outer = AllocationProfiler(engine).start()
+    outer_on_tick = engine._on_tick
+    inner = AllocationProfiler(engine).start()
+    for tick in ticks[:2]:
+        engine.on_tick(dict(tick))
+    inner.stop()
+    assert engine._on_tick is outer_on_tick
+    engine.on_tick(dict(ticks[2]))
+    outer.stop()
+
+    assert inner.report()["ticks"] == 2 and outer.report()["ticks"] == 3
+    assert "_on_tick" not in vars(engine) and "update" not in vars(engine.tick_tracker)
+    assert "print" not in vars(tick_engine_module)
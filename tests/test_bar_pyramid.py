@@ -0,0 +1,82 @@
+# test_bar_pyramid.py
+
+from datetime import date, datetime, timedelta
+import numpy as np
+import polars as pl
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.pipeline.BarPyramid import BarPyramid
+from strategy_v4.pipeline.polars_indicator_utils import IncrementalIndicators
+
+COLUMNS = ["rsi", "macd", "macd_signal", "kd_k", "kd_d", "atr", "bband_upper"]
+
+
+def _session_bars(day: date, rng) -> pl.DataFrame:
+    """前一日夜盤（15:00~05:00）+ 當日日盤（08:45~13:45）的 1 分 K"""
+    prev = day - timedelta(days=3 if day.weekday() == 0 else 1)
+    night = [datetime(prev.year, prev.month, prev.day, 15, 0) + timedelta(minutes=i) for i in range(14 * 60)]
+    morning = [datetime(day.year, day.month, day.day, 8, 45) + timedelta(minutes=i) for i in range(300)]
+    ts = night + morning
+    close = 17000 + np.cumsum(rng.normal(0, 3, len(ts)))
+    return pl.DataFrame({
+        "datetime": ts, "open": close, "close": close,
+        "high": close + rng.uniform(0, 2, len(ts)), "low": close - rng.uniform(0, 2, len(ts)),
+        "volume": [1] * len(ts),
+    })
+
+
+def test_pyramid_sessions_and_warm_state(tmp_path):
+    rng = np.random.default_rng(3)
+    store = KbarStore(root=tmp_path)
+    days = [date(2025, 11, 6), date(2025, 11, 7), date(2025, 11, 10)]
+    for d in days:
+        store.upsert(_session_bars(d, rng), "TMFR1")
+
+    pyramid = BarPyramid(store, "TMFR1")
+    assert pyramid.build() == days
+    assert pyramid.build() == []
+
+    h60 = store.read("TMFR1", "60m", start=days[-1], end=days[-1])
+    starts = h60["datetime"].dt.strftime("%H:%M").to_list()
+    assert starts[0] == "15:00" and "08:45" in starts and "12:45" in starts
+    assert h60.filter(pl.col("datetime").dt.hour() == 12)["volume"][0] == 60
+    daily = store.read("TMFR1", "1d")
+    assert daily.height == 3 and daily["volume"].to_list() == [14 * 60 + 300] * 3
+
+    # 由暖機狀態接續計算 == 完整歷史計算
+    full = IncrementalIndicators().update(store.read("TMFR1", "5m"))
+    part = pyramid.load("5m", start=days[-1])
+    tail = full.tail(part.height)
+    for col in COLUMNS:
+        np.testing.assert_allclose(part[col].to_numpy(), tail[col].to_numpy(), equal_nan=True)
+
+    # 只有更新過的交易日重新聚合
+    store.upsert(_session_bars(days[1], rng), "TMFR1")
+    assert pyramid.build() == [days[1]]
+    restored = BarPyramid(store, "TMFR1").warm_state("15m")
+    assert restored.count == store.read("TMFR1", "15m").height
+
+
+def test_pyramid_keeps_recent_snapshots_only(tmp_path):
+    rng = np.random.default_rng(5)
+    store = KbarStore(root=tmp_path)
+    days = [date(2025, 11, 3), date(2025, 11, 4), date(2025, 11, 5), date(2025, 11, 6)]
+    for d in days:
+        store.upsert(_session_bars(d, rng), "TMFR1")
+    pyramid = BarPyramid(store, "TMFR1", keep_days=2)
+    pyramid.build()
+    assert all(sorted(snaps) == [d.isoformat() for d in days[-2:]] for snaps in pyramid.state()["indicators"].values())
+
+    # 更新的交易日早於保留的快照：由歷史重算，結果與完整計算一致
+    store.upsert(_session_bars(days[1], rng), "TMFR1")
+    assert pyramid.build() == [days[1]]
+    full = IncrementalIndicators().update(store.read("TMFR1", "15m"))
+    part = pyramid.load("15m", start=days[2])
+    for col in COLUMNS:
+        np.testing.assert_allclose(part[col].to_numpy(), full.tail(part.height)[col].to_numpy(), equal_nan=True)
+    assert pyramid.warm_state("15m", as_of=days[0]).count == store.read("TMFR1", "15m", end=days[0]).height
+    assert pyramid.recent("5m", 10)["datetime"].to_list() == store.read("TMFR1", "5m").tail(10)["datetime"].to_list()
+
+    # 狀態推得的最後一筆指標 == frame 最後一列
+    last = full.row(-1, named=True)
+    for key, value in pyramid.warm_state("15m").last_values().items():
+        np.testing.assert_allclose(value, last[key])
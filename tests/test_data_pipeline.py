@@ -0,0 +1,121 @@
+# test_data_pipeline.py
+
+import json
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from strategy_v4.pipeline.DataPipeline import DataPipeline
+
+EVENTS = [
+    ("2025-11-03", "settlement"), ("2025-11-03", "holiday_eve"), ("2025-11-04", "cpi"),
+    ("2025-11-04", "cpi"), ("2025-11-06", "settlement"), ("2025-11-08", "weekend_note"),
+]
+
+
+def write_inputs(tmp_path):
+    pl.DataFrame({"date": [d for d, _ in EVENTS], "event": [e for _, e in EVENTS]}).write_csv(tmp_path / "events.csv")
+    start = datetime(2025, 11, 2, 22, 0)
+    times = [start + timedelta(minutes=37 * i) for i in range(400)]   # 跨日、含夜盤
+    bars = pl.DataFrame({
+        "datetime": times,
+        "open": [100.0 + i for i in range(400)], "high": [101.0 + i for i in range(400)],
+        "low": [99.0 + i for i in range(400)], "close": [100.5 + i for i in range(400)],
+        "volume": [float(i % 9) for i in range(400)],
+    })
+    bars.write_csv(tmp_path / "kbars_6m.csv")
+    bars.write_parquet(tmp_path / "kbars_6m.parquet")
+    return bars
+
+
+@pytest.mark.parametrize("name", ["kbars_6m.csv", "kbars_6m.parquet"])
+def test_range_and_column_pushdown(tmp_path, name):
+    bars = write_inputs(tmp_path)
+    lf = DataPipeline(tmp_path).scan_kbars(name, start="2025-11-04", end="2025-11-05", columns=["datetime", "close"])
+
+    plan = lf.explain()
+    assert "SCAN" in plan and "PROJECT 2/6 COLUMNS" in plan and "SELECTION" in plan
+    assert "FILTER" not in plan                          # 過濾在掃描階段完成，沒有獨立的過濾節點
+
+    got = lf.collect()
+    expected = bars.filter((pl.col("datetime") >= datetime(2025, 11, 4)) & (pl.col("datetime") < datetime(2025, 11, 6)))
+    assert got.columns == ["datetime", "close"]
+    assert got["datetime"].to_list() == expected["datetime"].to_list()
+    assert got["close"].to_list() == expected["close"].to_list()
+
+    timed = DataPipeline(tmp_path).scan_kbars(name, start="2025-11-04 08:45:00", end="2025-11-04 13:45:00").collect()
+    assert timed["datetime"].min() >= datetime(2025, 11, 4, 8, 45)
+    assert timed["datetime"].max() <= datetime(2025, 11, 4, 13, 45)
+
+
+def test_event_scripts_match_eager_versions(tmp_path, monkeypatch):
+    import strategy_v4.event_flag_matrix as event_flag_matrix
+    import strategy_v4.event_summary as event_summary
+
+    write_inputs(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    event_flag_matrix.main()
+    event_summary.main()
+    df = pd.read_csv("events.csv", parse_dates=["date"])
+
+    # event_flag_matrix：舊版 pivot_table（同一天多事件為 1）
+    df["flag"] = 1
+    old_matrix = df.pivot_table(index="date", columns="event", values="flag", aggfunc="max", fill_value=0).sort_index()
+    pipeline = DataPipeline()
+    codec = pipeline.event_codec("events.csv", "event_ids.json")
+    assert json.loads((tmp_path / "event_ids.json").read_text(encoding="utf-8")) == codec.ids
+    masks = pl.read_csv("event_flag_matrix.csv", try_parse_dates=True)
+    flags = codec.to_flags(masks.lazy(), old_matrix.columns).collect()
+    assert flags["date"].to_list() == [d.date() for d in old_matrix.index]
+    for name in old_matrix.columns:
+        assert flags[name].to_list() == old_matrix[name].tolist()
+
+    # event_summary：舊版 value_counts + groupby 首尾日期
+    old_summary = df["event"].value_counts().rename_axis("event_type").rename("count")
+    summary = pl.read_csv("event_summary.csv", try_parse_dates=True)
+    assert dict(zip(summary["event_type"], summary["count"])) == old_summary.to_dict()
+    assert summary["count"].to_list() == sorted(summary["count"].to_list(), reverse=True)
+    for row in summary.iter_rows(named=True):
+        dates = df.loc[df["event"] == row["event_type"], "date"]
+        assert (row["start_date"], row["end_date"]) == (dates.min().date(), dates.max().date())
+
+
+def test_kbars_with_events_matches_eager_merge(tmp_path):
+    write_inputs(tmp_path)
+    pipeline = DataPipeline(tmp_path)
+    codec = pipeline.event_codec(tmp_path / "events.csv", ids_path=None)
+    merged = codec.to_flags(pipeline.kbars_with_events("kbars_6m.csv", tmp_path / "events.csv", codec=codec)).collect()
+
+    # merge_event_matrix 舊版：依日曆日 left merge 事件矩陣，缺值補 0
+    events = pd.read_csv(tmp_path / "events.csv", parse_dates=["date"])
+    events["flag"] = 1
+    matrix = events.pivot_table(index="date", columns="event", values="flag", aggfunc="max", fill_value=0).reset_index()
+    old = pd.read_csv(tmp_path / "kbars_6m.csv", parse_dates=["datetime"])
+    old["date"] = old["datetime"].dt.normalize()
+    old = old.merge(matrix, on="date", how="left").fillna(0)
+
+    assert merged.height == len(old)
+    assert merged["datetime"].to_list() == old["datetime"].dt.to_pydatetime().tolist()
+    for name in codec.names:
+        assert merged[name].to_list() == old[name].astype(int).tolist(), name
+    weekend = merged.filter(pl.col("date") == date(2025, 11, 8))
+    assert weekend.height > 0 and set(weekend["weekend_note"]) == {1}
+
+
+def test_backtest_loader_detects_time_column(tmp_path):
+    from strategy_v4.backtest.BacktestDataLoader import BacktestDataLoader
+
+    pl.DataFrame({
+        "Date": ["2025-11-03", "2025-11-04", "2025-11-05", "2025-11-06"],
+        "Close": [100.0, 101.0, 102.0, 103.0], "Volume": [1, 2, 3, 4],
+    }).write_csv(tmp_path / "daily.csv")
+    ticks = BacktestDataLoader(str(tmp_path / "daily.csv"), start="2025-11-04", end="2025-11-05").to_ticks()
+    assert [t["timestamp"] for t in ticks] == [datetime(2025, 11, 4), datetime(2025, 11, 5)]
+    assert [t["price"] for t in ticks] == [101.0, 102.0]
+
+    raw = pl.DataFrame({"timestamp": [datetime(2025, 11, 3, 9), datetime(2025, 11, 4, 9)], "close": [1.0, 2.0]})
+    raw.write_csv(tmp_path / "ticks.csv")
+    loaded = BacktestDataLoader(str(tmp_path / "ticks.csv"), start="2025-11-04").load()
+    assert loaded["close"].tolist() == [2.0]
@@ -0,0 +1,103 @@
+# test_decision_engine_columns.py
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+
+from strategy_v4.engines.DecisionEngine import DecisionEngine
+
+
+def _make_rows(n: int = 400, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+
+    def val(lo, hi):
+        # 混入 0 / None / NaN，驗證 `x or default` 語意
+        r = rng.random()
+        if r < 0.05:
+            return 0
+        if r < 0.08:
+            return None
+        if r < 0.10:
+            return float("nan")
+        return rng.uniform(lo, hi)
+
+    rows = []
+    for _ in range(n):
+        rows.append({
+            "price": rng.uniform(17000, 17100),
+            "close": val(17000, 17100),
+            "volume": val(0, 10),
+            "adx": val(10, 40),
+            "ema5": val(17000, 17100),
+            "ema20": val(17000, 17100),
+            "macd": val(-3, 3),
+            "macd_signal": val(-3, 3),
+            "macd_hist": val(-2, 2),
+            "rsi": val(20, 80),
+            "vwap": val(17000, 17100),
+            "atr": val(0, 30),
+            "rsi_5m": val(30, 70),
+            "ema_5m": val(17000, 17100),
+            "ema_15m": val(17000, 17100),
+            "is_ready": rng.random() < 0.8,
+            "is_ready_5m": rng.random() < 0.7,
+            "is_ready_15m": rng.random() < 0.7,
+            "momentum": val(-6, 6),
+        })
+    return rows
+
+
+def _columns(rows: list[dict]) -> dict:
+    return {k: [r[k] for r in rows] for k in rows[0]}
+
+
+def test_columns_match_per_tick():
+    rows = _make_rows()
+    for market_bias in ("auto", "bullish", "bearish", "neutral"):
+        engine = DecisionEngine(market_bias=market_bias)
+        res = engine.evaluate_columns(_columns(rows))
+
+        for i, row in enumerate(rows):
+            tick = dict(row)
+            assert res["bias"][i] == engine.detect_market_bias(tick)
+            assert res["entry_score"][i] == engine.score_entry(tick)
+            assert res["exit_score"][i] == engine.score_exit(tick)
+            assert bool(res["should_enter"][i]) == engine.should_enter(tick)
+            assert res["direction_score"][i] == tick["direction_score"]
+
+
+def test_columns_ignore_input_direction_score_and_accept_polars():
+    rows = _make_rows(seed=11)
+    rng = random.Random(3)
+    t0 = datetime(2025, 11, 3, 8, 45)
+    for i, row in enumerate(rows):
+        row["direction_score"] = rng.choice([-2, -1, 0, 1, 2])   # 例如 tick_data 紀錄的舊值
+    frame = pl.DataFrame(_columns(rows), strict=False).with_columns(
+        pl.Series("datetime", [t0 + timedelta(minutes=i) for i in range(len(rows))]),
+        pl.lit("TMFR1").alias("code"),
+    )
+    engine = DecisionEngine(market_bias="auto")
+    res = engine.evaluate_columns(frame)
+
+    for i, row in enumerate(rows):
+        tick = dict(row)
+        assert res["bias"][i] == engine.detect_market_bias(tick)
+        assert res["entry_score"][i] == engine.score_entry(tick)
+        assert res["exit_score"][i] == engine.score_exit(tick)
+        assert bool(res["should_enter"][i]) == engine.should_enter(tick)
+        assert res["direction_score"][i] == tick["direction_score"]
+
+
+def test_consolidation_filter():
+    engine = DecisionEngine()
+    res = engine.evaluate_columns({
+        "adx": np.array([10.0, 10.0, 30.0]),
+        "macd": np.array([1.0, 1.0, 1.0]),
+        "macd_signal": np.array([0.9, 0.2, 0.9]),
+        "price": np.array([100.0, 100.0, 100.0]),
+    })
+    assert list(res["entry_score"][:1]) == [-99]
+    assert res["entry_score"][1] != -99 and res["entry_score"][2] != -99
+    assert not res["should_enter"][0]
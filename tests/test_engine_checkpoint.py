@@ -0,0 +1,139 @@
+# test_engine_checkpoint.py
+
+import numpy as np
+import pytest
+
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.EngineCheckpoint import EngineCheckpoint, decode, encode
+from strategy_v4.io.TradeLogger import TradeLogger
+
+
+def make_engine(tmp_path, checkpoint=None):
+    return TickEngine(
+        state=StrategyState(),
+        trade_logger=TradeLogger(tmp_path / "trade_log.csv"),
+        checkpoint=checkpoint,
+    )
+
+
+def feed(engine, n=120, start=0):
+    for i in range(start, start + n):
+        engine.on_tick({"price": 20000 + (i % 17) * 2.0 - (i % 5), "volume": 1 + i % 3})
+
+
+def assert_same_state(a: dict, b: dict):
+    assert a.keys() == b.keys()
+    for key in a:
+        if isinstance(a[key], dict):
+            assert_same_state(a[key], b[key])
+        elif isinstance(a[key], np.ndarray):
+            np.testing.assert_array_equal(a[key], b[key])
+        else:
+            assert a[key] == b[key], key
+
+
+def test_encode_roundtrip():
+    state = {"a": np.arange(5, dtype=np.float64), "b": {"c": np.zeros((2, 3), dtype=np.int32), "d": [1, "x"]},
+             "e": np.array([], dtype=np.float64), "f": None}
+    out, meta = decode(encode(state, {"rows": 3}))
+    assert meta == {"rows": 3}
+    assert_same_state(state, out)
+
+    data = bytearray(encode(state))
+    data[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        decode(bytes(data))
+
+
+def test_checkpoint_restore(tmp_path):
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt", interval=0)
+    engine = make_engine(tmp_path, ckpt)
+    feed(engine)
+    engine.state.enter("long", 20010.0)
+    engine.logger.log("ENTER", engine.state.get_status(), 20010.0, {})
+    ckpt.save(engine)
+    assert ckpt.flush(5)
+    expected = engine.export_state()
+
+    restored = make_engine(tmp_path)
+    report = EngineCheckpoint(tmp_path / "engine.ckpt").restore(restored)
+    assert report["consistent"] and report["seconds"] < 1.0
+    assert_same_state(expected, restored.export_state())
+    assert restored.logger.rows == 1
+
+    # 還原後的引擎與未中斷的引擎輸出相同特徵
+    feed(engine, 30, start=120)
+    feed(restored, 30, start=120)
+    assert engine.multi_tf_engine.extract_features() == restored.multi_tf_engine.extract_features()
+    assert engine.tick_tracker.get_multi_status() == restored.tick_tracker.get_multi_status()
+
+
+def test_restore_replays_trades_after_checkpoint(tmp_path):
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt")
+    engine = make_engine(tmp_path)
+    feed(engine, 40)
+    ckpt.save(engine, sync=True)
+
+    # 檢查點之後才進場，程序當機
+    engine.state.enter("short", 19990.0)
+    engine.logger.log("ENTER", engine.state.get_status(), 19990.0, {})
+
+    restored = make_engine(tmp_path)
+    report = ckpt.restore(restored)
+    assert not report["consistent"] and report["replayed"] == ["ENTER"]
+    assert restored.state.in_position and restored.state.direction == "short"
+    assert restored.state.entry_price == 19990.0
+
+    # 紀錄接續附加，不覆寫既有紀錄
+    restored.logger.log("EXIT", restored.state.get_status(), 19980.0, {})
+    assert restored.logger.resume() == 2
+    assert restored.logger.last_entry()["event"] == "EXIT"
+
+
+def test_restore_missing_or_expired(tmp_path):
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt")
+    assert ckpt.restore(make_engine(tmp_path)) is None
+    ckpt.save(make_engine(tmp_path), sync=True)
+    assert ckpt.restore(make_engine(tmp_path), max_age=-1) is None
+
+
+def test_restore_ignores_previous_session_log(tmp_path):
+    # 前一次執行的紀錄檔停在 ENTER（未平倉）
+    old = TradeLogger(tmp_path / "trade_log.csv")
+    old.log("ENTER", {"direction": "long", "current_position_size": 1}, 20000.0, {})
+
+    # 新 session 尚未有交易（紀錄檔還沒被覆寫）就建立檢查點，隨後當機
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt")
+    engine = make_engine(tmp_path)
+    feed(engine, 40)
+    ckpt.save(engine, sync=True)
+
+    restored = make_engine(tmp_path)
+    report = ckpt.restore(restored)
+    assert report["stale_log"] and report["replayed"] == []
+    assert not restored.state.in_position and restored.state.entry_price is None
+
+    # 舊檔不接續：第一筆新紀錄重建檔案
+    restored.logger.log("ENTER", {"direction": "short", "current_position_size": 1}, 19990.0, {})
+    assert restored.logger.resume() == 1 and restored.logger.last_entry()["direction"] == "short"
+
+
+def test_restore_rejects_replaced_log(tmp_path):
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt")
+    engine = make_engine(tmp_path)
+    feed(engine, 40)
+    engine.logger.log("ENTER", {"direction": "long", "current_position_size": 1}, 20010.0, {})
+    engine.logger.log("EXIT", {"direction": "long", "current_position_size": 1}, 20020.0, {})
+    ckpt.save(engine, sync=True)
+
+    # 紀錄檔在當機後被另一份檔案取代（筆數較多，但第一筆不同）
+    other = TradeLogger(tmp_path / "other.csv")
+    for price in (1.0, 2.0, 3.0):
+        other.log("ENTER", {"direction": "short", "current_position_size": 1}, price, {})
+    (tmp_path / "other.csv").replace(tmp_path / "trade_log.csv")
+
+    restored = make_engine(tmp_path)
+    report = ckpt.restore(restored)
+    assert report["stale_log"] and not report["consistent"] and report["replayed"] == []
+    assert not restored.state.in_position
@@ -0,0 +1,53 @@
+# test_engine_host.py
+
+import os
+
+from strategy_v4.EngineHost import EngineHost
+from strategy_v4.engines.StrategyState import StrategyState
+
+
+class FakeEngine:
+    """只在第一筆 tick 依設定方向進場的輕量引擎"""
+
+    def __init__(self, code, spec):
+        self.code = code
+        self.direction = spec.get("direction")
+        self.state = StrategyState()
+        self.tick_recorder = None
+        self.checkpoint = None
+        self.pids = set()
+
+    def on_tick(self, tick):
+        assert tick["code"] == self.code
+        self.pids.add(os.getpid())
+        if self.direction and not self.state.in_position:
+            self.state.enter(self.direction, tick["price"])
+
+
+def fake_factory(code, spec, log_dir):
+    return FakeEngine(code, spec)
+
+
+def test_assign_balances_by_weight():
+    shards = EngineHost.assign({"A": {"weight": 3}, "B": {}, "C": {}, "D": {"weight": 2}}, 2)
+    assert shards == [["A", "C"], ["D", "B"]]   # 負載 4 : 3
+
+
+def test_host_routes_and_aggregates(tmp_path):
+    contracts = {"TMFK5": {"direction": "long"}, "TMFL5": {"direction": "short"}, "MXFK5": {}}
+    host = EngineHost(contracts, workers=2, factory=fake_factory, log_dir=tmp_path, report_interval=0.05).start()
+    assert sorted(c for s in host.shards for c in s) == sorted(contracts)
+
+    for i in range(30):
+        for code in contracts:
+            assert host.route({"code": code, "price": 100.0 + i, "volume": 1})
+    assert not host.route({"code": "TXFK5", "price": 1.0})
+
+    result = host.stop()
+    totals = result["totals"]
+    assert totals["processed"] == 90 and totals["unrouted"] == 1 and totals["errors"] == 0
+    assert totals["long"] == 1 and totals["short"] == 1
+    assert result["contracts"]["TMFK5"]["unrealized"] == 29.0     # long 100 → 129
+    assert result["contracts"]["TMFL5"]["unrealized"] == -29.0
+    assert len({s["pid"] for s in result["shards"].values()}) == 2
+    assert os.getpid() not in {s["pid"] for s in result["shards"].values()}
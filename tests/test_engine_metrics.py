@@ -0,0 +1,75 @@
+# test_engine_metrics.py
+
+import gc
+import json
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.EngineMetrics import EngineMetrics, Histogram, MetricsServer
+from strategy_v4.io.TickRecorder import TickRecorder
+from strategy_v4.io.TradeLogger import TradeLogger
+
+
+def test_histogram_and_rate():
+    hist = Histogram((0.001, 0.01))
+    for v in (0.0005, 0.002, 0.003, 0.5):
+        hist.observe(v)
+    assert hist.cumulative() == [("0.001", 1), ("0.01", 3), ("+Inf", 4)]
+    assert hist.quantile(0.5) == 0.01 and hist.quantile(1.0) == 0.5
+
+    metrics = EngineMetrics(rate_window=4)
+    for sec in range(100, 104):
+        for _ in range(5):
+            metrics.observe_tick(0.0001, now=sec + 0.5)
+    metrics.observe_tick(0.0001, event="ENTER", now=104.1)
+    assert metrics.ticks_per_second(now=104.2) == 5.0       # 100~103 各 5 筆
+    assert metrics.events == {"ENTER": 1}
+    metrics.close()
+
+
+def test_gc_callback_counts_collections():
+    metrics = EngineMetrics()
+    gc.collect()
+    assert metrics.gc_collections[2] >= 1 and metrics.gc_pause_total > 0
+    metrics.close()
+    assert metrics._on_gc not in gc.callbacks
+
+
+def test_metrics_server_exposes_engine(tmp_path):
+    metrics = EngineMetrics()
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"),
+                        tick_recorder=TickRecorder(tmp_path / "tick_data.csv", buffer_size=1000), metrics=metrics)
+    t0 = datetime(2025, 11, 3, 9, 0)
+    for i in range(50):
+        engine.on_tick({"price": 20000 + i % 7, "volume": 1, "timestamp": t0 + timedelta(seconds=i)})
+
+    server = MetricsServer(metrics, port=0).start()
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        text = urllib.request.urlopen(base + "/metrics", timeout=5).read().decode("utf-8")
+        snap = json.loads(urllib.request.urlopen(base + "/metrics.json", timeout=5).read())
+    finally:
+        server.stop()
+        metrics.close()
+
+    assert "sv4_ticks_total 50" in text
+    assert 'sv4_on_tick_seconds_bucket{le="+Inf"} 50' in text
+    assert "sv4_recorder_buffer_depth 50" in text
+    assert "# TYPE sv4_gc_collections_total counter" in text
+    assert snap["ticks"] == 50 and snap["latency"]["count"] == 50
+    assert snap["rss_bytes"] > 0 and snap["trade_log_rows"] == engine.logger.rows
+    assert sum(snap["events"].values()) <= 50
+
+
+def test_observe_overhead_is_small():
+    metrics = EngineMetrics()
+    n = 100000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        metrics.observe_tick(0.0003)
+    per_call = (time.perf_counter() - t0) / n
+    metrics.close()
+    assert per_call < 20e-6
@@ -1,51 +1,48 @@
 import os
+import json
+from datetime import date, datetime, timedelta
 import pandas as pd
+import polars as pl
+from strategy_v4.pipeline.EventMask import EventMask
 
 def test_kbars_with_events():
     base_dir = os.path.dirname(__file__)
     csv_path = os.path.join(base_dir, "..", "kbars_with_events.csv")
+    ids_path = os.path.join(base_dir, "..", "event_ids.json")
 
     df = pd.read_csv(csv_path, parse_dates=["datetime"])
     # 清理欄位名稱：移除所有換行符號與多餘空白
     df.columns = df.columns.str.strip().str.replace(r"\s+", "", regex=True)
 
-    required_cols = [
-        "datetime", "open", "high", "low", "close", "volume", "amount", "date",
-        "中秋節", "中華民國開國紀念日", "兒童節及清明節", "勞動節", "台指期貨結算日",
-        "合約交割日", "和平紀念日", "國慶日", "央行利率會議", "孔子誕辰紀念日/教師節",
-        "端午節", "臺灣光復暨金門古寧頭大捷紀念日", "行憲紀念日", "除夕及春節"
-    ]
+    required_cols = ["datetime", "open", "high", "low", "close", "volume", "amount", "date", "event_mask"]
     for col in required_cols:
         assert col in df.columns, f"缺少欄位: {col}"
 
-    event_cols = required_cols[8:]
-    for col in event_cols:
-        assert set(df[col].dropna().unique()).issubset({0, 1}), f"{col} 欄位有非 0/1 值"
-
-    assert not df[event_cols].isnull().any().any(), "事件欄位有空值"
-import os
-import pandas as pd
-
-def test_kbars_with_events():
-    base_dir = os.path.dirname(__file__)
-    csv_path = os.path.join(base_dir, "..", "kbars_with_events.csv")
-
-    df = pd.read_csv(csv_path, parse_dates=["datetime"])
-    # 清理欄位名稱：移除所有換行符號與多餘空白
-    df.columns = df.columns.str.strip().str.replace(r"\s+", "", regex=True)
-
-    required_cols = [
-        "datetime", "open", "high", "low", "close", "volume", "amount", "date",
-        "中秋節", "中華民國開國紀念日", "兒童節及清明節", "勞動節", "台指期貨結算日",
-        "合約交割日", "和平紀念日", "國慶日", "央行利率會議", "孔子誕辰紀念日/教師節",
-        "端午節", "臺灣光復暨金門古寧頭大捷紀念日", "行憲紀念日", "除夕及春節"
-    ]
-    for col in required_cols:
-        assert col in df.columns, f"缺少欄位: {col}"
-
-    event_cols = required_cols[8:]
-    # 將 NaN 補成 0，確保事件欄位完整
-    df[event_cols] = df[event_cols].fillna(0).astype(int)
-
-    for col in event_cols:
-        assert set(df[col].unique()).issubset({0, 1}), f"{col} 欄位有非 0/1 值"
+    with open(ids_path, "r", encoding="utf-8") as f:
+        ids = json.load(f)
+    for name in ["台指期貨結算日", "央行利率會議", "合約交割日"]:
+        assert name in ids, f"事件字典缺少: {name}"
+
+    assert not df["event_mask"].isnull().any(), "event_mask 有空值"
+    valid_bits = sum(1 << b for b in ids.values())
+    assert ((df["event_mask"] & ~valid_bits) == 0).all(), "event_mask 含未定義位元"
+
+def test_event_mask_asof_join():
+    events = pl.LazyFrame({
+        "date": [date(2025, 11, 19), date(2025, 11, 19), date(2025, 11, 20), date(2025, 11, 20)],
+        "event": ["台指期貨結算日", "合約交割日", "央行利率會議", "央行利率會議"],
+    })
+    codec = EventMask({"合約交割日": 0}).extend(["台指期貨結算日", "央行利率會議"])
+    assert codec.ids == {"合約交割日": 0, "台指期貨結算日": 1, "央行利率會議": 2}
+
+    start = datetime(2025, 11, 18, 13, 0)
+    bars = pl.LazyFrame({"datetime": [start + timedelta(hours=12 * i) for i in range(6)]})
+    bars = bars.with_columns(pl.col("datetime").dt.date().alias("date"))
+    out = codec.join_bars(bars, codec.encode(events)).collect()
+
+    assert out["event_mask"].to_list() == [0, 3, 3, 4, 4, 0]
+    assert codec.decode(3) == ["合約交割日", "台指期貨結算日"]
+    assert out.select(codec.has_event_expr(["央行利率會議", "台指期貨結算日"]))["event_mask"].to_list() == [False, True, True, True, True, False]
+    assert codec.has_event(out["event_mask"].to_numpy(), ["合約交割日", "台指期貨結算日"], all_=True).tolist() == [False, True, True, False, False, False]
+    flags = codec.to_flags(out.lazy()).collect()
+    assert flags["央行利率會議"].to_list() == [0, 0, 0, 1, 1, 0]
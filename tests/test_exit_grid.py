@@ -0,0 +1,50 @@
+# test_exit_grid.py
+
+import itertools
+import numpy as np
+from strategy_v4.engines.ExitStrategySimulator import ExitStrategySimulator
+
+
+def _naive_exit(entry, direction, prices, atrs, scores, k_sl, k_tp, thr, max_ticks):
+    """逐 tick 依 TickEngine 順序判斷出場"""
+    sign = 1.0 if direction == "long" else -1.0
+    valid = [p for p in prices if not np.isnan(p)]
+    for j, price in enumerate(valid):
+        pnl = sign * (price - entry)
+        if pnl <= -k_sl * atrs[j]:
+            return pnl, j + 1, "stoploss"
+        if pnl >= k_tp * atrs[j]:
+            return pnl, j + 1, "takeprofit"
+        if scores is not None and scores[j] >= thr:
+            return pnl, j + 1, "exit_score"
+        if j + 1 >= max_ticks:
+            return pnl, j + 1, "tick_exit"
+    return sign * (valid[-1] - entry), len(valid), "open"
+
+
+def test_grid_matches_scalar_loop():
+    rng = np.random.default_rng(5)
+    series = 17000 + np.cumsum(rng.integers(-4, 5, 2000)).astype(float)
+    atr_series = rng.uniform(2, 8, 2000)
+    score_series = rng.normal(0, 1, 2000)
+    entry_idx = np.sort(rng.choice(1990, 60, replace=False))
+    horizon = 40
+
+    sim = ExitStrategySimulator()
+    px = sim.extract_paths(series, entry_idx, horizon)
+    atr = sim.extract_paths(atr_series, entry_idx, horizon)
+    xs = sim.extract_paths(score_series, entry_idx, horizon)
+    entries = series[entry_idx]
+    directions = rng.choice(["long", "short"], len(entry_idx))
+
+    grid = {"k_sl": [1.0, 2.0], "k_tp": [1.5, 3.0], "exit_threshold": [1.0, 2.5], "max_ticks": [5, 30]}
+    results = sim.simulate_grid(entries, directions, px, atr, xs, grid)
+    assert len(results) == 16
+
+    for res, (a, b, c, d) in zip(results, itertools.product(*grid.values())):
+        assert (res["k_sl"], res["k_tp"], res["exit_threshold"], res["max_ticks"]) == (a, b, c, d)
+        naive = [_naive_exit(entries[e], directions[e], px[e], atr[e], xs[e], a, b, c, d) for e in range(len(entries))]
+        assert res["total_pnl"] == round(sum(n[0] for n in naive), 2)
+        assert res["avg_holding_ticks"] == round(float(np.mean([n[1] for n in naive])), 2)
+        for reason in ExitStrategySimulator.EXIT_REASONS:
+            assert res["exit_reasons"][reason] == sum(1 for n in naive if n[2] == reason)
@@ -0,0 +1,121 @@
+# test_fast_start.py
+
+import json
+import math
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import polars as pl
+
+from strategy_v4.StartupTimer import StartupTimer
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.ContractCache import ContractCache, session_date
+from strategy_v4.io.EngineCheckpoint import EngineCheckpoint
+from strategy_v4.io.TradeLogger import TradeLogger
+
+
+def run_python(code: str) -> dict:
+    """在新的直譯器執行（sys.modules 乾淨），回傳最後一行 JSON"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=120)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_live_imports_skip_heavy_modules():
+    loaded = run_python(
+        "import json, sys\n"
+        "import strategy_v4.main\n"
+        "print(json.dumps([m for m in ('pandas', 'polars', 'polars_talib', 'sklearn', 'http.server') if m in sys.modules]))"
+    )
+    assert loaded == []
+
+
+def test_restore_from_checkpoint_without_polars(tmp_path):
+    start = datetime(2025, 11, 3, 8, 45)
+    closes = [20000 + 20 * math.sin(i / 5) for i in range(60)]
+    bars = pl.DataFrame({
+        "datetime": [start + timedelta(minutes=i) for i in range(60)],
+        "open": closes, "high": [c + 2 for c in closes], "low": [c - 2 for c in closes],
+        "close": closes, "volume": [5.0] * 60,
+    })
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"))
+    engine.warm_start(bars)
+    ckpt = EngineCheckpoint(tmp_path / "engine.ckpt", interval=0)
+    ckpt.save(engine)
+    assert ckpt.flush(5)
+
+    result = run_python(
+        "import json, sys\n"
+        "from strategy_v4.engines.StrategyState import StrategyState\n"
+        "from strategy_v4.engines.TickEngine import TickEngine\n"
+        "from strategy_v4.io.EngineCheckpoint import EngineCheckpoint\n"
+        "from strategy_v4.io.TradeLogger import TradeLogger\n"
+        f"engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger({str(tmp_path / 'trade_log.csv')!r}))\n"
+        f"report = EngineCheckpoint({str(tmp_path / 'engine.ckpt')!r}).restore(engine)\n"
+        "engine.on_tick({'price': 20001.0, 'volume': 1})\n"
+        "print(json.dumps({'restored': report is not None, 'bars': engine.bar_indicators,\n"
+        "                  'loaded': [m for m in ('pandas', 'polars', 'polars_talib') if m in sys.modules]}))"
+    )
+    assert result["restored"] and result["loaded"] == []
+    assert result["bars"] == engine.bar_indicators
+
+
+class FakeContract(SimpleNamespace):
+    def __iter__(self):
+        return iter(vars(self).items())
+
+
+class FakeApi:
+    def __init__(self):
+        self.downloads = 0
+        tmf = [FakeContract(code="TMFL5", symbol="TMF202512", delivery_date="2025/12/17"),
+               FakeContract(code="TMFA6", symbol="TMF202601", delivery_date="2026/01/21"),
+               FakeContract(code="TMFK5", symbol="TMF202511", delivery_date="2025/11/19"),
+               FakeContract(code="TMFR1", symbol="TMFR1", delivery_date="2025/11/19")]
+        self.Contracts = SimpleNamespace(Futures=SimpleNamespace(TMF=tmf))
+
+    def fetch_contracts(self, contract_download=False):
+        self.downloads += 1
+
+
+def test_contract_cache_daily_refresh(tmp_path):
+    now = [datetime(2025, 11, 3, 8, 40)]
+    path = tmp_path / "contracts.json"
+    api = FakeApi()
+    cache = ContractCache(path, products=["TMF"], clock=lambda: now[0])
+    cache.ensure(api)
+    assert api.downloads == 1 and cache.fresh
+    assert cache.months("TMF") == ["TMFK5", "TMFL5", "TMFA6"]
+    assert cache.contract(api, "TMF:0").code == "TMFK5"
+
+    # 同一交易日重啟：不下載，api 無合約時由快取欄位重建
+    rebuilt = ContractCache(path, products=["TMF"], clock=lambda: now[0], factory=lambda f: SimpleNamespace(**f))
+    assert rebuilt.load()
+    rebuilt.ensure(api)
+    assert api.downloads == 1
+    contract = rebuilt.contract(None, "TMF:1")
+    assert contract.code == "TMFL5" and contract.delivery_date == "2025/12/17"
+    assert not ContractCache(path, products=["TMF", "TXF"], clock=lambda: now[0]).load()
+
+    # 夜盤 15:00 之後屬下一交易日；過了結算日近月改為下一個月份
+    now[0] = datetime(2025, 11, 20, 15, 5)
+    assert session_date(now[0]).isoformat() == "2025-11-21"
+    stale = ContractCache(path, products=["TMF"], clock=lambda: now[0])
+    assert not stale.load()
+    stale.ensure(api)
+    assert api.downloads == 2 and stale.resolve("TMF:0") == "TMFL5"
+
+
+def test_startup_timer_budget(capsys):
+    timer = StartupTimer(budget={"imports": 0.01, "ready": 10.0}, start=0.0)
+    timer.marks = [("imports", 0.05), ("login", 3.0), ("engine", 0.02)]
+    timer._last = 3.07
+    report = timer.report()
+    assert abs(report["ready"] - 0.07) < 1e-9
+    assert len(report["warnings"]) == 1 and "匯入" in report["warnings"][0]
+    assert "[Startup]" in capsys.readouterr().out
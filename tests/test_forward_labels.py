@@ -0,0 +1,53 @@
+# test_forward_labels.py
+
+import math
+import numpy as np
+from strategy_v4.pipeline.forward_labels import compute_forward_labels, attach_forward_labels
+
+
+def _naive(p, hi, lo, atr, h, k):
+    n = len(p)
+    ret, mfe, mae, bar = [], [], [], []
+    for t in range(n):
+        if t + h >= n:
+            ret.append(math.nan); mfe.append(math.nan); mae.append(math.nan); bar.append(math.nan)
+            continue
+        ret.append(p[t + h] / p[t] - 1.0)
+        mfe.append(max(hi[t + 1:t + h + 1]) - p[t])
+        mae.append(p[t] - min(lo[t + 1:t + h + 1]))
+        label = 0.0
+        for j in range(t + 1, t + h + 1):
+            up = hi[j] >= p[t] + k * atr[t]
+            dn = lo[j] <= p[t] - k * atr[t]
+            if up or dn:
+                label = 0.0 if (up and dn) else (1.0 if up else -1.0)
+                break
+        bar.append(label)
+    return ret, mfe, mae, bar
+
+
+def test_labels_match_naive_loop():
+    rng = np.random.default_rng(11)
+    n = 300
+    p = 17000 + np.cumsum(rng.integers(-3, 4, n)).astype(float)
+    hi = p + rng.integers(0, 3, n)
+    lo = p - rng.integers(0, 3, n)
+    atr = rng.uniform(1, 6, n)
+
+    labels = compute_forward_labels(p, horizons=(3, 10), atr=atr, barrier_mults=(1.0, 1.5),
+                                    highs=hi, lows=lo, chunk_size=64)
+    for h in (3, 10):
+        for k in (1.0, 1.5):
+            ret, mfe, mae, bar = _naive(p, hi, lo, atr, h, k)
+            np.testing.assert_allclose(labels[f"fwd_ret_{h}"], ret, equal_nan=True)
+            np.testing.assert_allclose(labels[f"mfe_{h}"], mfe, equal_nan=True)
+            np.testing.assert_allclose(labels[f"mae_{h}"], mae, equal_nan=True)
+            np.testing.assert_array_equal(labels[f"barrier_{k:g}atr_{h}"], bar)
+
+
+def test_attach_future_return_to_ticks():
+    ticks = [{"price": 100.0 + i, "volume": 1, "atr": None} for i in range(20)]
+    attach_forward_labels(ticks, horizons=(1, 5), target_horizon=1)
+    assert ticks[0]["future_return"] == 101.0 / 100.0 - 1.0
+    assert math.isnan(ticks[-1]["future_return"])
+    assert "barrier_2atr_5" in ticks[0]
@@ -0,0 +1,47 @@
+# test_incremental_indicators.py
+
+from datetime import datetime, timedelta
+import numpy as np
+import polars as pl
+from strategy_v4.pipeline.polars_indicator_utils import compute_polars_indicators, IncrementalIndicators
+
+COLUMNS = ["rsi", "ema_fast", "ema_slow", "macd", "macd_signal", "macd_hist",
+           "kd_k", "kd_d", "atr", "bband_upper", "bband_middle", "bband_lower"]
+
+
+def _kbars(n: int = 300) -> pl.DataFrame:
+    rng = np.random.default_rng(1)
+    close = 17000 + np.cumsum(rng.normal(0, 5, n))
+    start = datetime(2025, 11, 3, 8, 45)
+    return pl.DataFrame({
+        "datetime": [start + timedelta(minutes=i) for i in range(n)],
+        "open": close,
+        "high": close + rng.uniform(0, 4, n),
+        "low": close - rng.uniform(0, 4, n),
+        "close": close,
+    })
+
+
+def test_incremental_matches_full_recompute():
+    df = _kbars()
+    full = compute_polars_indicators(df)
+
+    state = IncrementalIndicators()
+    state.update(df.head(120))
+    for end in range(121, df.height + 1, 7):
+        state.update(df.head(end))       # 模擬每分鐘刷新：只有新 K 棒被計算
+    inc = state.update(df)
+
+    assert inc.height == full.height
+    assert inc.columns == full.columns
+    for col in COLUMNS:
+        np.testing.assert_allclose(inc[col].to_numpy(), full[col].to_numpy(), rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert inc["bband_signal"].to_list() == full["bband_signal"].to_list()
+
+
+def test_no_new_rows_is_noop():
+    df = _kbars(60)
+    state = IncrementalIndicators(max_rows=50)
+    first = state.update(df)
+    assert state.update(df) is first
+    assert first.height == 50 and state.count == 60
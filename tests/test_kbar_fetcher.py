@@ -0,0 +1,71 @@
+# test_kbar_fetcher.py
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.io.KbarFetcher import KbarFetcher, KbarSource, ShioajiKbarSource, RateLimiter
+
+
+class FakeKbarsApi:
+    """模擬 Shioaji api.kbars：回傳日曆區間內的日盤與夜盤 1 分 K"""
+
+    def __init__(self):
+        self.calls = []
+
+    def kbars(self, contract, start, end):
+        self.calls.append((start, end))
+        d, last = date.fromisoformat(start), date.fromisoformat(end)
+        ts = []
+        while d <= last:
+            if d.weekday() < 5:
+                day = datetime(d.year, d.month, d.day, 8, 45)
+                night = datetime(d.year, d.month, d.day, 15, 0)
+                ts += [day + timedelta(minutes=i) for i in range(3)]
+                ts += [night + timedelta(minutes=i) for i in range(2)]
+            d += timedelta(days=1)
+        ns = [int((t - datetime(1970, 1, 1)).total_seconds()) * 10**9 for t in ts]
+        n = len(ns)
+        return {"ts": ns, "Open": [1.0] * n, "High": [2.0] * n, "Low": [0.5] * n,
+                "Close": [1.5] * n, "Volume": [1] * n, "Amount": [1.5] * n}
+
+
+def test_sync_fetches_only_missing_and_open_days(tmp_path):
+    api = FakeKbarsApi()
+    store = KbarStore(root=tmp_path)
+    fetcher = KbarFetcher(ShioajiKbarSource(api, {"TMFR1": object()}), store,
+                          max_workers=2, rate=100, chunk_days=3, holidays={date(2025, 11, 5)})
+
+    now = datetime(2025, 11, 12, 10, 0)  # 週三盤中
+    first = fetcher.sync("TMFR1", date(2025, 11, 3), now=now)
+    assert first["failed"] == []
+    # 11/3~11/12 共 8 個交易日（扣除 11/5 休市），分段 3 天
+    assert first["ranges"] == [(date(2025, 11, 3), date(2025, 11, 6)), (date(2025, 11, 7), date(2025, 11, 11)),
+                               (date(2025, 11, 12), date(2025, 11, 12))]
+    assert store.dates("TMFR1")[-1] == date(2025, 11, 12)
+    # 週一交易日包含週五夜盤
+    monday = store.read("TMFR1", start=date(2025, 11, 10), end=date(2025, 11, 10))
+    assert monday["datetime"][0] == datetime(2025, 11, 7, 15, 0)
+
+    # 再次同步：只重抓盤中交易日
+    api.calls.clear()
+    second = fetcher.sync("TMFR1", date(2025, 11, 3), now=now + timedelta(minutes=1))
+    assert second["ranges"] == [(date(2025, 11, 12), date(2025, 11, 12))]
+    assert len(api.calls) == 1
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=2, per=0.2)
+    t0 = datetime.now()
+    for _ in range(4):
+        limiter.acquire()
+    assert (datetime.now() - t0).total_seconds() >= 0.15
+
+
+def test_incomplete_source_fails_at_construction():
+    class NoFetch(KbarSource):
+        pass
+
+    with pytest.raises(TypeError):
+        NoFetch()
@@ -0,0 +1,52 @@
+# test_kbar_store.py
+
+from datetime import date, datetime, timedelta
+import polars as pl
+from strategy_v4.io.KbarStore import KbarStore
+from strategy_v4.pipeline.DataPipeline import DataPipeline
+
+
+def _bars(start: datetime, n: int, base: float = 17000.0) -> pl.DataFrame:
+    return pl.DataFrame({
+        "ts": [start + timedelta(minutes=i) for i in range(n)],
+        "Open": [base + i for i in range(n)],
+        "High": [base + i + 1 for i in range(n)],
+        "Low": [base + i - 1 for i in range(n)],
+        "Close": [base + i for i in range(n)],
+        "Volume": [1] * n,
+    })
+
+
+def test_partition_by_trading_date_and_idempotent_upsert(tmp_path):
+    store = KbarStore(root=tmp_path)
+    # 週五夜盤 → 週一交易日；週一日盤 → 週一
+    friday_night = _bars(datetime(2025, 11, 7, 15, 0), 30)
+    monday_day = _bars(datetime(2025, 11, 10, 8, 45), 30)
+    touched = store.upsert(pl.concat([friday_night, monday_day]), "TMFR1")
+    assert touched == [date(2025, 11, 10)]
+
+    thursday = _bars(datetime(2025, 11, 6, 8, 45), 10)
+    assert store.upsert(thursday, "TMFR1") == [date(2025, 11, 6)]
+    assert store.dates("TMFR1") == [date(2025, 11, 6), date(2025, 11, 10)]
+
+    # 重疊資料 upsert：筆數不變，新值覆蓋
+    store.upsert(monday_day.with_columns(pl.col("Close") + 5), "TMFR1")
+    store.upsert(monday_day.with_columns(pl.col("Close") + 5), "TMFR1")
+    df = store.read("TMFR1", start=date(2025, 11, 10))
+    assert df.height == 60
+    assert df["datetime"].is_sorted()
+    assert df.schema["datetime"] == pl.Datetime("us") and df.schema["volume"] == pl.Int64
+    assert df.filter(pl.col("datetime") == datetime(2025, 11, 10, 8, 45))["close"][0] == 17005.0
+
+    # manifest 重新載入後一致
+    reloaded = KbarStore(root=tmp_path)
+    assert reloaded.partition_info("TMFR1", "1m", date(2025, 11, 10))["rows"] == 60
+
+
+def test_pipeline_scan_store_by_calendar_range(tmp_path):
+    store = KbarStore(root=tmp_path)
+    store.upsert(_bars(datetime(2025, 11, 6, 8, 45), 10), "TMFR1")
+    store.upsert(_bars(datetime(2025, 11, 7, 15, 0), 30), "TMFR1")
+    lf = DataPipeline().scan_store(store, "TMFR1", start="2025-11-07", end="2025-11-07", columns=["datetime", "close"])
+    df = lf.collect()
+    assert df.height == 30 and df.columns == ["datetime", "close"]
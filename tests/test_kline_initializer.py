@@ -0,0 +1,92 @@
+# test_kline_initializer.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from strategy_v4.KlineInitializer import KlineInitializer
+
+CSV = "Date,Open,High,Low,Close,Adj Close,Volume\n2025-11-03,100,105,99,104,104,1000\n2025-11-04,104,106,101,null,102,900\n2025-11-05,102,103,98,99,99,1200\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    hits = []
+    fail_once = set()
+    lock = threading.Lock()
+    active = 0
+    max_active = 0   # 同時處理中的請求數高水位
+
+    def do_GET(self):
+        symbol = self.path.split("?")[0].rsplit("/", 1)[-1]
+        cls = type(self)
+        with self.lock:
+            self.hits.append(symbol)
+            fail = symbol in self.fail_once
+            self.fail_once.discard(symbol)
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.1)
+        with self.lock:
+            cls.active -= 1
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = CSV.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    StubHandler.hits = []
+    StubHandler.active = StubHandler.max_active = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_fetch_many_parallel_with_disk_cache(tmp_path):
+    server, url = _server()
+    try:
+        StubHandler.fail_once = {"S3"}
+        kline = KlineInitializer(base_url=url, cache_dir=tmp_path, backoff=0, max_workers=8)
+        symbols = [f"S{i}" for i in range(8)]
+        result = kline.fetch_many((s, "2025-11-01", "2025-11-06") for s in symbols)
+        assert StubHandler.max_active >= 2  # 請求確實重疊（循序抓取時最多 1 個）
+        rows = result[("S0", "2025-11-01", "2025-11-06")]
+        assert [r["close"] for r in rows] == [104.0, 99.0]  # null 列被剔除
+        assert len(result[("S3", "2025-11-01", "2025-11-06")]) == 2  # 503 後重試成功
+        assert StubHandler.hits.count("S3") == 2
+
+        # 新行程（新實例）直接讀磁碟快取
+        StubHandler.hits.clear()
+        again = KlineInitializer(base_url=url, cache_dir=tmp_path)
+        assert again.fetch("S0", "2025-11-01", "2025-11-06") == rows
+        assert StubHandler.hits == []
+
+        # 快取驗證失敗（筆數不符）→ 重新抓取
+        meta = next(p for p in tmp_path.glob("*.json")
+                    if json.loads(p.read_text())["params"][1] == "S1")
+        info = json.loads(meta.read_text())
+        info["rows"] = 99
+        meta.write_text(json.dumps(info))
+        KlineInitializer(base_url=url, cache_dir=tmp_path).fetch("S1", "2025-11-01", "2025-11-06")
+        assert StubHandler.hits == ["S1"]
+    finally:
+        server.shutdown()
+
+
+def test_ttl_expiry_refetches_open_range(tmp_path):
+    server, url = _server()
+    try:
+        end = time.strftime("%Y-%m-%d")
+        KlineInitializer(base_url=url, cache_dir=tmp_path, ttl=0).fetch("X", "2025-11-01", end)
+        KlineInitializer(base_url=url, cache_dir=tmp_path, ttl=0).fetch("X", "2025-11-01", end)
+        assert StubHandler.hits == ["X", "X"]
+    finally:
+        server.shutdown()
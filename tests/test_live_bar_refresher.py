@@ -0,0 +1,147 @@
+# test_live_bar_refresher.py
+
+import math
+from datetime import datetime, timedelta
+
+import polars as pl
+import pytest
+
+from strategy_v4.engines.LiveBarRefresher import LiveBarRefresher
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.TradeLogger import TradeLogger
+
+START = datetime(2025, 11, 3, 8, 45)
+
+
+def make_bars(n=200):
+    closes = [20000 + 30 * math.sin(i / 7) + i * 0.5 for i in range(n)]
+    return pl.DataFrame({
+        "datetime": [START + timedelta(minutes=i) for i in range(n)],
+        "open": closes,
+        "high": [c + 3 for c in closes],
+        "low": [c - 3 for c in closes],
+        "close": closes,
+        "volume": [10.0 + i % 5 for i in range(n)],
+    })
+
+
+def bar_ticks(bars: pl.DataFrame):
+    """每根 K 棒展開成 O / H / L / C 四筆 tick（volume 集中在收盤價）"""
+    for bar in bars.iter_rows(named=True):
+        t = bar["datetime"]
+        yield bar["open"], 0.0, t
+        yield bar["high"], 0.0, t + timedelta(seconds=10)
+        yield bar["low"], 0.0, t + timedelta(seconds=20)
+        yield bar["close"], bar["volume"], t + timedelta(seconds=50)
+
+
+def test_ticks_finalize_bars_in_background():
+    bars = make_bars()
+    live = LiveBarRefresher(async_=True)
+    for price, volume, ts in bar_ticks(bars):
+        live.on_tick(price, volume, ts)
+    live.flush()
+
+    # 最後一根尚未收盤（等待下一分鐘的 tick）
+    assert live.forming["datetime"] == bars["datetime"][-1]
+    assert live.closed_bars == bars.height - 1
+
+    batch = LiveBarRefresher()
+    expected = batch.reset(bars.head(bars.height - 1))
+    assert live.snapshot.bar_time == expected.bar_time
+    assert dict(live.snapshot.values) == pytest.approx(dict(expected.values))
+    live.close()
+
+
+def test_snapshot_is_immutable_and_swapped():
+    bars = make_bars()
+    live = LiveBarRefresher()
+    first = live.reset(bars.head(150))
+    with pytest.raises(TypeError):
+        first.values["rsi"] = 0.0
+    with pytest.raises(AttributeError):
+        first.version = 99
+
+    second = live.update(bars)
+    assert live.snapshot is second and second is not first
+    assert second.version == first.version + 1
+    assert first.bar_time == bars["datetime"][149]
+
+
+def test_tick_engine_reads_refreshed_snapshot(tmp_path):
+    bars = make_bars()
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"))
+    engine.warm_start(bars.head(150), n=150)
+
+    for price, volume, ts in bar_ticks(bars.slice(150, 11)):
+        engine.on_tick({"price": price, "volume": volume, "timestamp": ts})
+    engine.bar_refresher.flush()
+
+    full = LiveBarRefresher()
+    expected = full.reset(bars.head(160))
+    assert engine.bar_refresher.snapshot.bar_time == bars["datetime"][159]
+    assert engine.bar_indicators == pytest.approx(dict(expected.values))
+
+    tick = {"price": 20100.0, "volume": 1.0, "timestamp": bars["datetime"][160] + timedelta(seconds=55)}
+    engine.on_tick(tick)
+    assert tick["rsi"] == engine.bar_indicators["rsi"]
+    engine.bar_refresher.close()
+
+
+def run_engine(tmp_path, bars, name):
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / f"{name}.csv"))
+    engine.warm_start(bars.head(60), n=60)
+    seen = []
+    for price, volume, ts in bar_ticks(bars.slice(60, 40)):
+        tick = {"price": price, "volume": volume, "timestamp": ts}
+        engine.on_tick(tick)
+        seen.append((tick.get("rsi"), tick.get("atr"), tick.get("macd_hist")))
+    return engine, seen
+
+
+def test_tick_engine_bar_indicators_are_deterministic(tmp_path):
+    bars = make_bars(100)
+    first, seen_a = run_engine(tmp_path, bars, "a")
+    _, seen_b = run_engine(tmp_path, bars, "b")
+    assert seen_a == seen_b
+
+    # 預設同步計算：跨分鐘後的第一個 tick 即取得剛收盤 K 棒的指標
+    expected = LiveBarRefresher().reset(bars.head(99))
+    assert first.bar_refresher._executor is None
+    assert seen_a[-4] == pytest.approx((expected.values["rsi"], expected.values["atr"], expected.values["macd_hist"]))
+
+
+def test_export_state_does_not_wait_for_worker():
+    import threading
+
+    bars = make_bars(80)
+    live = LiveBarRefresher(async_=True)
+    live.reset(bars.head(60))
+    ticks = list(bar_ticks(bars.tail(20)))
+
+    live._lock.acquire()            # worker 計算中（卡在取得 _lock）
+    try:
+        for price, volume, ts in ticks[:8]:
+            live.on_tick(price, volume, ts)
+        exported = {}
+        t = threading.Thread(target=lambda: exported.update(live.export_state()))
+        t.start()
+        t.join(2)
+        assert not t.is_alive()     # 匯出不等待背景計算
+    finally:
+        live._lock.release()
+    live.flush()
+    assert [b["datetime"] for b in exported["pending"]] == [bars["datetime"][60].isoformat()]
+
+    # 由匯出的狀態還原：補算 pending 後與原本的結果相同，之後的 K 棒也一致
+    restored = LiveBarRefresher()
+    restored.load_state(exported)
+    assert restored.snapshot.bar_time == live.snapshot.bar_time
+    assert dict(restored.values) == dict(live.values)
+    for price, volume, ts in ticks[8:]:
+        live.on_tick(price, volume, ts)
+        restored.on_tick(price, volume, ts)
+    live.flush()
+    assert dict(restored.values) == dict(live.values) and restored.closed_bars > 0
+    live.close()
@@ -0,0 +1,103 @@
+# test_live_runtime.py
+
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+from strategy_v4.LiveRuntime import LiveRuntime
+from strategy_v4.io.MarketData import ReplayAdapter
+
+
+class FakeEngine:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prices = []
+        self.threads = set()
+        self.bars = []
+        self.volume = 0.0
+
+    def on_tick(self, tick):
+        self.threads.add(threading.get_ident())
+        if self.delay:
+            time.sleep(self.delay)
+        self.prices.append(tick["price"])
+        self.volume += tick.get("volume", 0)
+
+    def update_bars(self, bars):
+        self.bars.append(bars)
+
+
+def run_in_thread(runtime):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(stats=runtime.start()))
+    thread.start()
+    assert runtime.wait_ready(5)
+    return thread, result
+
+
+def test_feed_is_handed_off_and_drained_on_stop():
+    engine = FakeEngine(delay=0.001)
+    runtime = LiveRuntime(engine, {"health_interval": 60})
+    thread, result = run_in_thread(runtime)
+
+    t0 = time.perf_counter()
+    for i in range(200):
+        runtime.feed({"price": float(i)})
+    feed_cost = (time.perf_counter() - t0) / 200
+    runtime.stop()
+    thread.join(5)
+
+    assert engine.prices == [float(i) for i in range(200)]     # 依序、全部消化後才停止
+    assert engine.threads and threading.get_ident() not in engine.threads
+    assert len(engine.threads) == 1                              # 單一消費者
+    assert feed_cost < 0.001                                     # callback 不等待策略計算
+    assert result["stats"]["processed"] == 200 and result["stats"]["dropped"] == 0
+
+
+def test_bounded_queue_drops_and_background_tasks():
+    engine = FakeEngine(delay=0.01)
+    hooks = []
+    runtime = LiveRuntime(engine, {"queue_size": 5, "bar_interval": 0.01, "health_interval": 60},
+                          bar_source=lambda: [{"close": 1.0}])
+    runtime.on_shutdown(lambda: hooks.append("done"))
+    thread, result = run_in_thread(runtime)
+    for i in range(50):
+        runtime.feed({"price": float(i)})
+    time.sleep(0.3)
+    runtime.stop()
+    thread.join(5)
+
+    stats = result["stats"]
+    assert stats["received"] == 50
+    assert stats["dropped"] > 0 and stats["processed"] + stats["dropped"] == 50
+    assert engine.bars and hooks == ["done"]
+
+
+def test_coalesce_policy_keeps_latest_price_and_total_volume():
+    engine = FakeEngine(delay=0.005)
+    runtime = LiveRuntime(engine, {"ingest": {"policy": "coalesce"}, "health_interval": 60})
+    thread, result = run_in_thread(runtime)
+    for i in range(200):
+        runtime.feed({"price": float(i), "volume": 1})
+    runtime.stop()
+    thread.join(5)
+
+    stats = result["stats"]
+    assert engine.prices[-1] == 199.0 and engine.volume == 200
+    assert stats["processed"] < 200 and stats["processed"] + stats["coalesced"] == 200
+
+
+def test_blocking_feed_replays_without_drops():
+    engine = FakeEngine(delay=0.0001)
+    runtime = LiveRuntime(engine, {"queue_size": 16, "health_interval": 60})
+    t0 = datetime(2025, 11, 3, 9, 0)
+    ticks = [{"price": float(i), "volume": 1, "timestamp": t0 + timedelta(milliseconds=i)} for i in range(3000)]
+    adapter = ReplayAdapter(ticks, speed=None)
+    adapter.subscribe([], partial(runtime.feed, block=True))
+    runtime.on_start(lambda: adapter.start(on_done=runtime.stop))
+    stats = runtime.start()
+
+    assert engine.prices == [float(i) for i in range(3000)]
+    assert stats["received"] == stats["processed"] == 3000
+    assert stats["dropped"] == 0 and stats["max_depth"] <= 16
@@ -0,0 +1,81 @@
+# test_market_data.py
+
+import math
+import time
+from datetime import datetime, timedelta
+
+import polars as pl
+import pytest
+
+from strategy_v4.StrategyLoop import StrategyLoop
+from strategy_v4.io.MarketData import MarketDataAdapter, ReplayAdapter
+from strategy_v4.io.TradeLogger import TradeLogger
+
+T0 = datetime(2025, 11, 3, 9, 0)
+
+
+def make_ticks(n, step=1.0):
+    return [{"price": 20000 + 10 * math.sin(i / 5), "volume": 1, "timestamp": T0 + timedelta(seconds=i * step)}
+            for i in range(n)]
+
+
+def test_replay_ticks_at_max_speed():
+    got = []
+    adapter = ReplayAdapter(make_ticks(500), speed=None, code="TMFR1")
+    adapter.subscribe(["TMFR1"], got.append)
+    assert adapter.run() == 500
+    assert [t["timestamp"] for t in got] == sorted(t["timestamp"] for t in got)
+    assert got[0]["code"] == "TMFR1" and got[0]["timestamp"] == T0
+
+
+def test_replay_kbars_expand_to_ticks(tmp_path):
+    bars = pl.DataFrame({
+        "datetime": [T0, T0 + timedelta(minutes=1)],
+        "open": [100.0, 105.0], "high": [106.0, 107.0], "low": [99.0, 101.0], "close": [105.0, 102.0],
+        "volume": [8, 4],
+    })
+    path = tmp_path / "bars.parquet"
+    bars.write_parquet(path)
+
+    got = []
+    adapter = ReplayAdapter(path, speed=None)
+    adapter.subscribe([], got.append)
+    adapter.run()
+    assert [t["price"] for t in got] == [100.0, 99.0, 106.0, 105.0, 105.0, 107.0, 101.0, 102.0]
+    assert sum(t["volume"] for t in got) == 12
+    assert got[-1]["timestamp"] == T0 + timedelta(minutes=1, seconds=59)
+
+
+def test_replay_scaled_pacing():
+    got = []
+    adapter = ReplayAdapter(make_ticks(3, step=1.0), speed=10)
+    adapter.subscribe([], got.append)
+    t0 = time.perf_counter()
+    adapter.start()
+    adapter.join(5)
+    assert len(got) == 3
+    assert 0.15 < time.perf_counter() - t0 < 1.0   # 2 秒的錄製資料以 10 倍速約 0.2 秒
+
+
+def test_strategy_loop_runs_live_stack_offline(tmp_path):
+    loop = StrategyLoop(code="TMFR1", trade_logger=TradeLogger(tmp_path / "trade_log.csv"),
+                        config={"runtime": {"health_interval": 60}})
+    stats = loop.simulate_ticks(make_ticks(300))
+    assert stats["processed"] == 300 and stats["errors"] == 0
+    assert not loop.state.in_position
+
+
+def test_max_speed_replay_applies_backpressure(tmp_path):
+    loop = StrategyLoop(code="TMFR1", trade_logger=TradeLogger(tmp_path / "trade_log.csv"),
+                        config={"runtime": {"health_interval": 60, "queue_size": 16}})
+    stats = loop.simulate_ticks(make_ticks(200))
+    assert stats["received"] == stats["processed"] == 200
+    assert stats["dropped"] == 0 and stats["max_depth"] <= 16
+
+
+def test_incomplete_adapter_fails_at_construction():
+    class NoSubscribe(MarketDataAdapter):
+        pass
+
+    with pytest.raises(TypeError):
+        NoSubscribe()
@@ -0,0 +1,98 @@
+# test_pipeline_runner.py
+
+import threading
+import time
+from strategy_v4.pipeline.PipelineRunner import PipelineRunner, Step
+
+
+class FakeRunner(PipelineRunner):
+    """以函式取代子行程：每步把輸入串接寫到輸出"""
+
+    def __init__(self, *args, fail=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.fail = set(fail)
+        self.active = 0
+        self.max_active = 0
+        self._count_lock = threading.Lock()
+
+    def _execute(self, step):
+        with self._count_lock:
+            self.calls.append(step.name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        if step.name in self.fail:
+            code = 1
+        else:
+            text = "".join((self.base_dir / i).read_text() for i in step.inputs) + step.name
+            for out in step.outputs:
+                (self.base_dir / out).write_text(text)
+            code = 0
+        with self._count_lock:
+            self.active -= 1
+        return code, 0.05, ""
+
+
+def _steps():
+    return [
+        Step("source", "strategy_v4.event_summary", inputs=["raw.txt"], outputs=["a.txt"]),
+        Step("left", "strategy_v4.event_summary", inputs=["a.txt"], outputs=["b.txt"], deps=["source"]),
+        Step("right", "strategy_v4.event_summary", inputs=["a.txt"], outputs=["c.txt"], deps=["source"]),
+        Step("join", "strategy_v4.event_summary", inputs=["b.txt", "c.txt"], outputs=["d.txt"], deps=["left", "right"]),
+    ]
+
+
+def test_runs_dag_and_skips_up_to_date_steps(tmp_path):
+    (tmp_path / "raw.txt").write_text("x")
+    runner = FakeRunner(_steps(), base_dir=tmp_path)
+    results = runner.run()
+    assert all(r["status"] == "ok" for r in results.values())
+    assert runner.calls[0] == "source" and runner.calls[-1] == "join"
+    assert runner.max_active == 2  # left / right 平行
+
+    # 無變動：全部跳過（狀態檔重新載入）
+    again = FakeRunner(_steps(), base_dir=tmp_path)
+    assert {r["status"] for r in again.run().values()} == {"skipped"}
+    assert again.calls == []
+
+    # 只刪掉一個輸出 → 只重跑該步；內容相同所以下游不受影響
+    (tmp_path / "c.txt").unlink()
+    third = FakeRunner(_steps(), base_dir=tmp_path)
+    third.run()
+    assert third.calls == ["right"]
+
+    # 原始輸入變動 → 整條鏈重跑
+    (tmp_path / "raw.txt").write_text("y")
+    fourth = FakeRunner(_steps(), base_dir=tmp_path)
+    fourth.run()
+    assert sorted(fourth.calls) == ["join", "left", "right", "source"]
+
+
+def test_failed_step_blocks_downstream(tmp_path):
+    (tmp_path / "raw.txt").write_text("x")
+    runner = FakeRunner(_steps(), base_dir=tmp_path, fail={"left"})
+    results = runner.run()
+    assert results["left"]["status"] == "failed"
+    assert results["join"]["status"] == "blocked"
+    assert results["right"]["status"] == "ok"
+
+
+def test_kbar_manifest_resolved_outside_base_dir(tmp_path):
+    from strategy_v4.io.KbarStore import KbarStore
+    from strategy_v4.pipeline.PipelineRunner import DEFAULT_STEPS, KBAR_MANIFEST
+
+    steps = {s.name: s for s in DEFAULT_STEPS}
+    assert KBAR_MANIFEST in steps["kbars"].outputs and KBAR_MANIFEST in steps["merge"].inputs
+    assert PipelineRunner(base_dir=tmp_path).base_dir / KBAR_MANIFEST == KbarStore().manifest_path.resolve()
+
+    # 絕對路徑的輸出存在時，任意 base_dir 下都視為已完成
+    outside = tmp_path / "store" / "manifest.json"
+    outside.parent.mkdir()
+    step = [Step("kbars", "strategy_v4.event_summary", inputs=["raw.txt"], outputs=[str(outside)])]
+    base = tmp_path / "run"
+    base.mkdir()
+    (base / "raw.txt").write_text("x")
+    assert FakeRunner(step, base_dir=base).run()["kbars"]["status"] == "ok"
+    again = FakeRunner(step, base_dir=base)
+    assert again.run()["kbars"]["status"] == "skipped" and again.calls == []
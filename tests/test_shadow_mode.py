@@ -0,0 +1,81 @@
+# test_shadow_mode.py
+
+import csv
+import math
+from datetime import datetime, timedelta
+
+from strategy_v4.engines.DecisionEngine import DecisionEngine
+from strategy_v4.engines.DecisionEngine_v2 import DecisionEngineV2
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.ShadowLogger import ShadowLogger
+from strategy_v4.io.TradeLogger import TradeLogger
+
+T0 = datetime(2025, 11, 3, 9, 0)
+WEIGHTS_B = {"rsi": 0.3, "macd": 0.1, "ema5": 0.2, "ema20": -0.1, "volume": 0.1}
+CONFIG = {"risk": {"max_ticks": 15}, "decision": {"entry_threshold": -1e9, "bias_prob_threshold": 0.0}}  # 主引擎必定進場
+
+
+def make_ticks(n=120):
+    return [{"price": 20000 + 25 * math.sin(i / 6) + (i % 4), "volume": 1 + i % 3,
+             "timestamp": T0 + timedelta(seconds=i)} for i in range(n)]
+
+
+def standalone(tmp_path, name, mode, decision_engine):
+    """以 shadow 的決策引擎獨立跑同一串 tick，記錄每筆評估結果"""
+    engine = TickEngine(state=StrategyState(config=CONFIG), trade_logger=TradeLogger(tmp_path / f"{name}.csv"),
+                        mode=mode, config=CONFIG)
+    if isinstance(decision_engine, DecisionEngine):
+        decision_engine.tick_tracker = engine.tick_tracker
+    engine.decision_engine = decision_engine
+    seen = []
+    for tick in make_ticks():
+        engine.on_tick(tick)
+        if mode == "regression_based":
+            seen.append((tick["bias"], round(tick["bias_prob"], 4), round(tick["entry_score_v2"], 4),
+                         round(tick["exit_score_v2"], 4)))
+        else:
+            seen.append((tick["bias"], "", round(tick["entry_score"], 4), round(tick["exit_score"], 4)))
+    return seen
+
+
+def run_primary(tmp_path, name, shadows: bool):
+    shadow_logger = ShadowLogger(tmp_path / f"{name}_shadow.csv", buffer_size=10)
+    engine = TickEngine(state=StrategyState(config=CONFIG), trade_logger=TradeLogger(tmp_path / f"{name}.csv"),
+                        mode="regression_based", config=CONFIG, shadow_logger=shadow_logger if shadows else None)
+    if shadows:
+        engine.add_shadow_weights("B", WEIGHTS_B, params_version="v-b")
+        engine.add_shadow("bull", DecisionEngine(market_bias="bullish"), params_version="v3-bull")
+    events = [engine.on_tick(tick) for tick in make_ticks()]
+    if shadows:
+        shadow_logger.force_flush()
+    return engine, events
+
+
+def test_shadow_signals_match_standalone_and_stay_out_of_trading(tmp_path):
+    engine, events = run_primary(tmp_path, "primary", shadows=True)
+    with (tmp_path / "primary_shadow.csv").open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 2 * 120
+    by_name = {name: [r for r in rows if r["shadow"] == name] for name in ("B", "bull")}
+
+    # 與獨立執行的引擎結果相同
+    expected_b = standalone(tmp_path, "b", "regression_based",
+                            DecisionEngineV2(weights=WEIGHTS_B, config=CONFIG["decision"]))
+    expected_bull = standalone(tmp_path, "bull", "rule_based", DecisionEngine(market_bias="bullish"))
+    for name, expected, mode, version in (("B", expected_b, "v4", "v-b"), ("bull", expected_bull, "v3", "v3-bull")):
+        got = [(r["bias"], "" if r["bias_prob"] == "" else float(r["bias_prob"]),
+                float(r["entry_score"]), float(r["exit_score"])) for r in by_name[name]]
+        assert got == expected
+        assert {(r["mode"], r["params_version"]) for r in by_name[name]} == {(mode, version)}
+
+    # 主引擎的交易紀錄與持倉不受 shadow 影響
+    baseline, baseline_events = run_primary(tmp_path, "baseline", shadows=False)
+    assert events == baseline_events
+    status, baseline_status = engine.state.get_status(), baseline.state.get_status()
+    status.pop("entry_time"), baseline_status.pop("entry_time")   # 進場時間為 datetime.now()
+    assert status == baseline_status
+    with (tmp_path / "primary.csv").open(newline="", encoding="utf-8") as f:
+        trades = list(csv.DictReader(f))
+    assert "ENTER" in events and len(trades) == engine.logger.rows == baseline.logger.rows
+    assert {(t["mode"], t["params_version"]) for t in trades} == {(engine.state.mode, engine.state.params_version)}
@@ -0,0 +1,64 @@
+# test_signal_bus.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.SignalBus import SignalBus, SignalBusReader
+from strategy_v4.io.TradeLogger import TradeLogger
+
+T0 = datetime(2025, 11, 3, 9, 0)
+
+
+def publish(bus, n, start=0):
+    for i in range(start, start + n):
+        bus.publish(T0 + timedelta(seconds=i), 20000.0 + i, 1.0,
+                    {"bias": "bullish", "entry_score": 0.5, "mode": "v3"}, {"rsi": 50.0 + i, "atr": 3.0})
+
+
+def test_ring_buffer_wraps_and_reports_lost(tmp_path):
+    bus = SignalBus(tmp_path / "bus.bin", capacity=8, features=["atr", "rsi"])
+    reader = SignalBusReader(tmp_path / "bus.bin")
+    publish(bus, 5)
+
+    records, since, lost = reader.read(0)
+    assert (since, lost) == (5, 0)
+    assert records["price"].tolist() == [20000.0 + i for i in range(5)]
+
+    publish(bus, 15, start=5)
+    records, since, lost = reader.read(since)
+    assert (since, lost) == (20, 7)
+    assert records["price"].tolist() == [20000.0 + i for i in range(12, 20)]
+
+    row = reader.to_dicts(records[-1:])[0]
+    assert row["rsi"] == 69.0 and row["bias"] == 1 and row["timestamp"] == T0 + timedelta(seconds=19)
+    bus.close()
+
+
+def test_reader_skips_record_being_written(tmp_path):
+    bus = SignalBus(tmp_path / "bus.bin", capacity=8, features=["rsi"])
+    publish(bus, 3)
+    bus._seq[1] = 2 * 1 + 1  # 模擬寫入中（奇數序號）
+
+    reader = SignalBusReader(tmp_path / "bus.bin")
+    records, since, lost = reader.read(0)
+    assert records["price"].tolist() == [20000.0, 20002.0]
+    assert (since, lost) == (3, 1)
+
+
+def test_tick_engine_publishes_every_tick(tmp_path):
+    bus = SignalBus(tmp_path / "bus.bin", capacity=64)
+    engine = TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"), signal_bus=bus)
+    prices = [20000 + 5 * np.sin(i / 3) for i in range(40)]
+    for i, price in enumerate(prices):
+        engine.on_tick({"price": price, "volume": 1, "timestamp": T0 + timedelta(seconds=i)})
+
+    reader = SignalBusReader(tmp_path / "bus.bin")
+    assert "rsi" in reader.features and "rsi_1m" in reader.features
+    records, since, _ = reader.read(0)
+    assert since == len(prices)
+    assert np.allclose(records["price"], prices)
+    assert records["features"].shape == (len(prices), len(reader.features))
+    assert (records["in_position"][-1] == 1) == engine.state.in_position
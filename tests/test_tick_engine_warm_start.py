@@ -0,0 +1,102 @@
+# test_tick_engine_warm_start.py
+
+import math
+from datetime import datetime, timedelta
+
+import polars as pl
+
+from strategy_v4.engines.StrategyState import StrategyState
+from strategy_v4.engines.TickEngine import TickEngine
+from strategy_v4.io.TradeLogger import TradeLogger
+
+
+def make_bars(n=400):
+    start = datetime(2025, 11, 3, 8, 45)
+    closes = [20000 + 30 * math.sin(i / 7) + i * 0.5 for i in range(n)]
+    return pl.DataFrame({
+        "datetime": [start + timedelta(minutes=i) for i in range(n)],
+        "open": closes,
+        "high": [c + 3 for c in closes],
+        "low": [c - 3 for c in closes],
+        "close": closes,
+        "volume": [10 + i % 5 for i in range(n)],
+    })
+
+
+def make_engine(tmp_path):
+    return TickEngine(state=StrategyState(), trade_logger=TradeLogger(tmp_path / "trade_log.csv"))
+
+
+def test_warm_start_seeds_buffers(tmp_path):
+    engine = make_engine(tmp_path)
+    bars = make_bars()
+    assert engine.warm_start(bars, n=300) == 300
+
+    assert engine.close_prices == bars["close"].tail(300).to_list()
+    assert engine.tick_tracker.get_status()["count"] == engine.tick_tracker.window
+    assert engine.tick_tracker.get_status()["last_price"] == bars["close"][-1]
+
+    features = engine.multi_tf_engine.extract_features()
+    assert features["is_ready_1m"] and features["is_ready_5m"] and features["is_ready_15m"]
+    assert len(engine.multi_tf_engine.close_15m) >= 20
+
+    for key in ("rsi", "macd", "kd_k", "kd_d", "atr"):
+        assert key in engine.bar_indicators
+
+
+def test_warm_start_matches_full_recompute(tmp_path):
+    bars = make_bars()
+    warm = make_engine(tmp_path)
+    warm.warm_start(bars.head(399), n=399)
+    warm.update_bars(bars)
+
+    full = make_engine(tmp_path)
+    full.warm_start(bars, n=400)
+    assert warm.bar_indicators == full.bar_indicators
+
+
+def test_bar_indicators_fill_ticks(tmp_path):
+    engine = make_engine(tmp_path)
+    engine.warm_start(make_bars().to_dicts())
+
+    tick = {"price": 20200.0, "volume": 1, "kd_k": 12.0}
+    engine.on_tick(tick)
+    assert tick["kd_k"] == 12.0  # tick 自帶的值不覆寫
+    assert tick["rsi"] == engine.bar_indicators["rsi"]
+
+
+def test_warm_start_from_pyramid(tmp_path):
+    from datetime import date
+
+    from strategy_v4.io.KbarStore import KbarStore
+    from strategy_v4.pipeline.BarPyramid import BarPyramid, aggregate
+    from strategy_v4.pipeline.polars_indicator_utils import IncrementalIndicators
+
+    store = KbarStore(root=tmp_path / "kbars")
+    history = pl.concat([make_bars(300).with_columns(pl.col("datetime") + timedelta(days=d)) for d in range(3)])
+    store.upsert(history.filter(pl.col("datetime").dt.date() < date(2025, 11, 5)), "TMFR1")
+    pyramid = BarPyramid(store, "TMFR1")
+    pyramid.build()
+
+    # 最後一天尚未建構：由 pyramid 狀態接續計算 == 完整歷史計算
+    engine = make_engine(tmp_path)
+    engine.warm_start(history, n=400, pyramid=pyramid)
+    full = IncrementalIndicators().update(history).row(-1, named=True)
+    for key, value in engine.bar_indicators.items():
+        assert value == round(full[key], 4), key
+    expected_5m = store.read("TMFR1", "5m")["close"].to_list() + aggregate(history.tail(300), 5)["close"].to_list()
+    assert engine.multi_tf_engine.close_5m == expected_5m
+
+    # 暖機狀態早於 bars（中間有缺口）→ 從頭計算
+    gap = make_engine(tmp_path)
+    gap.warm_start(history.tail(100).with_columns(pl.col("datetime") + timedelta(days=5)), pyramid=pyramid)
+    plain = make_engine(tmp_path)
+    plain.warm_start(history.tail(100).with_columns(pl.col("datetime") + timedelta(days=5)))
+    assert gap.bar_indicators == plain.bar_indicators
+
+    # 暖機狀態已涵蓋所有 bars：指標直接取自狀態
+    covered = make_engine(tmp_path)
+    covered.warm_start(history.head(500), n=200, pyramid=pyramid)
+    at_close = IncrementalIndicators().update(history.head(600)).row(-1, named=True)
+    assert covered.bar_indicators == {k: round(at_close[k], 4) for k in covered.bar_indicators}
+    assert set(covered.bar_indicators) == {"rsi", "macd", "macd_signal", "macd_hist", "kd_k", "kd_d", "atr"}
@@ -0,0 +1,60 @@
+# test_tick_ingestor.py
+
+import pytest
+
+from strategy_v4.io.TickIngestor import TickIngestor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_all_policy_keeps_every_tick_until_full():
+    ing = TickIngestor("all", maxsize=3)
+    assert [ing.put({"price": p}) for p in (1, 2, 3, 4)] == [True, True, True, False]
+    assert [ing.get()["price"] for _ in range(3)] == [1, 2, 3]
+    assert ing.get() is None
+    assert ing.stats["dropped"] == 1 and ing.stats["processed"] == 3
+
+
+def test_coalesce_merges_backlog_per_contract():
+    clock = FakeClock()
+    ing = TickIngestor("coalesce", clock=clock)
+    ing.put({"code": "TMF", "price": 100.0, "volume": 1})
+    clock.now = 0.1
+    ing.put({"code": "TMF", "price": 103.0, "volume": 2})
+    ing.put({"code": "TMF", "price": 99.0, "volume": 3})
+    ing.put({"code": "MXF", "price": 50.0, "volume": 1})
+    clock.now = 0.2
+
+    tick = ing.get()
+    assert tick["price"] == 99.0 and tick["volume"] == 6.0
+    assert (tick["high"], tick["low"], tick["coalesced"]) == (103.0, 99.0, 3)
+    assert ing.stats["last_age"] == pytest.approx(0.2)     # 以最早抵達時間計算等待
+    assert ing.get()["code"] == "MXF"
+    assert ing.stats["coalesced"] == 2 and ing.stats["received"] == 4
+
+
+def test_shed_drops_stale_ticks_but_keeps_latest():
+    clock = FakeClock()
+    ing = TickIngestor("shed", deadline=0.5, clock=clock)
+    for p in (1, 2, 3):
+        ing.put({"price": p})
+    clock.now = 1.0
+    ing.put({"price": 4})
+
+    assert ing.get()["price"] == 4
+    assert ing.stats["dropped"] == 3 and ing.stats["max_age"] == 0.0
+
+    ing.put({"price": 5})
+    clock.now = 5.0
+    assert ing.get()["price"] == 5   # 只剩一筆時即使過期仍處理
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        TickIngestor("latest")
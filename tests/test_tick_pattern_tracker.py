@@ -0,0 +1,82 @@
+# test_tick_pattern_tracker.py
+
+import random
+from collections import deque
+
+import pytest
+
+from strategy_v4.engines.TickPatternTracker import TickPatternTracker
+
+
+class NaiveTracker:
+    """舊版逐次重掃的參考實作"""
+
+    def __init__(self, window: int):
+        self.prices = deque(maxlen=window)
+        self.volumes = deque(maxlen=window)
+
+    def update(self, price, volume):
+        self.prices.append(price)
+        self.volumes.append(volume)
+
+    def status(self):
+        p = self.prices
+        if len(p) < 2:
+            momentum, prob, exit_score = 0.0, 0.5, 0.0
+        else:
+            momentum = 0.0 if p[0] == 0 else round(p[-1] / p[0] - 1.0, 3)
+            prob = round(sum(1 for i in range(1, len(p)) if p[i] > p[i-1]) / (len(p) - 1), 3)
+            diffs = [abs(p[i] - p[i-1]) for i in range(1, len(p))]
+            exit_score = round((sum(diffs) / len(diffs)) / (p[-1] if p[-1] != 0 else 1.0), 3)
+        avg_volume = round(sum(self.volumes) / len(self.volumes), 2) if self.volumes else 0.0
+        return momentum, prob, exit_score, avg_volume
+
+
+def test_incremental_matches_rescan():
+    rng = random.Random(3)
+    windows = [1, 10, 20, 50]
+    tracker = TickPatternTracker(window=20, windows=windows)
+    naive = {w: NaiveTracker(w) for w in windows}
+
+    price = 17000.0
+    for _ in range(1500):
+        price += rng.choice([-2, -1, 0, 0, 1, 2])
+        volume = float(rng.randint(0, 20))
+        tracker.update(price, volume)
+        for w, ref in naive.items():
+            ref.update(price, volume)
+            m, p, e, v = ref.status()
+            assert tracker.momentum(w) == m
+            assert tracker.bias_prob(w) == p
+            assert tracker.exit_score(w) == e
+            assert tracker.avg_volume(w) == v
+
+    status = tracker.get_status()
+    assert status["count"] == 20
+    assert status["last_price"] == price
+    assert tracker.prices == list(naive[20].prices)
+    assert set(tracker.get_multi_status()) >= {"momentum_10", "bias_prob_50", "exit_score_20", "avg_volume_10"}
+
+
+def test_empty_tracker_defaults():
+    tracker = TickPatternTracker()
+    assert tracker.get_status() == {
+        "momentum": 0.0, "bias_prob": 0.5, "exit_score": 0.0,
+        "last_price": None, "count": 0, "avg_volume": 0.0,
+    }
+
+
+def test_unknown_or_oversized_window_raises():
+    tracker = TickPatternTracker(window=20, windows=[10, 50])
+    for i in range(80):
+        tracker.update(100.0 + i % 7, 1.0)
+
+    assert tracker.momentum(30) == round((100.0 + 79 % 7) / (100.0 + 50 % 7) - 1.0, 3)   # 只需價格，容量內任意視窗
+    for fn in (tracker.bias_prob, tracker.exit_score, tracker.avg_volume):
+        with pytest.raises(ValueError, match="未設定"):
+            fn(30)
+    for fn in (tracker.momentum, tracker.bias_prob, tracker.exit_score, tracker.avg_volume):
+        with pytest.raises(ValueError, match="緩衝容量"):
+            fn(60)
+    with pytest.raises(ValueError):
+        TickPatternTracker(window=0)
@@ -0,0 +1,74 @@
+# test_trade_analyzer.py
+
+import csv
+import statistics
+import tracemalloc
+
+from strategy_v4.io.TradeAnalyzer import TradeAnalyzer
+from strategy_v4.io.TradeLogger import TradeLogger
+
+HEADER = ["timestamp", "event", "price", "direction", "position_size", "mode", "params_version"]
+
+
+def write_log(path, trades, mode="v3", version="v1"):
+    """trades：[(direction, 進場價, [加碼價...], 出場事件, 出場價)]"""
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for direction, entry, adds, event, exit_price in trades:
+            writer.writerow(["", "ENTER", entry, direction, 1, mode, version])
+            for i, add in enumerate(adds):
+                writer.writerow(["", "ADD", add, direction, i + 2, mode, version])
+            writer.writerow(["", event, exit_price, direction, 1 + len(adds), mode, version])
+
+
+def test_round_trips_from_trade_logger(tmp_path):
+    logger = TradeLogger(tmp_path / "trade_log.csv")
+    status = {"direction": "long", "current_position_size": 1, "mode": "v3", "params_version": "v1"}
+    logger.log("ENTER", status, 100.0, {})
+    logger.log("ADD", {**status, "current_position_size": 2}, 110.0, {})
+    logger.log("TAKEPROFIT", {**status, "current_position_size": 2}, 120.0, {})
+    short = {"direction": "short", "current_position_size": 1, "mode": "regression_based", "params_version": "v2"}
+    logger.log("ENTER", short, 120.0, {})
+    logger.log("STOPLOSS", short, 125.0, {})
+    logger.log("ENTER", short, 118.0, {})      # 未平倉：不計入
+
+    results = TradeAnalyzer(tmp_path / "trade_log.csv").analyze()
+    assert results["v3_v1"]["count"] == 1 and results["v3_v1"]["avg_pnl"] == 30.0   # (120-100) + (120-110)
+    assert results["regression_based_v2"] == {"count": 1, "win_rate": 0.0, "avg_pnl": -5.0, "std_pnl": 0.0,
+                                             "total_pnl": -5.0, "max_drawdown": 5.0}
+
+
+def test_stats_and_merge_match_single_pass(tmp_path):
+    pnls = [12, -5, -8, 20, -3, -15, 7, 4, -6, 9]
+    trades = [("long", 100.0, [], "EXIT", 100.0 + p) if i % 2 else ("short", 100.0, [], "EXIT_SCORE", 100.0 - p)
+              for i, p in enumerate(pnls)]
+    write_log(tmp_path / "all.csv", trades)
+    write_log(tmp_path / "a.csv", trades[:4])
+    write_log(tmp_path / "b.csv", trades[4:])
+
+    whole = TradeAnalyzer(tmp_path / "all.csv")
+    whole.run()
+    stats = whole.results()["v3_v1"]
+    equity = [sum(pnls[:i + 1]) for i in range(len(pnls))]
+    assert stats["count"] == 10 and stats["win_rate"] == 0.5
+    assert stats["avg_pnl"] == round(statistics.mean(pnls), 2)
+    assert stats["std_pnl"] == round(statistics.stdev(pnls), 2)
+    assert stats["max_drawdown"] == max(max(equity[:i + 1] + [0]) - e for i, e in enumerate(equity))
+
+    merged = TradeAnalyzer(tmp_path / "a.csv")
+    merged.run()
+    part = TradeAnalyzer(tmp_path / "b.csv")
+    part.run()
+    assert merged.merge(part).results() == whole.results()
+
+
+def test_streaming_memory_is_constant(tmp_path):
+    write_log(tmp_path / "big.csv", [("long", 100.0, [101.0], "EXIT", 100.0 + i % 7 - 3) for i in range(20000)])
+    analyzer = TradeAnalyzer(tmp_path / "big.csv")
+    tracemalloc.start()
+    analyzer.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert analyzer.results()["v3_v1"]["count"] == 20000
+    assert peak < 256 * 1024